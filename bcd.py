@@ -0,0 +1,82 @@
+# Packed BCD Codec
+# SAS carries meters, money amounts (cents) and game numbers as packed BCD, two decimal digits
+# per byte, most significant first. This module converts directly between bytes and integers.
+# Decoding goes through int() on the hex text of the bytes (the hex digits of valid BCD are the
+# decimal digits); bytes with non-BCD nibbles fall back to a 256-entry table that decodes every
+# byte as high * 10 + low, as the original decoder did. Validation uses a 256-entry table too.
+
+# Byte -> high nibble * 10 + low nibble (tolerant: A-F nibbles count as 10-15)
+DECODE_TABLE = tuple((b >> 4) * 10 + (b & 0x0F) for b in range(256))
+
+# The 100 bytes that are valid packed BCD
+VALID_BYTES = bytes(sorted((high << 4) | low for high in range(10) for low in range(10)))
+
+_HEX_DIGITS = frozenset("0123456789")
+
+
+def decode(data):
+    """Packed BCD bytes -> integer."""
+    try:
+        return int(data.hex()) if data else 0
+    except ValueError:
+        value = 0
+        for b in data:
+            value = value * 100 + DECODE_TABLE[b]
+        return value
+
+
+def encode(value, width):
+    """Integer -> packed BCD bytes of width bytes. Raises ValueError if it does not fit."""
+    if value < 0:
+        raise ValueError(f"BCD value must not be negative: {value}")
+    digits = f"{int(value):0{width * 2}d}"
+    if len(digits) > width * 2:
+        raise ValueError(f"{value} does not fit in {width} BCD bytes")
+    return bytes.fromhex(digits)
+
+
+def decode_hex(text):
+    """BCD as hex text ('0013187000') -> integer. Odd trailing digits are ignored."""
+    text = text[:len(text) & ~1]
+    try:
+        return int(text) if text else 0
+    except ValueError:
+        return decode(bytes.fromhex(text))
+
+
+def is_valid_bcd(data):
+    """True if every nibble is 0-9. Accepts bytes or hex text."""
+    if isinstance(data, str):
+        return _HEX_DIGITS.issuperset(data)
+    return not bytes(data).translate(None, VALID_BYTES)
+
+
+def decode_fields(data, layout):
+    """
+    Decode several BCD fields of one buffer. layout is a sequence of (offset, width);
+    returns the values as a list in the same order.
+    """
+    text = bytes(data).hex()
+    values = []
+    for offset, width in layout:
+        field = text[offset * 2:(offset + width) * 2]
+        try:
+            values.append(int(field) if field else 0)
+        except ValueError:
+            values.append(decode(bytes.fromhex(field)))
+    return values
+
+
+def decode_run(data, offset, width, count):
+    """Decode count consecutive fields of width bytes starting at offset."""
+    return decode_fields(data, [(offset + i * width, width) for i in range(count)])
+
+
+def to_cents(data):
+    """Money amount field (BCD cents) -> integer cents."""
+    return decode(data)
+
+
+def from_cents(cents, width=5):
+    """Integer cents -> BCD money field (5 bytes, as AFT amounts are)."""
+    return encode(cents, width)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+BCD conversion rate: the string-nibble and digit-arithmetic converters the code used vs bcd.py.
+Decodes a 5 byte meter value and encodes an AFT amount 500k times each.
+Run from the repository root: python benchmarks/bench_bcd.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcd
+
+ITERATIONS = 500_000
+VALUE = bytes.fromhex("0089475290")
+AMOUNT = 8947529
+
+
+def legacy_string_decode(bcd_str):
+    """SasMoney.bcd_to_int as it was: one int() per hex digit, digits joined as text."""
+    digits = ''
+    for i in range(0, len(bcd_str), 2):
+        byte = bcd_str[i:i + 2]
+        if len(byte) < 2:
+            continue
+        high = int(byte[0], 16)
+        low = int(byte[1], 16)
+        digits += f"{high}{low}"
+    return int(digits.lstrip('0') or '0')
+
+
+def legacy_decode(data):
+    """utils.bcd_to_int as it was: digit arithmetic per byte."""
+    value = 0
+    for b in data:
+        value = value * 100 + (b >> 4) * 10 + (b & 0x0F)
+    return value
+
+
+def legacy_encode(value, length_bytes):
+    """utils.int_to_bcd as it was: divmod by 10 per digit."""
+    result = bytearray(length_bytes)
+    for i in range(length_bytes - 1, -1, -1):
+        value, low = divmod(value, 10)
+        value, high = divmod(value, 10)
+        result[i] = (high << 4) | low
+    return bytes(result)
+
+
+def main():
+    assert legacy_decode(VALUE) == legacy_string_decode(VALUE.hex()) == bcd.decode(VALUE)
+    assert legacy_encode(AMOUNT, 5) == bcd.encode(AMOUNT, 5)
+    hex_value = VALUE.hex()
+    cases = [
+        ("decode: string nibbles", lambda: legacy_string_decode(hex_value)),
+        ("decode: digit arithmetic", lambda: legacy_decode(VALUE)),
+        ("decode: bcd.decode", lambda: bcd.decode(VALUE)),
+        ("encode: divmod per digit", lambda: legacy_encode(AMOUNT, 5)),
+        ("encode: bcd.encode", lambda: bcd.encode(AMOUNT, 5)),
+    ]
+    print(f"{ITERATIONS} conversions of a 5 byte value")
+    for name, fn in cases:
+        seconds = min(timeit.repeat(fn, number=ITERATIONS, repeat=3))
+        print(f"  {name:26s} {seconds:7.3f} s  {seconds / ITERATIONS * 1e9:6.0f} ns/value")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Command frame build rate: legacy hex get_crc vs the sas_commands frame library.
+Run from the repository root: python benchmarks/bench_commands.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from crccheck.crc import CrcKermit
+
+from sas_commands import command_library, command_frame
+from utils import add_crc
+
+
+def legacy_get_crc(command_hex):
+    """utils.get_crc as it was: new CrcKermit object and a hex round trip per command."""
+    data = bytearray.fromhex(command_hex)
+    crc_instance = CrcKermit()
+    crc_instance.process(data)
+    crc_hex = crc_instance.finalbytes().hex().upper()
+    crc_hex = crc_hex.zfill(4)
+    return f"{command_hex}{crc_hex[2:4]}{crc_hex[0:2]}"
+
+
+AFT_BODY_HEX = "724300000000000123450000000000000000000007" + "01000000" + "00" * 20 + "03353131" + "00000000" + "0000" + "00"
+
+
+def main(number=50000):
+    lib = command_library(0x01)
+    aft_body = bytes.fromhex(AFT_BODY_HEX)
+    cases = [
+        ("meter request, legacy get_crc", lambda: bytearray.fromhex(legacy_get_crc("012F0C0000A0B802031E00010BA2BA"))),
+        ("meter request, library constant", lambda: lib.meters_2f_basic),
+        ("game meters, cached by game", lambda: lib.game_meters(7)),
+        ("balance query, command_frame", lambda: command_frame(0x01, b"\x74\x00\x00\x00\x00")),
+        ("AFT transfer, legacy get_crc", lambda: bytearray.fromhex(legacy_get_crc("01" + AFT_BODY_HEX))),
+        ("AFT transfer, table CRC", lambda: lib.dynamic(aft_body)),
+        ("AFT transfer, crccheck CRC", lambda: add_crc_crccheck(b"\x01" + aft_body)),
+    ]
+    for name, fn in cases:
+        seconds = min(timeit.repeat(fn, number=number, repeat=3))
+        print(f"{name:34s} {number / seconds:14,.0f} frames/s")
+
+
+def add_crc_crccheck(command):
+    crc = CrcKermit.calc(command)
+    return command + bytes((crc & 0xFF, crc >> 8))
+
+
+if __name__ == "__main__":
+    assert bytes.fromhex(legacy_get_crc("01" + AFT_BODY_HEX)) == add_crc(bytes.fromhex("01" + AFT_BODY_HEX))
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: legacy lambda-chain dispatch vs SASDispatcher.
+Run from the repository root: python benchmarks/bench_dispatch.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sas_dispatch import SASDispatcher, ignore_handler
+from sas_frame import EXCEPTION_COMMAND
+from utils import get_crc
+
+# Recorded mix from a floor machine: mostly general poll replies, some events and long poll responses
+RECORDED_MIX = (
+    ["00"] * 120 + ["01"] * 10 + ["1F"] * 4 + ["51"] * 2 + ["69"] +
+    ["01FF001CA5"] * 6 + ["01FF709BD6"] * 2 + [get_crc("01FF7E" + "0001" + "00012345" + "00" + "00")] * 5 +
+    [get_crc("01FF7F00000500")] * 5 + ["01FF69DB5B", "01FF6A4069", "01FF5110E6", "01FF838F13"] +
+    [get_crc("017402" + "0000")] + [get_crc("0154" + "06" + "363032" + "000001")] +
+    ["012F380000A00089475290B80090352290020000000003000000001E00000000001318700001129982000B00276500A20000000000BA0000000000514C"]
+)
+
+
+def noop(d):
+    return None
+
+
+# The lambda chain handle_received_sas_command used to walk, prints replaced by noop
+EARLY_ACKS = {
+    "01FF838F13": "Ignore: known message",
+    "01FF001CA501FF001CA5": "Ignore: known message",
+    "01FF001CA501": "Ignore: known message",
+    "81": "Simple ACK",
+    "01FF820602": "Display meters or attendant menu has been entered",
+    "01FF201E84": "General tilt",
+    "0101FF001CA5": "Ignore: known message",
+}
+LEGACY_DISPATCH = [
+    (lambda d: d.startswith("01FF7C"), noop),
+    (lambda d: d.startswith("01FF6B"), noop),
+    (lambda d: d.startswith("01FF6C"), noop),
+    (lambda d: d.startswith("011B"), noop),
+    (lambda d: d.startswith("0153"), noop),
+    (lambda d: d.startswith("01731D"), noop),
+    (lambda d: d.startswith("01FF6FED3E"), noop),
+    (lambda d: d[0:10] == "01FF5110E6", noop),
+    (lambda d: d[0:10].startswith("01FF52"), noop),
+    (lambda d: d[0:4] == "0172", noop),
+    (lambda d: d[0:4] == "0174", noop),
+    (lambda d: d.startswith("01FF54BDB1"), noop),
+    (lambda d: d == "01FF29DF19", noop),
+    (lambda d: d == "00", noop),
+    (lambda d: d == "01", noop),
+    (lambda d: d == "51", noop),
+    (lambda d: d.startswith("01FF69DB5B") or d == "FF69DB5B" or d == "69DB5B" or d == "69", noop),
+    (lambda d: "01FF66" in d, noop),
+    (lambda d: d[0:6] == "01FF8A", noop),
+    (lambda d: d[0:4] == "0156", noop),
+    (lambda d: d[0:6] == "01FF6A" or "01FF6A4069" in d, noop),
+    (lambda d: d[0:2] == "87", noop),
+    (lambda d: d[0:4] == "011F" and len(d) > 10, noop),
+    (lambda d: d[0:6] == "019400", noop),
+    (lambda d: d[0:4] == "0154", noop),
+    (lambda d: d == "1F", noop),
+    (lambda d: d == "01FF001CA5" or d == "01FF1F6A4D" or d == "01FF709BD6", noop),
+    (lambda d: d[0:6] == "01FF88", noop),
+    (lambda d: d[0:4] == "01B5", noop),
+    (lambda d: d[0:6] == "01FF8C", noop),
+]
+
+
+def legacy_dispatch(tdata):
+    tdata = tdata.replace(" ", "").upper()
+    if tdata in EARLY_ACKS:
+        return
+    if tdata[0:6] == "01FF1F":
+        return
+    for cond, action in LEGACY_DISPATCH:
+        if cond(tdata):
+            action(tdata)
+            return
+    for prefix in ("0173", "0154", "0174", "0172", "01FF", "012F", "01AF"):
+        if tdata.startswith(prefix):
+            return
+
+
+def build_dispatcher():
+    d = SASDispatcher(noop)
+    for code in (0x00, 0x01, 0x1F, 0x51, 0x69, 0x81, 0x87):
+        d.register_single_byte(code, noop)
+    d.register(EXCEPTION_COMMAND, noop)
+    for code in (0x00, 0x1F, 0x20, 0x29, 0x51, 0x52, 0x54, 0x66, 0x69, 0x6A, 0x6B, 0x6C, 0x6F,
+                 0x70, 0x7C, 0x7E, 0x7F, 0x82, 0x83, 0x88, 0x8A, 0x8C):
+        d.register_exception(code, ignore_handler)
+    for command in (0x1B, 0x1F, 0x2F, 0x53, 0x54, 0x56, 0x72, 0x73, 0x74, 0x94, 0xAF, 0xB5):
+        d.register(command, noop)
+    return d
+
+
+def main(rounds=2000):
+    hex_mix = RECORDED_MIX
+    frame_mix = [bytes.fromhex(m) for m in RECORDED_MIX]
+    dispatcher = build_dispatcher()
+
+    def run_legacy():
+        for m in hex_mix:
+            legacy_dispatch(m)
+
+    def run_new():
+        dispatch = dispatcher.dispatch
+        for f in frame_mix:
+            dispatch(f)
+
+    total = rounds * len(hex_mix)
+    for name, fn in (("legacy lambda chain", run_legacy), ("SASDispatcher", run_new)):
+        seconds = min(timeit.repeat(fn, number=rounds, repeat=3))
+        print(f"{name:22s} {seconds / total * 1e9:8.0f} ns/frame  {total / seconds:12,.0f} frames/s")
+
+
+if __name__ == "__main__":
+    main()
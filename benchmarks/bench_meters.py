@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Meter block decode rate: the per-meter string walk SasMoney used vs the sas_meters table decoder.
+Decodes the sample 2F frame from test_meter_parsing.py 100k times.
+Run from the repository root: python benchmarks/bench_meters.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sas_frame import SASFrame
+from sas_meters import decode_meter_frame
+
+SAMPLE_HEX = ("012F380000A00089475290B80090352290020000000003000000001E00000000001318700001"
+              "129982000B00276500A20000000000BA0000000000514C")
+SAMPLE = SASFrame.from_hex(SAMPLE_HEX)
+ITERATIONS = 100_000
+
+FIVE_BYTE_CODES = ["0D", "0E", "0F", "10", "80", "82", "84", "86", "88", "8A", "8C", "8E",
+                   "90", "92", "A0", "A2", "A4", "A6", "A8", "AA", "AC", "AE", "B0", "B8", "BA", "BC"]
+NAMES = {"00": "total_turnover", "01": "total_win", "02": "total_jackpot", "03": "total_handpay",
+         "0B": "bills_accepted", "1E": "total_bonus", "A0": "total_coin_in", "A2": "non_cashable_in",
+         "B8": "total_coin_out", "BA": "non_cashable_out"}
+
+
+def bcd_to_int(data):
+    """utils.bcd_to_int as it was: digit arithmetic per byte."""
+    value = 0
+    for b in data:
+        value = value * 100 + (b >> 4) * 10 + (b & 0x0F)
+    return value
+
+
+def legacy_decode(frame):
+    """handle_single_meter_response's 2F walk as it was, per-meter prints removed."""
+    message_length = frame[2] + 5
+    idx = 5
+    end = min(message_length, len(frame)) - 2
+    meters = {}
+    received_all_meter = f"{frame}|"
+    while idx < end:
+        meter_code = f"{frame[idx]:02X}"
+        idx += 1
+        length = 5 if meter_code.upper() in FIVE_BYTE_CODES else 4
+        if idx + length > end:
+            break
+        meter_val = frame[idx:idx + length]
+        idx += length
+        meters[NAMES.get(meter_code, meter_code)] = bcd_to_int(meter_val) / 10.0
+        received_all_meter += f"{meter_code}-{meter_val.hex().upper()}|"
+    return meters
+
+
+def main():
+    assert legacy_decode(SAMPLE)["total_turnover"] == decode_meter_frame(SAMPLE).scaled()["total_turnover"]
+    cases = [
+        ("legacy string walk", lambda: legacy_decode(SAMPLE)),
+        ("table decoder (arrays)", lambda: decode_meter_frame(SAMPLE)),
+        ("table decoder + scaled()", lambda: decode_meter_frame(SAMPLE).scaled()),
+    ]
+    print(f"{ITERATIONS} decodes of a {len(SAMPLE)} byte 2F frame with 10 meters")
+    baseline = None
+    for name, fn in cases:
+        seconds = min(timeit.repeat(fn, number=ITERATIONS, repeat=3))
+        baseline = baseline or seconds
+        print(f"  {name:26s} {seconds:7.3f} s  {seconds / ITERATIONS * 1e6:6.2f} us/frame  x{baseline / seconds:4.1f}")
+
+
+if __name__ == "__main__":
+    main()
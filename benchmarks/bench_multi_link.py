@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-link poll timing of SASHost as links are added.
+Every link is a pty pair; a simulator thread plays all gaming machines and answers each
+general poll with "no activity" (00). Reports slot jitter and poll->reply latency per link count.
+Run from the repository root: python benchmarks/bench_multi_link.py [seconds]
+"""
+
+import os
+import selectors
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serial
+
+from config_manager import ConfigManager
+from sas_communicator import SASCommunicator
+from sas_host import SASHost
+
+LINK_COUNTS = (1, 4, 8, 16)
+
+
+def simulate_machines(masters, stop):
+    sel = selectors.DefaultSelector()
+    for fd in masters:
+        sel.register(fd, selectors.EVENT_READ)
+    while not stop.is_set():
+        for key, _ in sel.select(0.05):
+            data = os.read(key.fd, 256)
+            if data[-1:] in (b"\x80", b"\x81"):
+                os.write(key.fd, b"\x00")
+    sel.close()
+
+
+def run(link_count, seconds):
+    config = ConfigManager(os.devnull + ".missing")
+    host = SASHost(config)
+    pairs = []
+    for _ in range(link_count):
+        master, slave = os.openpty()
+        comm = SASCommunicator(os.ttyname(slave), config)
+        comm.serial_port = serial.Serial(os.ttyname(slave), 19200)
+        comm.is_port_open = True
+        host.add_link(comm)
+        pairs.append((master, slave))
+    stop = threading.Event()
+    sim = threading.Thread(target=simulate_machines, args=([m for m, _ in pairs], stop), daemon=True)
+    sim.start()
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        host.run_once()
+    stats = host.stats()
+    stop.set()
+    sim.join()
+    host.close()
+    for master, slave in pairs:
+        os.close(master)
+        os.close(slave)
+    return stats
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    devnull = open(os.devnull, "w")
+    print(f"{'links':>5} {'polls/link':>10} {'avg jitter':>11} {'max jitter':>11} "
+          f"{'avg reply':>10} {'max reply':>10} {'overruns':>8}")
+    for count in LINK_COUNTS:
+        stdout, sys.stdout = sys.stdout, devnull  # TX logging of the communicators
+        try:
+            stats = run(count, seconds)
+        finally:
+            sys.stdout = stdout
+        loops = [s["scheduler"]["loop"] for s in stats.values()]
+        polls = sum(s["scheduler"]["general_polls"] for s in stats.values()) / count
+        print(f"{count:>5} {polls:>10.0f} "
+              f"{sum(l['avg_jitter_ms'] for l in loops) / count:>9.3f}ms "
+              f"{max(l['max_jitter_ms'] for l in loops):>9.3f}ms "
+              f"{sum(s['avg_latency_ms'] for s in stats.values()) / count:>8.3f}ms "
+              f"{max(s['max_latency_ms'] for s in stats.values()):>8.3f}ms "
+              f"{sum(l['overruns'] for l in loops):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import datetime
 import time
 from decimal import Decimal
+from event_bus import TOPIC_BILL_DISABLED, TOPIC_BILL_ENABLED, TOPIC_BILL_REJECTED, TOPIC_BILL_STACKED
 
 class BillAcceptorFunctions:
     def __init__(self):
@@ -15,9 +16,28 @@ class BillAcceptorFunctions:
         self.dict_currencies = []
         # External dependencies (must be set from outside)
         self.billacceptorport = None
+        self.event_bus = None  # event_bus.EventBus for bill.* events
         # The following must be set from outside as well:
         # self.SQL_Safe_InsImportantMessage, self.GetMeiACK, self.Decode2Hex
 
+    def _publish(self, topic, payload=None):
+        if self.event_bus:
+            self.event_bus.publish(topic, payload, "billacceptor")
+
+    def register_sas_handlers(self, dispatcher):
+        """Close the bill acceptor while a game runs, open it again when the game ends."""
+        dispatcher.register_exception(0x7E, self.handle_game_started_event)
+        dispatcher.register_exception(0x7F, self.handle_game_ended_event)
+
+    def handle_game_started_event(self, frame):
+        if self.billacceptorport is not None and self.g_machine_bill_acceptor_type_id > 0:
+            self.bill_acceptor_game_started()
+
+    def handle_game_ended_event(self, frame):
+        self.g_last_game_ended = datetime.datetime.now()
+        if self.billacceptorport is not None and self.g_machine_bill_acceptor_type_id > 0:
+            self.bill_acceptor_game_ended()
+
     def billacceptor_open_thread(self, sender):
         last_game_ended_diff = (datetime.datetime.now() - self.g_last_game_ended).total_seconds()
         self.bill_acceptor_inhibit_open()
@@ -33,6 +53,7 @@ class BillAcceptorFunctions:
 
     def bill_acceptor_inhibit_open(self):
         self.is_billacceptor_open = 1
+        self._publish(TOPIC_BILL_ENABLED)
         last_bill_ac_diff = (datetime.datetime.now() - self.g_last_bill_acceptor_ackapa_command).total_seconds()
         self.g_last_bill_acceptor_ackapa_command = datetime.datetime.now()
         if self.g_machine_bill_acceptor_type_id == 1:
@@ -42,6 +63,7 @@ class BillAcceptorFunctions:
 
     def bill_acceptor_inhibit_close(self):
         self.is_billacceptor_open = 0
+        self._publish(TOPIC_BILL_DISABLED)
         last_bill_ac_diff = (datetime.datetime.now() - self.g_last_bill_acceptor_ackapa_command).total_seconds()
         self.g_last_bill_acceptor_ackapa_command = datetime.datetime.now()
         if self.g_machine_bill_acceptor_type_id == 1:
@@ -59,6 +81,7 @@ class BillAcceptorFunctions:
     def bill_acceptor_reject(self, sender):
         self.sql_safe_ins_important_message("Bill is rejected " + sender, 80)
         print("****** REJECT YAP ******")
+        self._publish(TOPIC_BILL_REJECTED, {"reason": sender})
         if self.g_machine_bill_acceptor_type_id == 1:
             self.bill_acceptor_command("FC 05 43 B0 27")
         if self.g_machine_bill_acceptor_type_id == 2:
@@ -76,6 +99,7 @@ class BillAcceptorFunctions:
 
     def bill_acceptor_stack1(self):
         self.sql_safe_ins_important_message("Bill Stack Cmd", 100)
+        self._publish(TOPIC_BILL_STACKED)
         if self.g_machine_bill_acceptor_type_id == 1:
             self.bill_acceptor_command("FC 05 41 A2 04")
         if self.g_machine_bill_acceptor_type_id == 2:
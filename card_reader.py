@@ -1,7 +1,9 @@
+import asyncio
 import serial
 import time
 import threading
 import platform
+from event_bus import TOPIC_CARD_INSERTED, TOPIC_CARD_REMOVED
 
 class CardReader:
     def __init__(self):
@@ -15,6 +17,8 @@ class CardReader:
         self.last_card_number = None
         self.missed_polls = 0
         self.max_missed_polls = 50  # Debounce: require 50 missed polls before ejection
+        self.on_link_fault = None  # on_link_fault(error) on serial I/O errors, see link_supervisor
+        self.event_bus = None  # event_bus.EventBus for card.inserted / card.removed
 
     def find_port(self, port_list):
         """
@@ -111,7 +115,6 @@ class CardReader:
 
     def _poll_card_reader(self):
         while self.polling_active:
-            card_detected = False  # Initialize at the start of each loop
             try:
                 self._send_command_hex("02000235310307")
                 time.sleep(self.card_reader_interval)
@@ -153,28 +156,68 @@ class CardReader:
                         if tdata:
                             # print(f"[DEBUG] Card data after ENQ: {tdata}")
                             pass
-                    card_no = self._extract_card_number(tdata)
-                    if card_no and card_no != self.last_card_number:
-                        print(f"Card detected: {card_no}")
-                        self.last_card_number = card_no
-                        self.is_card_inside = True
-                        card_detected = True
-                        self.missed_polls = 0  # Reset missed poll counter
-                # Card eject detection with debounce
-                if not card_detected and self.is_card_inside:
-                    self.missed_polls += 1
-                    if self.missed_polls >= self.max_missed_polls:
-                        print("Card ejected!")
-                        self.is_card_inside = False
-                        self.last_card_number = None
-                        self.missed_polls = 0
-                else:
-                    self.missed_polls = 0
-                # REMARK: Place card removal/session cleanup logic here (see SQL_CardExit(sender) in legacy code)
+                self._update_card_state(tdata)
             except Exception as e:
                 print(f"Polling error: {e}")
+                if self.on_link_fault and isinstance(e, OSError):
+                    self.on_link_fault(e)
             time.sleep(self.card_reader_interval)
 
+    def _update_card_state(self, tdata):
+        """Card insert/eject bookkeeping for one poll response (hex text, may be empty)."""
+        card_detected = False
+        if tdata:
+            card_no = self._extract_card_number(tdata)
+            if card_no and card_no != self.last_card_number:
+                print(f"Card detected: {card_no}")
+                self.last_card_number = card_no
+                self.is_card_inside = True
+                card_detected = True
+                self.missed_polls = 0  # Reset missed poll counter
+                if self.event_bus:
+                    self.event_bus.publish(TOPIC_CARD_INSERTED, {"card_number": card_no}, self.port_name)
+        # Card eject detection with debounce
+        if not card_detected and self.is_card_inside:
+            self.missed_polls += 1
+            if self.missed_polls >= self.max_missed_polls:
+                print("Card ejected!")
+                if self.event_bus:
+                    self.event_bus.publish(TOPIC_CARD_REMOVED, {"card_number": self.last_card_number},
+                                           self.port_name)
+                self.is_card_inside = False
+                self.last_card_number = None
+                self.missed_polls = 0
+        else:
+            self.missed_polls = 0
+        # REMARK: Place card removal/session cleanup logic here (see SQL_CardExit(sender) in legacy code)
+
+    async def poll_async(self, port):
+        """
+        Card polling as a coroutine on an asyncio loop shared with the SAS engine.
+        port is a sas_async.AsyncSerialPort over this reader's serial port.
+        """
+        self.polling_active = True
+        while self.polling_active:
+            try:
+                port.write(bytes.fromhex("02000235310307"))
+                tdata = (await port.read_until_idle(self.card_reader_interval, 0.02)).hex().upper()
+                if tdata == "06":
+                    port.write(b"\x05")
+                    tdata = (await port.read_until_idle(1.0, 0.05)).hex().upper()
+                self._update_card_state(tdata)
+            except Exception as e:
+                print(f"Polling error: {e}")
+            await asyncio.sleep(self.card_reader_interval)
+
+    def reopen(self, port_name=None):
+        """Open the port again with the settings found by find_port and resume polling."""
+        self.serial_port.port = port_name or self.port_name
+        self.serial_port.open()
+        self.port_name = self.serial_port.port
+        self.is_card_reader_opened = True
+        self.start_polling()
+        return True
+
     def _send_command_hex(self, hex_string):
         try:
             cmd = bytearray.fromhex(hex_string)
@@ -198,7 +241,10 @@ class CardReader:
 
     def close(self):
         if self.serial_port and self.serial_port.is_open:
-            self.serial_port.close()
+            try:
+                self.serial_port.close()
+            except (OSError, serial.SerialException) as e:
+                print(f"Error closing card reader port {self.port_name}: {e}")
             print(f"Card reader port {self.port_name} closed.")
         self.is_card_reader_opened = False
         self.polling_active = False
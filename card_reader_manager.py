@@ -1,11 +1,14 @@
 import threading
 import time
 from card_reader import CardReader
+from link_supervisor import card_reader_link
 
 class CardReaderManager:
-    def __init__(self, port_list, card_reader_type=2):
+    def __init__(self, port_list, card_reader_type=2, supervisor=None, event_bus=None):
         self.port_list = port_list
         self.card_reader_type = card_reader_type
+        self.supervisor = supervisor  # link_supervisor.LinkSupervisor reopening the port after faults
+        self.event_bus = event_bus  # event_bus.EventBus for card.inserted / card.removed
         self.card_reader = None
         self.thread = None
         self.running = False
@@ -31,6 +34,7 @@ class CardReaderManager:
     def _thread_main(self):
         print("[CardReaderManager] Thread started. Scanning for card reader...")
         self.card_reader = CardReader()
+        self.card_reader.event_bus = self.event_bus
         # Optionally set interval/type here if needed
         if self.card_reader_type == 1:
             self.card_reader.card_reader_interval = 0.5
@@ -53,9 +57,13 @@ class CardReaderManager:
                         self.card_reader.last_card_number = card_no
                         self.card_reader.is_card_inside = True
             self.card_reader.start_polling()
+            if self.supervisor:
+                link = card_reader_link(self.card_reader, self.supervisor)
             while self.running:
                 time.sleep(0.5)
             print("[CardReaderManager] Stopping card reader polling...")
+            if self.supervisor:
+                self.supervisor.remove(link)
             self.card_reader.stop_polling()
             self.card_reader.close()
         else:
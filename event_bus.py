@@ -0,0 +1,260 @@
+# In-process Event Bus
+# Topic based publish/subscribe between the I/O threads (SAS reader, card reader, bill acceptor)
+# and the components that consume their events (UI, database uplink, session accounting).
+# publish() never runs consumer code: it appends the event to the bounded queue of every
+# matching subscription, and each subscription is drained at its own rate (its own delivery
+# thread, or get() by the consumer). A full queue either drops its oldest event (DROP_OLDEST,
+# right for I/O producers that must not stall) or makes the publisher wait (BLOCK).
+#
+# Topics are dotted names, "<source>.<event>": sas.game_started, card.inserted, bill.disabled.
+# Subscriptions take exact topics, prefixes ending in ".*" ("sas.*") or "*".
+
+import datetime
+import itertools
+import threading
+import time
+from collections import deque
+
+DROP_OLDEST = "drop_oldest"
+BLOCK = "block"
+
+DEFAULT_CAPACITY = 256
+DEFAULT_BLOCK_TIMEOUT = 1.0
+
+TOPIC_CARD_INSERTED = "card.inserted"
+TOPIC_CARD_REMOVED = "card.removed"
+TOPIC_BILL_ENABLED = "bill.enabled"
+TOPIC_BILL_DISABLED = "bill.disabled"
+TOPIC_BILL_REJECTED = "bill.rejected"
+TOPIC_BILL_STACKED = "bill.stacked"
+
+
+def sas_topic(event):
+    """Bus topic of a sas_events.SASEvent."""
+    return f"sas.{event.name}"
+
+
+def topic_matches(pattern, topic):
+    if pattern == "*" or pattern == topic:
+        return True
+    return pattern.endswith(".*") and topic.startswith(pattern[:-1])
+
+
+class BusEvent:
+    """One published event."""
+
+    __slots__ = ("topic", "payload", "source", "sequence", "published_at", "timestamp")
+
+    def __init__(self, topic, payload, source, sequence):
+        self.topic = topic
+        self.payload = payload
+        self.source = source
+        self.sequence = sequence
+        self.published_at = time.monotonic()
+        self.timestamp = datetime.datetime.now()
+
+    def __repr__(self):
+        return f"BusEvent({self.topic} #{self.sequence} {self.payload!r})"
+
+
+class LatencyCounter:
+    """Count, average and maximum of a duration."""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "avg_us": round(self.total / self.count * 1e6, 1) if self.count else 0.0,
+            "max_us": round(self.max * 1e6, 1),
+        }
+
+
+class Subscription:
+    """
+    Bounded event queue of one consumer. With a callback, start() drains it on a delivery
+    thread; without one the consumer calls get().
+    """
+
+    def __init__(self, name, topics, callback=None, capacity=DEFAULT_CAPACITY, policy=DROP_OLDEST,
+                 block_timeout=DEFAULT_BLOCK_TIMEOUT):
+        if policy not in (DROP_OLDEST, BLOCK):
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.name = name
+        self.topics = tuple(topics)
+        self.callback = callback
+        self.capacity = capacity
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = None
+        self.delivered = 0
+        self.dropped = 0
+        self.blocked = 0
+        self.max_depth = 0
+        self.delivery_latency = LatencyCounter()  # Published -> handed to the consumer
+
+    def matches(self, topic):
+        return any(topic_matches(pattern, topic) for pattern in self.topics)
+
+    def offer(self, event):
+        """Called by the publisher. Returns False if the event was dropped."""
+        with self.condition:
+            if self.closed:
+                return False
+            if len(self.queue) >= self.capacity:
+                if self.policy == DROP_OLDEST:
+                    self.queue.popleft()
+                    self.dropped += 1
+                else:
+                    self.blocked += 1
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self.queue) >= self.capacity and not self.closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.dropped += 1  # Consumer stuck: give up rather than stall the producer forever
+                            return False
+                        self.condition.wait(remaining)
+                    if self.closed:
+                        return False
+            self.queue.append(event)
+            if len(self.queue) > self.max_depth:
+                self.max_depth = len(self.queue)
+            self.condition.notify_all()
+        return True
+
+    def get(self, timeout=None):
+        """Next event, or None if none arrives within timeout (or the subscription is closed)."""
+        with self.condition:
+            if not self.queue and not self.closed:
+                self.condition.wait_for(lambda: self.queue or self.closed, timeout)
+            if not self.queue:
+                return None
+            event = self.queue.popleft()
+            self.condition.notify_all()
+        self.delivered += 1
+        self.delivery_latency.add(time.monotonic() - event.published_at)
+        return event
+
+    def start(self):
+        if self.callback is None or (self.thread and self.thread.is_alive()):
+            return
+        self.thread = threading.Thread(target=self._deliver_loop, name=f"bus-{self.name}", daemon=True)
+        self.thread.start()
+
+    def _deliver_loop(self):
+        while not self.closed:
+            event = self.get(timeout=0.5)
+            if event is None:
+                continue
+            try:
+                self.callback(event)
+            except Exception as e:
+                print(f"[EventBus] Subscriber {self.name} failed on {event.topic}: {e}")
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1)
+        self.thread = None
+
+    def stats(self):
+        return {
+            "topics": list(self.topics),
+            "policy": self.policy,
+            "depth": len(self.queue),
+            "max_depth": self.max_depth,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "blocked": self.blocked,
+            "delivery_latency": self.delivery_latency.as_dict(),
+        }
+
+
+class EventBus:
+    """Routes published events to the subscriptions whose topics match."""
+
+    def __init__(self):
+        self.subscriptions = []
+        self.lock = threading.Lock()
+        self._routes = {}  # topic -> matching subscriptions, rebuilt after (un)subscribe
+        self._sequence = itertools.count(1)
+        self.published = 0
+        self.unrouted = 0
+        self.per_topic = {}
+        self.publish_latency = LatencyCounter()  # Time the publisher spends in publish()
+
+    def subscribe(self, name, topics, callback=None, capacity=DEFAULT_CAPACITY, policy=DROP_OLDEST,
+                  block_timeout=DEFAULT_BLOCK_TIMEOUT):
+        """
+        Subscribe to topics (a topic, pattern or list of them). With a callback events are
+        delivered on the subscription's own thread; otherwise call get() on the result.
+        """
+        if isinstance(topics, str):
+            topics = (topics,)
+        subscription = Subscription(name, topics, callback, capacity, policy, block_timeout)
+        with self.lock:
+            self.subscriptions = self.subscriptions + [subscription]
+            self._routes = {}
+        subscription.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions = [s for s in self.subscriptions if s is not subscription]
+            self._routes = {}
+        subscription.close()
+
+    def _route(self, topic):
+        routes = self._routes
+        subscriptions = routes.get(topic)
+        if subscriptions is None:
+            subscriptions = tuple(s for s in self.subscriptions if s.matches(topic))
+            routes[topic] = subscriptions
+        return subscriptions
+
+    def publish(self, topic, payload=None, source=None):
+        """Queue an event for every matching subscription. Returns the BusEvent."""
+        started = time.monotonic()
+        event = BusEvent(topic, payload, source, next(self._sequence))
+        subscriptions = self._route(topic)
+        for subscription in subscriptions:
+            subscription.offer(event)
+        self.published += 1
+        if not subscriptions:
+            self.unrouted += 1
+        self.per_topic[topic] = self.per_topic.get(topic, 0) + 1
+        self.publish_latency.add(time.monotonic() - started)
+        return event
+
+    def close(self):
+        with self.lock:
+            subscriptions = self.subscriptions
+            self.subscriptions = []
+            self._routes = {}
+        for subscription in subscriptions:
+            subscription.close()
+
+    def stats(self):
+        return {
+            "published": self.published,
+            "unrouted": self.unrouted,
+            "topics": dict(self.per_topic),
+            "publish_latency": self.publish_latency.as_dict(),
+            "subscriptions": {s.name: s.stats() for s in self.subscriptions},
+        }
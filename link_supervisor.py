@@ -0,0 +1,367 @@
+# Serial Link Supervisor
+# Brings serial links back after a USB adapter drops or a cable comes loose. Links report I/O
+# faults; device removal and arrival are watched on /dev (inotify through ctypes, or a periodic
+# existence check where inotify is not available). A faulted link is quiesced and closed, then
+# reopened with its own settings as soon as the device node is back, retrying with bounded
+# exponential backoff. Outages are counted and timed per link.
+#
+# A link whose port has a /dev/serial/by-id link is followed there, so a replugged adapter that
+# comes back as another ttyUSBn is still found.
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+
+from port_cache import by_id_link
+
+IN_ATTRIB = 0x004
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+WATCH_MASK = IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len; name follows
+
+DEFAULT_CHECK_INTERVAL = 1.0
+RECONNECT_INITIAL = 0.1
+RECONNECT_MAX = 5.0
+
+
+def _inotify_watch(directory):
+    """Non-blocking inotify fd watching directory, or None where inotify is unavailable."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class DeviceWatcher:
+    """
+    Device node changes in one directory (/dev). wait() returns the changed names, or an empty
+    set after the timeout, on wake() or when running without inotify.
+    """
+
+    def __init__(self, directory="/dev"):
+        self.directory = directory
+        self.fd = _inotify_watch(directory)
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_r, False)
+        if self.fd is None:
+            print(f"[LinkSupervisor] inotify unavailable, checking {directory} periodically.")
+
+    @property
+    def uses_inotify(self):
+        return self.fd is not None
+
+    def wake(self):
+        try:
+            os.write(self.wake_w, b"\0")
+        except OSError:
+            pass
+
+    def wait(self, timeout):
+        fds = [self.wake_r] if self.fd is None else [self.fd, self.wake_r]
+        readable, _, _ = select.select(fds, [], [], max(0.0, timeout))
+        if self.wake_r in readable:
+            try:
+                os.read(self.wake_r, 64)
+            except BlockingIOError:
+                pass
+        if self.fd is None or self.fd not in readable:
+            return set()
+        return self._read_events()
+
+    def _read_events(self):
+        names = set()
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return names
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            names.add(os.fsdecode(data[offset:offset + length].rstrip(b"\0")))
+            offset += length
+        return names
+
+    def close(self):
+        for fd in (self.fd, self.wake_r, self.wake_w):
+            if fd is not None:
+                os.close(fd)
+        self.fd = None
+
+
+class Backoff:
+    """Bounded exponential backoff: initial, initial * factor, ... never above maximum."""
+
+    def __init__(self, initial=RECONNECT_INITIAL, maximum=RECONNECT_MAX, factor=2.0):
+        self.initial = initial
+        self.maximum = maximum
+        self.factor = factor
+        self.delay = initial
+
+    def next(self):
+        delay = self.delay
+        self.delay = min(self.delay * self.factor, self.maximum)
+        return delay
+
+    def reset(self):
+        self.delay = self.initial
+
+
+class OutageStats:
+    """Fault count and outage durations (fault -> link back up) of one link."""
+
+    def __init__(self):
+        self.faults = 0
+        self.reconnects = 0
+        self.attempts = 0
+        self.down_since = None
+        self.last_outage = 0.0
+        self.max_outage = 0.0
+        self.total_outage = 0.0
+        self.last_reason = None
+
+    def begin(self, now, reason):
+        self.faults += 1
+        self.down_since = now
+        self.last_reason = reason
+
+    def end(self, now):
+        outage = now - self.down_since
+        self.down_since = None
+        self.reconnects += 1
+        self.last_outage = outage
+        self.total_outage += outage
+        if outage > self.max_outage:
+            self.max_outage = outage
+        return outage
+
+    def as_dict(self, now=None):
+        now = time.monotonic() if now is None else now
+        return {
+            "faults": self.faults,
+            "reconnects": self.reconnects,
+            "attempts": self.attempts,
+            "down_ms": round((now - self.down_since) * 1000, 1) if self.down_since is not None else 0.0,
+            "last_outage_ms": round(self.last_outage * 1000, 1),
+            "max_outage_ms": round(self.max_outage * 1000, 1),
+            "total_outage_ms": round(self.total_outage * 1000, 1),
+            "last_reason": self.last_reason,
+        }
+
+
+class SupervisedLink:
+    """
+    One serial link: quiesce() stops its threads and closes the port, reopen(port_name) opens
+    it again with the link's own settings and resumes I/O, returning True on success.
+    """
+
+    def __init__(self, name, port_name, quiesce, reopen, backoff=None):
+        self.name = name
+        self.port_name = port_name
+        self.by_id = by_id_link(port_name)
+        self.quiesce = quiesce
+        self.reopen = reopen
+        self.backoff = backoff or Backoff()
+        self.stats = OutageStats()
+        self.faulted = False
+        self.quiesced = False
+        self.next_attempt = 0.0
+        self.pending_reason = None  # Fault reported from an I/O thread, taken by the supervisor
+
+    def device_path(self):
+        if self.by_id and os.path.exists(self.by_id):
+            return os.path.realpath(self.by_id)
+        return self.port_name
+
+    def present(self):
+        return os.path.exists(self.device_path())
+
+    def watches(self, names):
+        return os.path.basename(self.port_name) in names or (self.by_id is not None and bool(names))
+
+
+class LinkSupervisor:
+    """Supervises any number of links from one thread."""
+
+    def __init__(self, watcher=None, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.watcher = watcher
+        self.check_interval = check_interval
+        self.links = []
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = False
+
+    def add(self, link):
+        with self.lock:
+            self.links.append(link)
+        print(f"[LinkSupervisor] Supervising {link.name} on {link.port_name}.")
+        return link
+
+    def remove(self, link):
+        with self.lock:
+            if link in self.links:
+                self.links.remove(link)
+
+    def report_fault(self, link, reason):
+        """Called from any thread when a link's I/O fails; recovery runs on the supervisor thread."""
+        if link.faulted or link.pending_reason is not None:
+            return
+        link.pending_reason = str(reason)
+        if self.watcher:
+            self.watcher.wake()
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        if self.watcher is None:
+            self.watcher = DeviceWatcher()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="link-supervisor", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.watcher:
+            self.watcher.wake()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=2)
+        self.thread = None
+        if self.watcher:
+            self.watcher.close()
+            self.watcher = None
+
+    def _run(self):
+        changed = set()
+        while self.running:
+            try:
+                timeout = self.run_once(changed)
+            except Exception as e:
+                print(f"[LinkSupervisor] Error: {e}")
+                timeout = self.check_interval
+            changed = self.watcher.wait(timeout)
+
+    def run_once(self, changed=(), now=None):
+        """
+        One supervision step. changed holds device names reported by the watcher.
+        Returns the time until the next step is due.
+        """
+        now = time.monotonic() if now is None else now
+        next_due = self.check_interval
+        with self.lock:
+            links = list(self.links)
+        for link in links:
+            if not link.faulted:
+                reason = link.pending_reason
+                if reason is None and not link.present():
+                    reason = "device removed"
+                if reason is None:
+                    continue
+                self._fault(link, reason, now)
+            if not link.quiesced:
+                self._quiesce(link)
+            if changed and link.watches(changed):
+                link.next_attempt = now  # Device arrived: try right away instead of waiting out the backoff
+            if now >= link.next_attempt:
+                self._attempt(link, now)
+            if link.faulted:
+                next_due = min(next_due, max(0.0, link.next_attempt - now))
+        return next_due
+
+    def _fault(self, link, reason, now):
+        link.faulted = True
+        link.quiesced = False
+        link.pending_reason = None
+        link.next_attempt = now
+        link.backoff.reset()
+        link.stats.begin(now, reason)
+        print(f"[LinkSupervisor] {link.name} down: {reason}")
+
+    def _quiesce(self, link):
+        try:
+            link.quiesce()
+        except Exception as e:
+            print(f"[LinkSupervisor] Error quiescing {link.name}: {e}")
+        link.quiesced = True
+
+    def _attempt(self, link, now):
+        path = link.device_path()
+        ok = False
+        if os.path.exists(path):
+            link.stats.attempts += 1
+            try:
+                ok = link.reopen(path)
+            except Exception as e:
+                print(f"[LinkSupervisor] Reopen of {link.name} on {path} failed: {e}")
+        if not ok:
+            link.next_attempt = now + link.backoff.next()
+            return
+        link.port_name = path
+        link.faulted = False
+        link.quiesced = False
+        link.pending_reason = None
+        outage = link.stats.end(now)
+        print(f"[LinkSupervisor] {link.name} back on {path} after {outage * 1000:.0f} ms.")
+
+    def stats(self, now=None):
+        with self.lock:
+            return {link.name: link.stats.as_dict(now) for link in self.links}
+
+
+def sas_link(communicator, supervisor):
+    """
+    Supervise a SASCommunicator: reopen re-runs open_port (incl. the even parity sequence),
+    switches real time event reporting back on if it was on (the machine forgets it on a reset)
+    and re-reads the per game meters if they were ever swept.
+    """
+    state = {"polling": False, "real_time": False, "sweep": False}
+
+    def quiesce():
+        state["polling"] = communicator.scheduler.is_alive()
+        state["real_time"] = communicator.real_time_reporting
+        sweep = getattr(communicator, "meter_sweep", None)
+        state["sweep"] = sweep is not None and sweep.started_at is not None
+        communicator.close_port()
+
+    def reopen(port_name):
+        communicator.port_name = port_name
+        if not communicator.open_port(read_asset_number=False):
+            return False
+        communicator.start_reader()
+        if state["polling"]:
+            communicator.start_polling()
+        if state["real_time"]:
+            communicator.set_real_time_reporting(True)
+        if state["sweep"] and state["polling"]:
+            communicator.meter_sweep.refresh()
+        return True
+
+    link = SupervisedLink(f"sas:{communicator.port_name}", communicator.port_name, quiesce, reopen)
+    communicator.on_link_fault = lambda error: supervisor.report_fault(link, error)
+    return supervisor.add(link)
+
+
+def card_reader_link(card_reader, supervisor):
+    """Supervise a CardReader: polling thread stopped, port reopened with its settings, polling resumed."""
+
+    def quiesce():
+        card_reader.stop_polling()
+        card_reader.close()
+
+    link = SupervisedLink(f"cardreader:{card_reader.port_name}", card_reader.port_name, quiesce,
+                          card_reader.reopen)
+    card_reader.on_link_fault = lambda error: supervisor.report_fault(link, error)
+    return supervisor.add(link)
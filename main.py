@@ -1,6 +1,13 @@
 print("main.py started")
+from config_manager import ConfigManager
 from slot_machine_application import SlotMachineApplication
+from sas_host import SASHost
 
 if __name__ == "__main__":
-    app = SlotMachineApplication()
-    app.start() 
\ No newline at end of file
+    config = ConfigManager()
+    if config.get('host', 'links'):
+        # Bank controller mode: several SAS links from one process
+        SASHost.from_config(config).run()
+    else:
+        app = SlotMachineApplication()
+        app.start()
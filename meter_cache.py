@@ -0,0 +1,138 @@
+# Meter Cache
+# Raw meter values of the last 2F/AF responses, each with the time it came in. A caller asks
+# for meter codes and the oldest value it accepts (by default each meter's TTL): fresh values
+# come from the cache without touching the SAS line. Missing or stale meters are read with one
+# request, and callers that want meters already being read wait for that request instead of
+# sending their own (single flight).
+
+import threading
+import time
+
+DEFAULT_TTL = 10.0
+
+# Meters that move with every game or transfer age faster than the lifetime totals
+METER_TTLS = {
+    0x0C: 1.0,  # Current credits
+    0x1B: 1.0,  # Current restricted credits
+    0x05: 5.0,  # Games played
+    0x06: 5.0,  # Games won
+    0x07: 5.0,  # Games lost
+}
+
+
+class MeterFlight:
+    """One meter request in progress; the callers waiting on it block on done."""
+
+    __slots__ = ("codes", "done", "started")
+
+    def __init__(self, codes, started):
+        self.codes = codes
+        self.done = threading.Event()
+        self.started = started
+
+
+class MeterCache:
+    """Meter code -> (raw value, time it came in), with per-meter TTLs and single flight reads."""
+
+    def __init__(self, ttls=None, default_ttl=DEFAULT_TTL):
+        self.ttls = dict(METER_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.lock = threading.Lock()
+        self.values = {}     # Meter code -> raw value
+        self.updated = {}    # Meter code -> time.monotonic() of the response it came with
+        self.in_flight = {}  # Meter code -> MeterFlight reading it
+        self.hits = 0        # Meters answered from the cache
+        self.misses = 0      # Meters that had to be read from the machine
+        self.coalesced = 0   # Meters that waited on another caller's request
+
+    def ttl(self, code):
+        return self.ttls.get(code, self.default_ttl)
+
+    def update(self, block, now=None):
+        """Store the meters of a sas_meters.MeterBlock (any response, whoever asked for it)."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            for code, value in zip(block.codes, block.values):
+                self.values[code] = value
+                self.updated[code] = now
+
+    def fresh(self, codes, max_age=None, now=None):
+        """({code: raw value} of the meters young enough, [codes that are not])."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            return self._fresh(codes, max_age, now)
+
+    def _fresh(self, codes, max_age, now):
+        found = {}
+        missing = []
+        for code in codes:
+            updated = self.updated.get(code)
+            limit = self.ttl(code) if max_age is None else max_age
+            if updated is not None and now - updated <= limit:
+                found[code] = self.values[code]
+            else:
+                missing.append(code)
+        return found, missing
+
+    def get(self, codes, fetch, max_age=None, timeout=10.0):
+        """
+        {code: raw value} for codes. Meters younger than max_age (default: their TTL) come from
+        the cache; the rest are read with fetch(codes), which sends the request and returns once
+        the response is in (update() stores it). Meters another caller is already reading are
+        waited for instead. Meters that could not be read are left out.
+        """
+        started = time.monotonic()
+        with self.lock:
+            found, missing = self._fresh(codes, max_age, started)
+            self.hits += len(found)
+            if not missing:
+                return found
+            waiting = set()
+            to_read = []
+            for code in missing:
+                flight = self.in_flight.get(code)
+                if flight is None:
+                    to_read.append(code)
+                else:
+                    waiting.add(flight)
+                    self.coalesced += 1
+            own = None
+            if to_read:
+                self.misses += len(to_read)
+                own = MeterFlight(tuple(to_read), started)
+                for code in to_read:
+                    self.in_flight[code] = own
+        if own is not None:
+            try:
+                fetch(own.codes)
+            except Exception as e:
+                print(f"[MeterCache] Meter read failed: {e}")
+            finally:
+                with self.lock:
+                    for code in own.codes:
+                        if self.in_flight.get(code) is own:
+                            del self.in_flight[code]
+                own.done.set()
+        for flight in waiting:
+            flight.done.wait(max(timeout - (time.monotonic() - started), 0))
+        with self.lock:
+            # Whatever came in since this call started counts, however old max_age allows
+            for code in missing:
+                if self.updated.get(code, -1.0) >= started:
+                    found[code] = self.values[code]
+        return found
+
+    def is_reading(self):
+        return bool(self.in_flight)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses + self.coalesced
+            return {
+                "meters": len(self.values),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "hit_ratio": round(self.hits / total, 3) if total else None,
+                "in_flight": len(self.in_flight),
+            }
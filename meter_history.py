@@ -0,0 +1,435 @@
+# Meter History
+# Append-only time series of the decoded 2F/AF meter snapshots of one machine.
+# Each snapshot is stored as raw (unscaled) integers. A keyframe holds the full vector (meter
+# codes and values); the snapshots after it hold only the meters that changed, as
+# zigzag/varint deltas against the snapshot before. A keyframe is written every
+# keyframe_interval snapshots, and whenever the game or the set of meter codes changes, so any
+# segment decodes on its own. A per-minute snapshot of ten meters takes about 10-20 bytes,
+# under 1 MB a month.
+#
+# The keyframe index (<path>.idx: fixed entries of timestamp ms, file offset) is the time
+# index: a range query bisects it and reads only the segments that overlap the range. The
+# code index (meter code -> segments holding it) lets series() skip segments without the meter.
+
+import bisect
+import datetime
+import os
+import struct
+import threading
+import time
+from array import array
+
+DEFAULT_HISTORY_FILE = "meter_history.bin"
+DEFAULT_KEYFRAME_INTERVAL = 60
+
+MAGIC = b"SMH1"
+KEYFRAME = 0x4B  # 'K'
+DELTA = 0x44     # 'D'
+
+_INDEX_ENTRY = struct.Struct("<qQ")  # keyframe timestamp (ms), file offset
+
+
+def _put_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        value |= (b & 0x7F) << shift
+        if b < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _zigzag(value):
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def _unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def _to_ms(when):
+    """datetime or epoch seconds -> epoch milliseconds."""
+    if isinstance(when, datetime.datetime):
+        when = when.timestamp()
+    return int(round(when * 1000))
+
+
+class MeterSnapshot:
+    """One stored snapshot: raw meter values of one game at a point in time."""
+
+    __slots__ = ("timestamp_ms", "game_number", "command", "codes", "values")
+
+    def __init__(self, timestamp_ms, game_number, command, codes, values):
+        self.timestamp_ms = timestamp_ms
+        self.game_number = game_number
+        self.command = command
+        self.codes = codes
+        self.values = values
+
+    @property
+    def timestamp(self):
+        return self.timestamp_ms / 1000
+
+    def get(self, code, default=None):
+        try:
+            return self.values[self.codes.index(code)]
+        except ValueError:
+            return default
+
+    def as_dict(self):
+        return dict(zip(self.codes, self.values))
+
+    def __repr__(self):
+        when = datetime.datetime.fromtimestamp(self.timestamp).isoformat(timespec="seconds")
+        return f"MeterSnapshot({when} game {self.game_number}, {len(self.codes)} meters)"
+
+
+
+def _frame(kind, body):
+    out = bytearray((kind,))
+    _put_varint(out, len(body))
+    out += body
+    return bytes(out)
+
+
+def _encode_keyframe(timestamp_ms, game_number, command, codes, values):
+    body = bytearray()
+    for value in (timestamp_ms, game_number, command, len(codes)):
+        _put_varint(body, value)
+    for code in codes:
+        _put_varint(body, code)
+    for value in values:
+        _put_varint(body, value)
+    return _frame(KEYFRAME, body)
+
+
+def _encode_delta(elapsed_ms, previous, values):
+    changes = bytearray()
+    changed = 0
+    last = -1
+    for i, (old, new) in enumerate(zip(previous, values)):
+        if new != old:
+            _put_varint(changes, i - last - 1)
+            _put_varint(changes, _zigzag(new - old))
+            last = i
+            changed += 1
+    body = bytearray()
+    _put_varint(body, elapsed_ms)
+    _put_varint(body, changed)
+    body += changes
+    return _frame(DELTA, body)
+
+
+def _decode_record(data, pos, previous):
+    """
+    Decode the record at pos on top of the previous snapshot. Returns (snapshot, position of the
+    next record); raises IndexError if the record is cut short, ValueError if it is not one.
+    """
+    kind = data[pos]
+    length, i = _get_varint(data, pos + 1)
+    stop = i + length
+    if stop > len(data):
+        raise IndexError("truncated meter history record")
+    if kind == KEYFRAME:
+        timestamp_ms, i = _get_varint(data, i)
+        game_number, i = _get_varint(data, i)
+        command, i = _get_varint(data, i)
+        count, i = _get_varint(data, i)
+        codes = []
+        for _ in range(count):
+            code, i = _get_varint(data, i)
+            codes.append(code)
+        values = []
+        for _ in range(count):
+            value, i = _get_varint(data, i)
+            values.append(value)
+        return MeterSnapshot(timestamp_ms, game_number, command, tuple(codes), values), stop
+    if kind != DELTA or previous is None:
+        raise ValueError(f"Unexpected meter history record {kind:#04x} at {pos}")
+    elapsed, i = _get_varint(data, i)
+    changed, i = _get_varint(data, i)
+    values = list(previous.values)
+    index = -1
+    for _ in range(changed):
+        gap, i = _get_varint(data, i)
+        diff, i = _get_varint(data, i)
+        index += gap + 1
+        values[index] += _unzigzag(diff)
+    return MeterSnapshot(previous.timestamp_ms + elapsed, previous.game_number, previous.command,
+                         previous.codes, values), stop
+
+
+class MeterHistory:
+    """Append-only, delta compressed meter snapshot store with time and meter code indexes."""
+
+    def __init__(self, path=DEFAULT_HISTORY_FILE, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL):
+        self.path = path
+        self.index_path = path + ".idx"
+        self.keyframe_interval = keyframe_interval
+        self.lock = threading.Lock()
+        self.keyframe_times = array('q')    # Time index: timestamp (ms) of every keyframe
+        self.keyframe_offsets = array('Q')  # File offset of every keyframe
+        self.code_segments = {}             # Meter code -> segment (keyframe) numbers holding it
+        self.last = None                    # Last stored snapshot, the base of the next delta
+        self.since_keyframe = 0
+        self.appended = 0
+        self._file = None
+        self._index_file = None
+        self._open()
+
+    # --- Opening and recovery ---
+
+    def _open(self):
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < len(MAGIC):
+            with open(self.path, "wb") as f:
+                f.write(MAGIC)
+            with open(self.index_path, "wb"):
+                pass
+        else:
+            with open(self.path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"{self.path} is not a meter history file")
+            self._load_index()
+            self._recover()
+        self._file = open(self.path, "ab")
+        self._index_file = open(self.index_path, "ab")
+
+    def _load_index(self):
+        size = os.path.getsize(self.path)
+        try:
+            with open(self.index_path, "rb") as f:
+                raw = f.read()
+        except OSError:
+            raw = b""
+        raw = raw[:len(raw) - len(raw) % _INDEX_ENTRY.size]
+        entries = [entry for entry in _INDEX_ENTRY.iter_unpack(raw) if entry[1] < size]
+        if not entries and size > len(MAGIC):
+            print(f"[MeterHistory] Rebuilding the index of {self.path}")
+            entries = self._scan_keyframes()
+        for timestamp_ms, offset in entries:
+            self.keyframe_times.append(timestamp_ms)
+            self.keyframe_offsets.append(offset)
+
+    def _scan_keyframes(self):
+        """(timestamp, offset) of every keyframe, by walking all record headers (lost index only)."""
+        with open(self.path, "rb") as f:
+            data = f.read()
+        entries = []
+        pos = len(MAGIC)
+        try:
+            while pos < len(data):
+                length, body = _get_varint(data, pos + 1)
+                if data[pos] == KEYFRAME:
+                    entries.append((_get_varint(data, body)[0], pos))
+                pos = body + length
+        except IndexError:
+            pass
+        return entries
+
+    def _recover(self):
+        """Build the code index, load the last segment as the delta base and cut off a torn record."""
+        indexed = len(self.keyframe_offsets)
+        with open(self.path, "rb") as f:
+            for segment in range(indexed - 1):
+                f.seek(self.keyframe_offsets[segment])
+                head = f.read(16)
+                length, body = _get_varint(head, 1)
+                record = head + f.read(max(body + length - len(head), 0))
+                self._index_codes(_decode_record(record, 0, None)[0].codes, segment)
+            start = self.keyframe_offsets[-1] if indexed else len(MAGIC)
+            f.seek(start)
+            data = f.read()
+        snapshot = None
+        pos = 0
+        while pos < len(data):
+            try:
+                decoded, stop = _decode_record(data, pos, snapshot)
+            except (IndexError, ValueError):
+                break
+            if data[pos] == KEYFRAME:
+                if not self.keyframe_offsets or self.keyframe_offsets[-1] != start + pos:
+                    # Keyframe written but its index entry was not
+                    self.keyframe_times.append(decoded.timestamp_ms)
+                    self.keyframe_offsets.append(start + pos)
+                self._index_codes(decoded.codes, len(self.keyframe_offsets) - 1)
+                self.since_keyframe = 0
+            else:
+                self.since_keyframe += 1
+            snapshot = decoded
+            pos = stop
+        self.last = snapshot
+        end = start + pos
+        if pos < len(data):
+            print(f"[MeterHistory] Dropping {len(data) - pos} bytes of a torn record at the end of {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+            while self.keyframe_offsets and self.keyframe_offsets[-1] >= end:
+                self.keyframe_offsets.pop()
+                self.keyframe_times.pop()
+        index_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else -1
+        if index_size != len(self.keyframe_offsets) * _INDEX_ENTRY.size:
+            with open(self.index_path, "wb") as f:
+                for entry in zip(self.keyframe_times, self.keyframe_offsets):
+                    f.write(_INDEX_ENTRY.pack(*entry))
+
+    def _index_codes(self, codes, segment):
+        for code in codes:
+            segments = self.code_segments.get(code)
+            if segments is None:
+                segments = self.code_segments[code] = array('I')
+            if not segments or segments[-1] != segment:
+                segments.append(segment)
+
+    # --- Writing ---
+
+    def append(self, block, timestamp=None):
+        """Store a sas_meters.MeterBlock. Returns the stored MeterSnapshot, or None if it could not be written."""
+        return self.record(block.codes, block.values, timestamp, block.game_number, block.command)
+
+    def record(self, codes, values, timestamp=None, game_number=0, command=0x2F):
+        """Store one snapshot of raw meter values (timestamp: datetime or epoch seconds, default now)."""
+        codes = tuple(codes)
+        values = list(values)
+        timestamp_ms = _to_ms(time.time() if timestamp is None else timestamp)
+        with self.lock:
+            last = self.last
+            if last is not None and timestamp_ms < last.timestamp_ms:
+                timestamp_ms = last.timestamp_ms  # Clock stepped back: keep the time index sorted
+            keyframe = (last is None or self.since_keyframe + 1 >= self.keyframe_interval
+                        or codes != last.codes or game_number != last.game_number or command != last.command)
+            try:
+                offset = self._file.tell()
+                if keyframe:
+                    self._file.write(_encode_keyframe(timestamp_ms, game_number, command, codes, values))
+                else:
+                    self._file.write(_encode_delta(timestamp_ms - last.timestamp_ms, last.values, values))
+                self._file.flush()
+                if keyframe:
+                    self._index_file.write(_INDEX_ENTRY.pack(timestamp_ms, offset))
+                    self._index_file.flush()
+            except OSError as e:
+                print(f"[MeterHistory] Could not write {self.path}: {e}")
+                return None
+            if keyframe:
+                self.keyframe_times.append(timestamp_ms)
+                self.keyframe_offsets.append(offset)
+                self._index_codes(codes, len(self.keyframe_offsets) - 1)
+                self.since_keyframe = 0
+            else:
+                self.since_keyframe += 1
+            self.last = MeterSnapshot(timestamp_ms, game_number, command, codes, values)
+            self.appended += 1
+            return self.last
+
+    # --- Queries ---
+
+    def _segment_range(self, start_ms, end_ms):
+        times = self.keyframe_times
+        first = max(bisect.bisect_right(times, start_ms) - 1, 0) if start_ms is not None else 0
+        stop = bisect.bisect_right(times, end_ms) if end_ms is not None else len(times)
+        return first, stop
+
+    def _read_segment(self, f, segment):
+        offsets = self.keyframe_offsets
+        f.seek(offsets[segment])
+        if segment + 1 < len(offsets):
+            return f.read(offsets[segment + 1] - offsets[segment])
+        return f.read()
+
+    def snapshots(self, start=None, end=None, code=None):
+        """
+        Snapshots with start <= time <= end (datetimes or epoch seconds, None for open ends),
+        oldest first. Only the segments overlapping the range are read; with code, only those
+        that hold that meter.
+        """
+        start_ms = _to_ms(start) if start is not None else None
+        end_ms = _to_ms(end) if end is not None else None
+        result = []
+        with self.lock:
+            first, stop = self._segment_range(start_ms, end_ms)
+            if code is None:
+                segments = range(first, stop)
+            else:
+                held = self.code_segments.get(code, ())
+                segments = held[bisect.bisect_left(held, first):bisect.bisect_left(held, stop)]
+            if not segments:
+                return result
+            with open(self.path, "rb") as f:
+                for segment in segments:
+                    data = self._read_segment(f, segment)
+                    snapshot = None
+                    pos = 0
+                    while pos < len(data):
+                        snapshot, pos = _decode_record(data, pos, snapshot)
+                        if end_ms is not None and snapshot.timestamp_ms > end_ms:
+                            break
+                        if start_ms is None or snapshot.timestamp_ms >= start_ms:
+                            result.append(snapshot)
+        return result
+
+    def series(self, code, start=None, end=None):
+        """[(epoch seconds, raw value)] of one meter code between start and end."""
+        return [(s.timestamp, s.get(code)) for s in self.snapshots(start, end, code)]
+
+    def value_at(self, code, when):
+        """Raw value of a meter in the last snapshot at or before when, or None."""
+        when_ms = _to_ms(when)
+        with self.lock:
+            held = self.code_segments.get(code, ())
+            i = bisect.bisect_left(held, self._segment_range(None, when_ms)[1])
+            if i == 0:
+                return None
+            with open(self.path, "rb") as f:
+                data = self._read_segment(f, held[i - 1])
+        value = None
+        snapshot = None
+        pos = 0
+        while pos < len(data):
+            snapshot, pos = _decode_record(data, pos, snapshot)
+            if snapshot.timestamp_ms > when_ms:
+                break
+            value = snapshot.get(code)
+        return value
+
+    def change(self, code, start, end):
+        """How much a meter went up between start and end, e.g. coin-in between 14:00 and 15:00."""
+        after = self.value_at(code, end)
+        if after is None:
+            return None
+        before = self.value_at(code, start)
+        if before is None:
+            # Nothing stored before start: count from the first snapshot in the range
+            series = self.series(code, start, end)
+            if not series:
+                return None
+            before = series[0][1]
+        return after - before
+
+    def stats(self):
+        with self.lock:
+            size = self._file.tell() if self._file else os.path.getsize(self.path)
+            return {
+                "path": self.path,
+                "bytes": size,
+                "keyframes": len(self.keyframe_offsets),
+                "appended": self.appended,
+                "meter_codes": len(self.code_segments),
+                "last": self.last.timestamp_ms / 1000 if self.last else None,
+            }
+
+    def close(self):
+        with self.lock:
+            for f in (self._file, self._index_file):
+                if f:
+                    f.close()
+            self._file = None
+            self._index_file = None
@@ -0,0 +1,165 @@
+# Meter Request Planner
+# Reference: docs/sas-protocol-info.md (long polls 2F, AF and the single meter polls 10-1A)
+# Turns a set of meters (names from sas_meters.METER_CODES, or codes) into the fewest long
+# polls a machine profile allows, and merges the responses into one MeterBlock.
+# A profile says which request types the machine answers and how much fits in one request:
+# 2F carries up to MAX_2F_METERS one byte codes, AF two byte codes as long as the response
+# fits its length byte; a meter left alone in a request goes out as its single meter poll
+# where it has one, whose response is smaller.
+
+from sas_commands import MAX_2F_METERS, command_library
+from sas_meters import (COMMAND_EXTENDED_METERS, COMMAND_METERS, METER_CODES, SINGLE_METER_POLLS,
+                        MeterBlock, meter_info)
+
+MAX_RESPONSE_DATA = 255  # The length byte counts the game number and the meter entries
+
+SINGLE_POLL_FOR_CODE = {code: poll for poll, code in SINGLE_METER_POLLS.items()}
+METER_NAMES = {name: code for code, (name, _) in METER_CODES.items()}
+
+
+class MeterProfile:
+    """What meter requests a kind of machine answers."""
+
+    __slots__ = ("name", "meters_2f", "extended", "single_polls", "max_2f", "unsupported")
+
+    def __init__(self, name, meters_2f=True, extended=False, single_polls=True, max_2f=MAX_2F_METERS,
+                 unsupported=()):
+        self.name = name
+        self.meters_2f = meters_2f        # Answers 2F
+        self.extended = extended          # Answers AF
+        self.single_polls = single_polls  # Answers the single meter polls 10-1A
+        self.max_2f = max_2f
+        self.unsupported = frozenset(unsupported)
+
+    def supports(self, code, game_number=0):
+        if code in self.unsupported:
+            return False
+        if self.extended:
+            return True
+        if self.meters_2f and code <= 0xFF:
+            return True
+        # Single meter polls read machine totals only
+        return self.single_polls and game_number == 0 and code in SINGLE_POLL_FOR_CODE
+
+    def __repr__(self):
+        return f"MeterProfile({self.name})"
+
+
+PROFILES = {
+    "2f": MeterProfile("2f"),
+    "af": MeterProfile("af", extended=True),
+    "single": MeterProfile("single", meters_2f=False),
+}
+
+
+def profile_for(config):
+    """[meters] profile, else AF for the casinos whose machines were read with AF (as meter_command does)."""
+    name = config.get('meters', 'profile', fallback=None) if config is not None else None
+    if name in PROFILES:
+        return PROFILES[name]
+    casino_id = int(config.get('casino', 'casinoid', fallback=8)) if config is not None else 8
+    return PROFILES["af"] if casino_id in (8, 11, 7) else PROFILES["2f"]
+
+
+def meter_codes(meters):
+    """Meter codes for names (sas_meters.METER_CODES) or codes. Raises KeyError for an unknown name."""
+    return [METER_NAMES[m] if isinstance(m, str) else m for m in meters]
+
+
+class MeterRequest:
+    """One long poll of a plan."""
+
+    __slots__ = ("kind", "codes", "frame")
+
+    def __init__(self, kind, codes, frame):
+        self.kind = kind    # COMMAND_METERS, COMMAND_EXTENDED_METERS or a single meter poll
+        self.codes = codes  # Meter codes the response carries
+        self.frame = frame
+
+    def __repr__(self):
+        return f"MeterRequest({self.kind:02X} {' '.join(f'{c:02X}' for c in self.codes)})"
+
+
+class MeterPlan:
+    """The requests for a meter set, and the meters the profile cannot read."""
+
+    def __init__(self, requests, unsupported):
+        self.requests = requests
+        self.unsupported = unsupported
+
+    @property
+    def frames(self):
+        return [request.frame for request in self.requests]
+
+    def __len__(self):
+        return len(self.requests)
+
+    def __repr__(self):
+        return f"MeterPlan({self.requests}, unsupported={self.unsupported})"
+
+
+def _entry_size(code, extended):
+    # 2F: code(1) value; AF: code(2) size(1) value
+    return (3 if extended else 1) + meter_info(code)[1]
+
+
+def _pack(codes, extended, max_count):
+    """Split codes into requests: at most max_count codes and a response that fits its length byte."""
+    chunks = []
+    chunk = []
+    size = 2  # Game number
+    for code in codes:
+        entry = _entry_size(code, extended)
+        if chunk and (len(chunk) >= max_count or size + entry > MAX_RESPONSE_DATA):
+            chunks.append(chunk)
+            chunk = []
+            size = 2
+        chunk.append(code)
+        size += entry
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def plan_meters(meters, profile=PROFILES["2f"], address=0x01, game_number=0):
+    """Fewest long polls that read meters (names or codes) from a machine with this profile."""
+    commands = command_library(address)
+    codes = sorted(set(meter_codes(meters)))
+    unsupported = [code for code in codes if not profile.supports(code, game_number)]
+    codes = [code for code in codes if code not in unsupported]
+    extended = profile.extended
+    if extended:
+        # AF takes every code, so only the response size splits it
+        chunks = _pack(codes, True, len(codes) or 1)
+    elif profile.meters_2f:
+        chunks = _pack(codes, False, profile.max_2f)
+    else:
+        chunks = [[code] for code in codes]
+    requests = []
+    for chunk in chunks:
+        if len(chunk) == 1 and game_number == 0 and profile.single_polls and chunk[0] in SINGLE_POLL_FOR_CODE:
+            poll = SINGLE_POLL_FOR_CODE[chunk[0]]
+            requests.append(MeterRequest(poll, tuple(chunk), commands.frame(bytes((poll,)))))
+        else:
+            kind = COMMAND_EXTENDED_METERS if extended else COMMAND_METERS
+            requests.append(MeterRequest(kind, tuple(chunk), commands.meters(chunk, game_number, extended)))
+    return MeterPlan(requests, unsupported)
+
+
+def merge_blocks(blocks, game_number=0):
+    """One MeterBlock of the meters of several responses (a later value of a code wins)."""
+    merged = {}
+    complete = True
+    for block in blocks:
+        if block is None:
+            complete = False
+            continue
+        complete = complete and block.complete
+        for code, value in zip(block.codes, block.values):
+            merged[code] = value
+    result = MeterBlock(0, game_number)
+    for code in sorted(merged):
+        result.codes.append(code)
+        result.values.append(merged[code])
+    result.complete = complete
+    return result
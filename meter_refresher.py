@@ -0,0 +1,210 @@
+# Event Driven Meter Refresh
+# Reference: docs/sas-protocol-info.md (exception codes, long poll 2F)
+# Instead of reading one fixed meter set on a timer, meters are read again when an exception
+# says they may have changed: a game end touches coin in/out and the game counters, a bill the
+# bill meters, an AFT transfer the electronic in/out meters. Marked meters are requested with
+# the fewest polls meter_planner finds once a burst of events has settled, and no meter is read
+# more often than min_interval. Meters no event touched are read again only after max_age.
+#
+# Game start/end (7E/7F) are only reported with real time event reporting on; without it the
+# max_age refresh keeps the game meters from going stale.
+
+import threading
+import time
+
+from meter_planner import PROFILES, plan_meters, profile_for
+
+DEFAULT_SETTLE = 0.5            # Quiet time after the last event before its meters are requested
+DEFAULT_MIN_INTERVAL = 10.0     # A meter is read at most this often, however many events touch it
+DEFAULT_MAX_AGE = 600.0         # Meters no event touched are read again after this long
+DEFAULT_RESPONSE_TIMEOUT = 3.0  # A request without a response by then is sent again
+
+# Meter codes each exception can change (sas_meters.METER_CODES names)
+GAME_METERS = (0x00, 0x01, 0x02, 0x05, 0x06, 0x07, 0x0C, 0xA0, 0xB8)
+BILL_METERS = (0x0B, 0x0C, 0x24, 0x3E, 0x3F)
+AFT_METERS = (0x0C, 0x17, 0x18, 0x1B, 0xA2, 0xBA)
+TICKET_METERS = (0x0C, 0x0D, 0x0E, 0x15, 0x16, 0x28, 0x2C)
+HANDPAY_METERS = (0x02, 0x03, 0x0C, 0x23)
+
+EVENT_METERS = {
+    0x3D: TICKET_METERS,                  # Cash out ticket printed
+    0x3E: HANDPAY_METERS,                 # Handpay validated
+    0x47: BILL_METERS,                    # $1 - $100 bill accepted (no real time data)
+    0x48: BILL_METERS,
+    0x49: BILL_METERS,
+    0x4A: BILL_METERS,
+    0x4B: BILL_METERS,
+    0x4C: BILL_METERS,
+    0x4D: BILL_METERS,                    # $2 bill accepted
+    0x4E: BILL_METERS,                    # $500 bill accepted
+    0x4F: BILL_METERS,                    # Bill accepted (real time)
+    0x50: BILL_METERS,                    # $200 bill accepted
+    0x51: HANDPAY_METERS,                 # Handpay pending
+    0x52: HANDPAY_METERS,                 # Handpay reset
+    0x54: (0x0C, 0x1D, 0x20),             # Progressive win
+    0x66: (0x04, 0x0C),                   # Cash out button pressed
+    0x68: TICKET_METERS,                  # Ticket transfer complete
+    0x69: AFT_METERS,                     # AFT transfer complete
+    0x7C: (0x0C, 0x1E),                   # Legacy bonus pay awarded
+    0x7E: (0x00, 0x0C, 0xA0),             # Game started: wager taken
+    0x7F: GAME_METERS,                    # Game ended
+}
+
+
+class MeterRefresher:
+    """
+    Marks meters stale on exceptions and requests just those. send(name, frame) queues a long
+    poll; meter responses come back through on_meter_block(block).
+    """
+
+    def __init__(self, send, address=0x01, event_meters=EVENT_METERS, settle=DEFAULT_SETTLE,
+                 min_interval=DEFAULT_MIN_INTERVAL, max_age=DEFAULT_MAX_AGE,
+                 response_timeout=DEFAULT_RESPONSE_TIMEOUT, profile=PROFILES["2f"]):
+        self.send = send
+        self.address = address
+        self.profile = profile
+        self.event_meters = event_meters
+        self.tracked = sorted({code for codes in event_meters.values() for code in codes})
+        self.settle = settle
+        self.min_interval = min_interval
+        self.max_age = max_age
+        self.response_timeout = response_timeout
+        self.condition = threading.Condition()
+        self.refreshed = {}  # Meter code -> time its value last came in
+        self.dirty = {}      # Meter code -> time of the first event that marked it
+        self.in_flight = {}  # Meter code -> time its request was queued
+        self.last_event_at = None
+        self.thread = None
+        self.running = False
+        self.events = 0
+        self.coalesced = 0  # Marks of meters that were already waiting for a refresh
+        self.requests = 0
+        self.request_bytes = 0
+        self.meters_requested = 0
+        self.aged = 0       # Meters requested because of max_age, not an event
+        self.timeouts = 0
+
+    def on_event(self, event, now=None):
+        """sas_events.SASEvent subscriber: mark the meters the event can change."""
+        codes = self.event_meters.get(event.code)
+        if not codes or event.address != self.address:
+            return
+        now = time.monotonic() if now is None else now
+        with self.condition:
+            self.events += 1
+            for code in codes:
+                if code in self.dirty:
+                    self.coalesced += 1
+                else:
+                    self.dirty[code] = now
+            self.last_event_at = now
+            self.condition.notify_all()
+
+    def on_meter_block(self, block, now=None):
+        """SasMoney meter listener: the meters of a decoded 2F/AF response are fresh."""
+        if block.game_number:
+            return  # Meters of one game, not the machine totals
+        now = time.monotonic() if now is None else now
+        with self.condition:
+            for code in block.codes:
+                self.refreshed[code] = now
+                if self.in_flight.pop(code, None) is None:
+                    # Read by somebody else (get_meter): that covers the events before it too
+                    self.dirty.pop(code, None)
+            self.condition.notify_all()
+
+    def run_once(self, now=None):
+        """Queue the due meter requests. Returns the time until the next step is due."""
+        now = time.monotonic() if now is None else now
+        frames = []
+        with self.condition:
+            next_due = self.max_age
+            for code, sent in list(self.in_flight.items()):
+                if now - sent >= self.response_timeout:
+                    del self.in_flight[code]
+                    self.dirty.setdefault(code, sent)
+                    self.timeouts += 1
+                else:
+                    next_due = min(next_due, self.response_timeout - (now - sent))
+            quiet = self.last_event_at is None or now - self.last_event_at >= self.settle
+            due = []
+            for code in self.tracked:
+                if code in self.in_flight:
+                    continue
+                last = self.refreshed.get(code)
+                marked = self.dirty.get(code)
+                if marked is not None:
+                    # Wait for a burst of events to settle, but not longer than min_interval
+                    if not quiet and now - marked < self.min_interval:
+                        next_due = min(next_due, self.settle - (now - self.last_event_at),
+                                       self.min_interval - (now - marked))
+                    elif last is not None and now - last < self.min_interval:
+                        next_due = min(next_due, self.min_interval - (now - last))
+                    else:
+                        due.append(code)
+                elif last is None or now - last >= self.max_age:
+                    due.append(code)
+                    self.aged += 1
+                else:
+                    next_due = min(next_due, self.max_age - (now - last))
+            if due:
+                frames = plan_meters(due, self.profile, self.address).frames
+            for code in due:
+                self.dirty.pop(code, None)
+                self.in_flight[code] = now
+            self.requests += len(frames)
+            self.request_bytes += sum(len(frame) for frame in frames)
+            self.meters_requested += len(due)
+        for frame in frames:
+            self.send("meter-refresh", frame)
+        return max(next_due, 0.01)
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="meter-refresher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1)
+        self.thread = None
+
+    def _run(self):
+        while self.running:
+            try:
+                timeout = self.run_once()
+            except Exception as e:
+                print(f"[MeterRefresher] Error: {e}")
+                timeout = self.min_interval
+            with self.condition:
+                if self.running:
+                    self.condition.wait(timeout)
+
+    def stats(self):
+        with self.condition:
+            return {
+                "events": self.events,
+                "coalesced": self.coalesced,
+                "requests": self.requests,
+                "request_bytes": self.request_bytes,
+                "meters_requested": self.meters_requested,
+                "aged": self.aged,
+                "timeouts": self.timeouts,
+                "dirty": len(self.dirty),
+                "in_flight": len(self.in_flight),
+            }
+
+
+def attach_meter_refresher(comm, **options):
+    """MeterRefresher fed by a SASCommunicator's events and meter responses (not started)."""
+    options.setdefault("profile", profile_for(comm.global_config))
+    refresher = MeterRefresher(lambda name, frame: comm.sas_send_command_with_queue(name, frame, 0),
+                               comm.address, **options)
+    comm.events.subscribe(refresher.on_event, refresher.event_meters.keys())
+    comm.sas_money.meter_listeners.append(refresher.on_meter_block)
+    return refresher
@@ -0,0 +1,207 @@
+# Per Game Meter Sweep
+# Reference: docs/sas-protocol-info.md (long polls 56, 52 and 2F with a game number)
+# Reads the enabled game numbers (56), then the meters of every game: 52 (coin in/out, jackpot,
+# games played) and a 2F for the game's other meters. The requests are pipelined, a few at a
+# time, at the scheduler's idle priority, so they only take slots no AFT, exception or meter
+# request wants; money transactions never queue behind the sweep. Every per game meter block
+# (the sweep's or anybody else's) lands in a GameMeterTable.
+# A sweep only starts once the scheduler owns the line: before that every request would be
+# written straight to the port, back to back with the machine's answers. After a link reopen the
+# supervisor calls refresh(): the machine may have been reset or reconfigured while it was away.
+
+import threading
+import time
+from collections import deque
+
+import bcd
+from meter_planner import plan_meters, profile_for
+from sas_meters import scaled_meters
+from sas_requests import RetryPolicy
+from sas_scheduler import PRIORITY_IDLE
+
+COMMAND_ENABLED_GAMES = 0x56
+
+GAME_2F_METERS = (0x06, 0x07)  # Games won and lost: 52 carries coin in/out, jackpot and games played
+DEFAULT_WINDOW = 2             # Sweep requests queued or on the line at once
+SWEEP_POLICY = RetryPolicy(timeout=1.0, retries=1)
+
+
+def enabled_game_numbers(frame):
+    """Game numbers of a 56 response: address, 56, length, count, count x 2 byte BCD game number, CRC."""
+    if len(frame) < 6 or frame[1] != COMMAND_ENABLED_GAMES:
+        return []
+    count = min(frame[3], (len(frame) - 6) // 2)
+    return bcd.decode_run(frame, 4, 2, count)
+
+
+class GameMeterTable:
+    """Game number -> {meter code: raw value}, with the time each game's meters last came in."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.meters = {}
+        self.updated = {}
+        self.enabled_games = []
+
+    def update(self, block, now=None):
+        """Store a sas_meters.MeterBlock of one game (meter listener; machine totals are skipped)."""
+        if not block.game_number:
+            return
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            meters = self.meters.setdefault(block.game_number, {})
+            for code, value in zip(block.codes, block.values):
+                meters[code] = value
+            self.updated[block.game_number] = now
+
+    def game(self, game_number):
+        """{meter code: raw value} of one game (a copy; empty if it was never read)."""
+        with self.lock:
+            return dict(self.meters.get(game_number, {}))
+
+    def games(self):
+        with self.lock:
+            return sorted(self.meters)
+
+    def as_dict(self):
+        """{game number: {meter name: value}} with the meter scales applied."""
+        with self.lock:
+            return {game: scaled_meters(sorted(meters.items())) for game, meters in sorted(self.meters.items())}
+
+
+class MeterSweep:
+    """
+    Reads the meters of every enabled game into a GameMeterTable. start() returns at once;
+    the sweep advances as responses come in (on the reader thread) and wait() blocks until done.
+    """
+
+    def __init__(self, money, table=None, game_codes=GAME_2F_METERS, window=DEFAULT_WINDOW, policy=SWEEP_POLICY):
+        self.money = money  # SasMoney: its communicator sends, its meter handler decodes
+        self.table = table or GameMeterTable()
+        self.game_codes = game_codes
+        self.window = window
+        self.policy = policy
+        self.lock = threading.Lock()
+        self.queue = deque()  # (game number, request frame) not yet submitted
+        self.outstanding = 0
+        self.pumping = False
+        self.done = threading.Event()
+        self.done.set()
+        self.started_at = None
+        self.rerun = False  # refresh() came in while a sweep was running
+        self.duration = None
+        self.sweeps = 0
+        self.requests = 0
+        self.failures = 0
+        money.meter_listeners.append(self.table.update)
+
+    def start(self):
+        """Begin a sweep. Returns False if one is still running or the scheduler is not polling."""
+        if not self.money.communicator.scheduler.is_alive():
+            print("[MeterSweep] Scheduler not running; sweep not started")
+            return False
+        with self.lock:
+            if not self.done.is_set():
+                return False
+            self.done.clear()
+            self.started_at = time.monotonic()
+            self.failures = 0
+        print("[MeterSweep] Reading enabled games...")
+        self._submit("EnabledGameNumbers", self.money.commands.enabled_games, self._on_enabled_games,
+                     enabled_game_numbers)
+        return True
+
+    def refresh(self):
+        """Sweep again: now, or as soon as the running sweep is done (its answers may predate a reopen)."""
+        with self.lock:
+            if not self.done.is_set():
+                self.rerun = True
+                return True
+        return self.start()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+    def is_running(self):
+        return not self.done.is_set()
+
+    def handle_enabled_games(self, frame):
+        """Dispatcher handler for 56 responses nobody waited for."""
+        self.table.enabled_games = enabled_game_numbers(frame)
+        print(f"[MeterSweep] Enabled games: {self.table.enabled_games}")
+
+    def _submit(self, name, frame, on_done, parse):
+        self.requests += 1
+        future = self.money.communicator.request(name, frame, self.policy, parse=parse, priority=PRIORITY_IDLE)
+        future.add_done_callback(on_done)
+
+    def _on_enabled_games(self, future):
+        try:
+            games = future.result()
+        except Exception as e:
+            print(f"[MeterSweep] No enabled games response: {e}")
+            games = []
+        self.table.enabled_games = games
+        if self.money.meter_profile is None:
+            self.money.meter_profile = profile_for(self.money.config)
+        profile = self.money.meter_profile
+        address = self.money.address
+        with self.lock:
+            for game in games:
+                self.queue.append((game, self.money.commands.game_meters(game)))
+                if self.game_codes:
+                    for frame in plan_meters(self.game_codes, profile, address, game).frames:
+                        self.queue.append((game, frame))
+        self._pump()
+
+    def _on_meters(self, future):
+        try:
+            if future.result() is None:
+                self.failures += 1
+        except Exception as e:
+            self.failures += 1
+            print(f"[MeterSweep] Game meter request failed: {e}")
+        with self.lock:
+            self.outstanding -= 1
+        self._pump()
+
+    def _pump(self):
+        """Keep up to window requests in flight; finish the sweep once all are answered."""
+        with self.lock:
+            if self.pumping:
+                return  # The caller further up the stack keeps going
+            self.pumping = True
+        while True:
+            with self.lock:
+                if self.outstanding >= self.window or not self.queue:
+                    self.pumping = False
+                    finished = not self.queue and self.outstanding == 0 and not self.done.is_set()
+                    break
+                game, frame = self.queue.popleft()
+                self.outstanding += 1
+            self._submit(f"GameMeters_{game}", frame, self._on_meters, self.money.accept_meter_frame)
+        if finished:
+            self._finish()
+
+    def _finish(self):
+        with self.lock:
+            if self.done.is_set():
+                return
+            self.duration = time.monotonic() - self.started_at
+            self.sweeps += 1
+            rerun, self.rerun = self.rerun, False
+            self.done.set()
+        print(f"[MeterSweep] {len(self.table.enabled_games)} games read in {self.duration:.2f} s"
+              f" ({self.failures} failed requests)")
+        if rerun:
+            self.start()
+
+    def stats(self):
+        return {
+            "running": self.is_running(),
+            "sweeps": self.sweeps,
+            "games": len(self.table.enabled_games),
+            "requests": self.requests,
+            "failures": self.failures,
+            "last_duration_s": round(self.duration, 3) if self.duration is not None else None,
+        }
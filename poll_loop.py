@@ -0,0 +1,113 @@
+# Periodic Poll Loop
+# One long-lived thread calls tick() on a fixed grid of time.monotonic() deadlines, so the
+# period does not drift by however long tick() took. Late cycles are measured as jitter;
+# a tick that runs past the next deadline is an overrun and the missed deadlines are skipped.
+
+import threading
+import time
+
+DEFAULT_POLL_INTERVAL = 0.04  # 40 ms like the working code
+
+
+def poll_interval_for(config, device_type_id):
+    """
+    Poll cadence in seconds for a device type, from settings.ini:
+    [sas] pollintervalms_<devicetypeid>, else [sas] pollintervalms, else 40 ms.
+    """
+    interval_ms = config.getint('sas', f'pollintervalms_{device_type_id}', 0)
+    if interval_ms <= 0:
+        interval_ms = config.getint('sas', 'pollintervalms', 0)
+    if interval_ms <= 0:
+        return DEFAULT_POLL_INTERVAL
+    return interval_ms / 1000.0
+
+
+class PollLoop:
+    """Calls tick() every interval seconds on a dedicated thread and keeps timing statistics."""
+
+    def __init__(self, tick, interval=DEFAULT_POLL_INTERVAL, name="sas-poll"):
+        self.tick = tick
+        self.interval = interval
+        self.name = name
+        self.thread = None
+        self.running = False
+        self.wakeup = threading.Event()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.cycles = 0
+        self.overruns = 0
+        self.missed_ticks = 0
+        self.total_jitter = 0.0
+        self.max_jitter = 0.0
+        self.total_tick_time = 0.0
+        self.max_tick_time = 0.0
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.running = True
+        self.wakeup.clear()
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+        print(f"[PollLoop] {self.name} started, interval {self.interval * 1000:.0f} ms.")
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1)
+        self.thread = None
+        print(f"[PollLoop] {self.name} stopped.")
+
+    def is_alive(self):
+        return bool(self.thread and self.thread.is_alive())
+
+    def is_loop_thread(self):
+        return self.thread is threading.current_thread()
+
+    def _run(self):
+        deadline = time.monotonic()
+        while self.running:
+            delay = deadline - time.monotonic()
+            if delay > 0 and self.wakeup.wait(delay):
+                break  # stop() was called
+            started = time.monotonic()
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"[PollLoop] {self.name} tick error: {e}")
+            deadline = self.record_cycle(deadline, started, time.monotonic())
+
+    def record_cycle(self, deadline, started, finished):
+        """Record one cycle and return the next deadline (also used by loops driven elsewhere)."""
+        jitter = started - deadline
+        tick_time = finished - started
+        self.cycles += 1
+        self.total_jitter += jitter
+        if jitter > self.max_jitter:
+            self.max_jitter = jitter
+        self.total_tick_time += tick_time
+        if tick_time > self.max_tick_time:
+            self.max_tick_time = tick_time
+        deadline += self.interval
+        if finished > deadline:
+            # Overrun: stay on the grid and skip the deadlines already passed
+            missed = int((finished - deadline) // self.interval) + 1
+            self.overruns += 1
+            self.missed_ticks += missed
+            deadline += missed * self.interval
+        return deadline
+
+    def stats(self):
+        cycles = self.cycles or 1
+        return {
+            "interval_ms": round(self.interval * 1000, 2),
+            "cycles": self.cycles,
+            "overruns": self.overruns,
+            "missed_ticks": self.missed_ticks,
+            "avg_jitter_ms": round(self.total_jitter / cycles * 1000, 3),
+            "max_jitter_ms": round(self.max_jitter * 1000, 3),
+            "avg_tick_ms": round(self.total_tick_time / cycles * 1000, 3),
+            "max_tick_ms": round(self.max_tick_time * 1000, 3),
+        }
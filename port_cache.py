@@ -0,0 +1,154 @@
+# Serial Port Fingerprint Cache
+# Discovery results stored per stable device identity (/dev/serial/by-id link, else USB
+# vid:pid:serial, else the device path), so a restart only has to confirm each known port
+# with one quick probe. Full discovery runs only when a cached device does not answer as
+# recorded, or no SAS port is known.
+
+import datetime
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from port_discovery import (ROLE_SAS, DiscoveryResult, PortReport, ProbeResult, discover_ports,
+                            verification_probe)
+
+BY_ID_DIR = "/dev/serial/by-id"
+DEFAULT_CACHE_FILE = "port_cache.json"
+CACHE_VERSION = 1
+
+# Fingerprint fields kept in the cache
+CACHED_FIELDS = ("role", "device_type", "parity", "address", "asset_number", "bill_acceptor_type",
+                 "sas_version", "serial_number")
+
+
+def by_id_link(port_name, by_id_dir=BY_ID_DIR):
+    """The /dev/serial/by-id link pointing at port_name, or None."""
+    real = os.path.realpath(port_name)
+    try:
+        for entry in sorted(os.listdir(by_id_dir)):
+            link = os.path.join(by_id_dir, entry)
+            if os.path.realpath(link) == real:
+                return link
+    except OSError:
+        pass
+    return None
+
+
+def device_identity(port_name, by_id_dir=BY_ID_DIR):
+    """Stable identity of the device behind port_name, surviving ttyUSB renumbering."""
+    real = os.path.realpath(port_name)
+    link = by_id_link(port_name, by_id_dir)
+    if link:
+        return f"by-id:{os.path.basename(link)}"
+    try:
+        import serial.tools.list_ports
+        for info in serial.tools.list_ports.comports():
+            if os.path.realpath(info.device) == real and info.vid is not None:
+                return f"usb:{info.vid:04X}:{info.pid:04X}:{info.serial_number or ''}:{info.location or ''}"
+    except Exception:
+        pass
+    return f"path:{real}"
+
+
+class PortCache:
+    """JSON file of identity -> fingerprint (role, device type, parity mode, asset number ...)."""
+
+    def __init__(self, path=DEFAULT_CACHE_FILE):
+        self.path = path
+        self.devices = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                self.devices = data.get("devices", {})
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"[PortCache] Ignoring unreadable cache {self.path}: {e}")
+            self.devices = {}
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"version": CACHE_VERSION, "devices": self.devices}, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"[PortCache] Could not save {self.path}: {e}")
+
+    def lookup(self, identity):
+        return self.devices.get(identity)
+
+    def store(self, identity, port_name, info):
+        entry = {k: info[k] for k in CACHED_FIELDS if k in info}
+        entry["last_port"] = port_name
+        entry["verified_at"] = datetime.datetime.now().isoformat(timespec="seconds")
+        self.devices[identity] = entry
+
+    def forget(self, identity):
+        self.devices.pop(identity, None)
+
+    def update_from(self, result, identities):
+        """Record every port with a role from a discovery result."""
+        for port_name, report in result.reports.items():
+            if report.role:
+                self.store(identities[port_name], port_name, report.info)
+        self.save()
+
+
+def verify_port(port_name, cached):
+    """Confirm a cached fingerprint with its single probe. Returns (PortReport, ok)."""
+    report = PortReport(port_name)
+    started = time.monotonic()
+    name, probe = verification_probe(cached)
+    try:
+        info = probe(port_name)
+        report.probes.append(ProbeResult(name, time.monotonic() - started, info))
+    except Exception as e:
+        info = None
+        report.probes.append(ProbeResult(name, time.monotonic() - started, error=str(e)))
+    report.elapsed = time.monotonic() - started
+    # The same machine must answer: a different asset number means the cabling changed
+    ok = info is not None and (cached.get("asset_number") is None or
+                               info.get("asset_number") in (None, cached["asset_number"]))
+    if ok:
+        report.info = info
+    return report, ok
+
+
+def discover_with_cache(port_names, cache):
+    """
+    Verify cached ports (one probe each, all at once). If every cached port answers as recorded
+    and a SAS port is among them, that is the result; otherwise run full discovery on the ports
+    that were not confirmed. The cache is updated either way.
+    """
+    started = time.monotonic()
+    port_names = list(port_names)
+    identities = {name: device_identity(name) for name in port_names}
+    cached = {name: cache.lookup(identities[name]) for name in port_names}
+    cached = {name: entry for name, entry in cached.items() if entry and verification_probe(entry)}
+
+    verified = []
+    all_ok = bool(cached)
+    if cached:
+        with ThreadPoolExecutor(max_workers=len(cached), thread_name_prefix="port-verify") as pool:
+            for report, ok in pool.map(lambda name: verify_port(name, cached[name]), cached):
+                if ok:
+                    verified.append(report)
+                else:
+                    all_ok = False
+                    cache.forget(identities[report.port_name])
+                    print(f"[PortCache] {report.port_name} no longer matches its cached fingerprint.")
+
+    if all_ok and any(r.role == ROLE_SAS for r in verified):
+        result = DiscoveryResult(verified, time.monotonic() - started)
+        print(f"[PortCache] Cached port mapping confirmed in {result.elapsed * 1000:.0f} ms.")
+    else:
+        confirmed = {r.port_name for r in verified}
+        rest = discover_ports(name for name in port_names if name not in confirmed)
+        result = DiscoveryResult(verified + list(rest.reports.values()), time.monotonic() - started)
+    cache.update_from(result, identities)
+    return result
@@ -0,0 +1,266 @@
+# Serial Port Discovery
+# Probes every candidate port at the same time (one worker thread per port) with short,
+# protocol-specific fingerprint probes and assigns the SAS, card reader and bill acceptor
+# roles in one pass. Probes on one port run in sequence, since each needs its own line
+# settings; the cheapest and most important (SAS) go first.
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import serial
+
+from sas_commands import command_library
+from sas_frame_parser import split_frames
+from sas_reader import read_until_gap
+from sas_transmitter import WakeupBitTransmitter
+
+ROLE_SAS = "sas"
+ROLE_CARD_READER = "cardreader"
+ROLE_BILL_ACCEPTOR = "billacceptor"
+
+PARITY_WAKEUP = "wakeup"  # 9th bit emulated with mark/space parity (device types other than 1, 4)
+PARITY_EVEN = "even"      # Novomatic/Octavian: whole command written with even parity
+
+SAS_RESPONSE_TIMEOUT = 0.15
+DEVICE_RESPONSE_TIMEOUT = 0.2  # Card reader and bill acceptor status replies
+CARD_READER_POLL = bytes.fromhex("02000235310307")
+ID003_STATUS_REQUEST = bytes.fromhex("FC05112756")
+MEI_STATUS_REQUEST = bytes.fromhex("0208107F1C100300")
+
+
+class ProbeResult:
+    """Outcome of one fingerprint probe."""
+
+    def __init__(self, name, elapsed, info=None, error=None):
+        self.name = name
+        self.elapsed = elapsed
+        self.info = info
+        self.error = error
+
+    @property
+    def matched(self):
+        return self.info is not None
+
+    def as_dict(self):
+        result = {"probe": self.name, "ms": round(self.elapsed * 1000, 1), "matched": self.matched}
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+def _open(port_name, baudrate, parity=serial.PARITY_NONE, bytesize=serial.EIGHTBITS, timeout=0.15):
+    port = serial.Serial()
+    port.port = port_name
+    port.baudrate = baudrate
+    port.bytesize = bytesize
+    port.parity = parity
+    port.stopbits = serial.STOPBITS_ONE
+    port.timeout = timeout
+    port.xonxoff = False
+    port.rtscts = False
+    port.dsrdtr = False
+    port.open()
+    port.reset_input_buffer()
+    return port
+
+
+def _sas_long_poll(port, parity_mode, command, expected):
+    """Send one long poll and return the first response frame with the expected command byte."""
+    if parity_mode == PARITY_EVEN:
+        port.write(command)
+    else:
+        WakeupBitTransmitter(port).send(command)
+    data = read_until_gap(port, 256, SAS_RESPONSE_TIMEOUT)
+    frames, rest = split_frames(data, command[0])
+    for frame in frames:
+        if len(frame) > 2 and frame[1] == expected and frame.crc_ok:
+            return frame
+    return None
+
+
+def probe_sas(port_name, parity_mode, address=0x01, device_type=None):
+    """SAS fingerprint: a CRC-valid 0x54 version reply, then the asset number (0x73) if available."""
+    if device_type is None:
+        device_type = 1 if parity_mode == PARITY_EVEN else 8
+    parity = serial.PARITY_EVEN if parity_mode == PARITY_EVEN else serial.PARITY_NONE
+    commands = command_library(address)
+    port = _open(port_name, 19200, parity, timeout=SAS_RESPONSE_TIMEOUT)
+    try:
+        version = _sas_long_poll(port, parity_mode, commands.sas_version, 0x54)
+        if version is None:
+            return None
+        data = version.data
+        info = {
+            "role": ROLE_SAS,
+            "device_type": device_type,
+            "parity": parity_mode,
+            "address": f"{address:02X}",
+            "sas_version": bytes(data[0:3]).decode('ascii', 'replace'),
+            "serial_number": bytes(data[3:]).decode('ascii', 'replace'),
+            "asset_number": None,
+        }
+        asset = _sas_long_poll(port, parity_mode, commands.read_asset_number, 0x73)
+        if asset is not None and len(asset) >= 8:
+            info["asset_number"] = int.from_bytes(asset[4:8], 'little')
+        return info
+    finally:
+        port.close()
+
+
+def probe_card_reader(port_name):
+    """Card reader fingerprint: ACK (06) or an STX framed reply to the status poll."""
+    port = _open(port_name, 9600, timeout=DEVICE_RESPONSE_TIMEOUT)
+    try:
+        port.write(CARD_READER_POLL)
+        response = read_until_gap(port, 64, DEVICE_RESPONSE_TIMEOUT)
+        if response[:1] in (b"\x06", b"\x02"):
+            return {"role": ROLE_CARD_READER}
+        return None
+    finally:
+        port.close()
+
+
+def probe_id003(port_name):
+    """ID-003 bill acceptor (type 1): FC sync byte in the reply to a status request, 8E1."""
+    port = _open(port_name, 9600, serial.PARITY_EVEN, timeout=DEVICE_RESPONSE_TIMEOUT)
+    try:
+        port.write(ID003_STATUS_REQUEST)
+        if read_until_gap(port, 64, DEVICE_RESPONSE_TIMEOUT)[:1] == b"\xFC":
+            return {"role": ROLE_BILL_ACCEPTOR, "bill_acceptor_type": 1}
+        return None
+    finally:
+        port.close()
+
+
+def probe_mei(port_name):
+    """MEI EBDS bill acceptor (type 2): STX framed reply to a status request, 7E1."""
+    port = _open(port_name, 9600, serial.PARITY_EVEN, serial.SEVENBITS, timeout=DEVICE_RESPONSE_TIMEOUT)
+    try:
+        port.write(MEI_STATUS_REQUEST)
+        if read_until_gap(port, 64, DEVICE_RESPONSE_TIMEOUT)[:1] == b"\x02":
+            return {"role": ROLE_BILL_ACCEPTOR, "bill_acceptor_type": 2}
+        return None
+    finally:
+        port.close()
+
+
+def probe_bill_acceptor(port_name):
+    """Bill acceptor fingerprint: ID-003 or MEI EBDS status reply."""
+    return probe_id003(port_name) or probe_mei(port_name)
+
+
+# Device types 8, 1 and 2 in the order the working code tried them. Type 2 sends the same
+# wakeup bit sequence as 8: it is a second chance for a machine slow to answer the first.
+DEFAULT_PROBES = (
+    ("sas_wakeup", lambda port_name: probe_sas(port_name, PARITY_WAKEUP)),
+    ("sas_even", lambda port_name: probe_sas(port_name, PARITY_EVEN)),
+    ("sas_type2", lambda port_name: probe_sas(port_name, PARITY_WAKEUP, device_type=2)),
+    ("card_reader", probe_card_reader),
+    ("bill_acceptor", probe_bill_acceptor),
+)
+
+
+def verification_probe(info):
+    """The single probe that confirms a previously detected device: (name, probe) or None."""
+    role = info.get("role")
+    if role == ROLE_SAS:
+        parity_mode = info.get("parity", PARITY_WAKEUP)
+        address = int(info.get("address", "01"), 16)
+        device_type = info.get("device_type")
+        return f"sas_{parity_mode}", lambda port_name: probe_sas(port_name, parity_mode, address, device_type)
+    if role == ROLE_CARD_READER:
+        return "card_reader", probe_card_reader
+    if role == ROLE_BILL_ACCEPTOR:
+        if info.get("bill_acceptor_type") == 2:
+            return "mei", probe_mei
+        return "id003", probe_id003
+    return None
+
+
+class PortReport:
+    """Probe results and timing of one port."""
+
+    def __init__(self, port_name):
+        self.port_name = port_name
+        self.probes = []
+        self.info = None
+        self.elapsed = 0.0
+
+    @property
+    def role(self):
+        return self.info["role"] if self.info else None
+
+    def as_dict(self):
+        return {
+            "role": self.role,
+            "ms": round(self.elapsed * 1000, 1),
+            "info": self.info,
+            "probes": [p.as_dict() for p in self.probes],
+        }
+
+
+def probe_port(port_name, probes=DEFAULT_PROBES):
+    """Run probes on one port until one matches."""
+    report = PortReport(port_name)
+    started = time.monotonic()
+    for name, probe in probes:
+        probe_started = time.monotonic()
+        try:
+            info = probe(port_name)
+            report.probes.append(ProbeResult(name, time.monotonic() - probe_started, info))
+        except serial.SerialException as e:
+            # Port cannot be opened (missing, busy, no permission): no other probe will do better
+            report.probes.append(ProbeResult(name, time.monotonic() - probe_started, error=str(e)))
+            break
+        except (OSError, ValueError) as e:
+            report.probes.append(ProbeResult(name, time.monotonic() - probe_started, error=str(e)))
+            continue
+        if info is not None:
+            report.info = info
+            break
+    report.elapsed = time.monotonic() - started
+    return report
+
+
+class DiscoveryResult:
+    """Per-port reports and the port chosen for every role."""
+
+    def __init__(self, reports, elapsed):
+        self.reports = {r.port_name: r for r in reports}
+        self.elapsed = elapsed
+        self.roles = {}
+        for report in reports:
+            if report.role and report.role not in self.roles:
+                self.roles[report.role] = report
+
+    def port_for(self, role):
+        report = self.roles.get(role)
+        return report.port_name if report else None
+
+    def info_for(self, role):
+        report = self.roles.get(role)
+        return report.info if report else None
+
+    def print_report(self):
+        print(f"[Discovery] {len(self.reports)} ports probed in {self.elapsed * 1000:.0f} ms")
+        for port_name, report in self.reports.items():
+            probes = ", ".join(f"{p.name} {p.elapsed * 1000:.0f}ms{'*' if p.matched else ''}" for p in report.probes)
+            print(f"[Discovery]   {port_name}: {report.role or '-'} in {report.elapsed * 1000:.0f} ms ({probes})")
+
+    def as_dict(self):
+        return {
+            "ms": round(self.elapsed * 1000, 1),
+            "roles": {role: report.port_name for role, report in self.roles.items()},
+            "ports": {port_name: report.as_dict() for port_name, report in self.reports.items()},
+        }
+
+
+def discover_ports(port_names, probes=DEFAULT_PROBES):
+    """Probe all ports concurrently and assign roles in one pass."""
+    started = time.monotonic()
+    port_names = list(port_names)
+    if not port_names:
+        return DiscoveryResult([], 0.0)
+    with ThreadPoolExecutor(max_workers=len(port_names), thread_name_prefix="port-probe") as pool:
+        reports = list(pool.map(lambda name: probe_port(name, probes), port_names))
+    return DiscoveryResult(reports, time.monotonic() - started)
@@ -1,4 +1,6 @@
-import time
+from port_cache import DEFAULT_CACHE_FILE, PortCache, discover_with_cache
+from port_discovery import ROLE_BILL_ACCEPTOR, ROLE_CARD_READER, ROLE_SAS
+from sas_requests import RetryPolicy
 
 print("port_manager.py loaded")
 
@@ -87,6 +89,34 @@ class PortManager:
             
         return self.available_ports
 
+    def discover(self, config):
+        """
+        Probe all free ports at once and assign SAS, card reader and bill acceptor roles.
+        Known devices ([ports] cachefile, port_cache.json) are only confirmed with one probe each.
+        Sets machine devicetypeid / billacceptortypeid in config from the fingerprints.
+        Returns a port_discovery.DiscoveryResult.
+        """
+        if not self.available_ports:
+            self.find_ports_linux()
+        cache = PortCache(config.get('ports', 'cachefile', DEFAULT_CACHE_FILE))
+        result = discover_with_cache((p['port_no'] for p in self.available_ports if not p['is_used']), cache)
+        result.print_report()
+        for port_info in self.available_ports:
+            report = result.reports.get(port_info['port_no'])
+            if report is None or report.role is None:
+                continue
+            port_info['device_name'] = report.role
+            # The card reader port stays free for CardReader.find_port to open
+            if report.role != ROLE_CARD_READER and result.port_for(report.role) == port_info['port_no']:
+                port_info['is_used'] = True
+        sas_info = result.info_for(ROLE_SAS)
+        if sas_info:
+            config.config.set('machine', 'devicetypeid', str(sas_info['device_type']))
+        bill_info = result.info_for(ROLE_BILL_ACCEPTOR)
+        if bill_info:
+            config.config.set('machine', 'billacceptortypeid', str(bill_info['bill_acceptor_type']))
+        return result
+
     def find_sas_port(self, config):
         """Find SAS port by testing communication - like working code's FindPortForSAS"""
         print("<FIND SAS PORT>-----------------------------------------------------------------")
@@ -110,17 +140,15 @@ class PortManager:
                         
                         # Test communication
                         found_sas = False
-                        for attempt in range(10):  # 10 attempts like working code
-                            sas_comm.request_sas_version()
-                            time.sleep(0.1)
-                            
-                            response = sas_comm.get_data_from_sas_port()
-                            if response and ("0154" in response or len(response) > 6):
-                                print(f"SAS found on port {port_name} with device type {device_type}")
-                                found_sas = True
-                                break
-                                
-                            time.sleep(0.05)
+                        # 10 attempts like working code, each done as soon as the reply arrives
+                        future = sas_comm.request("GetSASVersion", sas_comm.commands.sas_version,
+                                                  RetryPolicy(timeout=0.15, retries=9))
+                        try:
+                            sas_comm.requests.wait(future)
+                            print(f"SAS found on port {port_name} with device type {device_type}")
+                            found_sas = True
+                        except Exception:
+                            pass
                         
                         sas_comm.close_port()
                         
@@ -0,0 +1,193 @@
+# SAS asyncio Engine
+# Drives a SASCommunicator from one asyncio event loop instead of the reader, scheduler and
+# handler threads: the serial fd is watched with loop.add_reader, frames are parsed in the read
+# callback, the general poll runs as a task that also slots queued long polls, and long polls
+# can be awaited. Other peripheral ports (card reader, bill acceptor) are wrapped the same way
+# so every device of the cabinet shares the loop and its single thread.
+#
+# Writes stay synchronous: SAS commands are at most a few dozen bytes, and the wake-up bit
+# parity switch (TCSADRAIN) has to wait for the address byte anyway.
+
+import asyncio
+import os
+import time
+
+from sas_frame_parser import SASFrameParser
+from sas_money_functions import METER_POLICY
+
+
+class AsyncSerialPort:
+    """
+    Non-blocking receive side of an open pyserial port on an asyncio loop.
+    With on_data every chunk goes to the callback; otherwise chunks are buffered for read_until_idle().
+    """
+
+    READ_CHUNK = 4096
+
+    def __init__(self, serial_port, on_data=None):
+        self.serial_port = serial_port
+        self.on_data = on_data
+        self.buffer = bytearray()
+        self.data_event = None
+        self.loop = None
+        self.fd = None
+
+    def start(self, loop=None):
+        self.loop = loop or asyncio.get_running_loop()
+        self.data_event = asyncio.Event()
+        self.fd = self.serial_port.fileno()
+        os.set_blocking(self.fd, False)
+        self.loop.add_reader(self.fd, self._on_readable)
+
+    def stop(self):
+        if self.loop and self.fd is not None:
+            self.loop.remove_reader(self.fd)
+        self.fd = None
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.fd, self.READ_CHUNK)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            print(f"[AsyncSerialPort] Read error on {self.serial_port.port}: {e}")
+            self.stop()
+            return
+        if not data:
+            return
+        if self.on_data:
+            self.on_data(data)
+        else:
+            self.buffer += data
+            self.data_event.set()
+
+    def write(self, data):
+        self.serial_port.write(data)
+
+    async def read_until_idle(self, timeout, gap):
+        """Bytes received until nothing arrives for gap seconds, waiting at most timeout for the first."""
+        wait = timeout
+        while True:
+            if not self.buffer:
+                self.data_event.clear()
+            try:
+                await asyncio.wait_for(self.data_event.wait(), wait)
+            except asyncio.TimeoutError:
+                break
+            self.data_event.clear()
+            wait = gap
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+class AsyncSASEngine:
+    """
+    Runs a SASCommunicator on the current asyncio loop. The communicator's port must be open;
+    its reader thread and scheduler thread are not used while the engine runs. Handlers run
+    inline on the loop (start no handler pool), so they must not block.
+    """
+
+    def __init__(self, communicator, inter_byte_timeout=0.01):
+        self.communicator = communicator
+        self.inter_byte_timeout = inter_byte_timeout
+        self.parser = SASFrameParser(communicator._on_frame_received, communicator.address)
+        self.port = None
+        self.ports = []
+        self.poll_task = None
+        self.gap_timer = None
+        self.loop = None
+
+    async def start(self):
+        comm = self.communicator
+        self.loop = asyncio.get_running_loop()
+        comm.stop_polling()
+        comm.stop_reader()
+        self.port = AsyncSerialPort(comm.serial_port, on_data=self._on_data)
+        self.port.start(self.loop)
+        comm.attach_parser(self.parser)
+        comm.scheduler.attach()
+        self.poll_task = self.loop.create_task(self._poll_loop())
+        print(f"[AsyncSAS] Engine started on {comm.port_name}")
+
+    async def stop(self):
+        if self.poll_task:
+            self.poll_task.cancel()
+            try:
+                await self.poll_task
+            except asyncio.CancelledError:
+                pass
+            self.poll_task = None
+        self.communicator.scheduler.detach()
+        self.communicator.detach_parser(self.parser)
+        if self.gap_timer:
+            self.gap_timer.cancel()
+        for port in [self.port] + self.ports:
+            if port:
+                port.stop()
+        self.port = None
+        self.ports = []
+        print("[AsyncSAS] Engine stopped.")
+
+    def add_port(self, serial_port, on_data=None):
+        """Put another open serial port (card reader, bill acceptor) on the same loop."""
+        port = AsyncSerialPort(serial_port, on_data)
+        port.start(self.loop)
+        self.ports.append(port)
+        return port
+
+    def _on_data(self, data):
+        if self.gap_timer:
+            self.gap_timer.cancel()
+            self.gap_timer = None
+        self.parser.feed(data)
+        if self.parser.buffer:
+            # Unknown length or partial frame: it ends at the inter-byte gap
+            self.gap_timer = self.loop.call_later(self.inter_byte_timeout, self._on_gap)
+
+    def _on_gap(self):
+        self.gap_timer = None
+        self.parser.flush()
+
+    async def _poll_loop(self):
+        """General poll task: one scheduler slot per interval on a monotonic deadline grid."""
+        scheduler = self.communicator.scheduler
+        timing = scheduler.loop  # PollLoop keeps the interval and the jitter/overrun statistics
+        deadline = time.monotonic()
+        while True:
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            started = time.monotonic()
+            try:
+                scheduler.run_slot()
+                self.communicator.requests.expire()
+            except Exception as e:
+                print(f"[AsyncSAS] Poll error: {e}")
+            deadline = timing.record_cycle(deadline, started, time.monotonic())
+
+    async def long_poll(self, command_name, command, policy=None, parse=None, expect=None):
+        """Queue a long poll and wait for its (parsed) response. Raises TimeoutError after the retries."""
+        future = self.communicator.request(command_name, command, policy, parse, expect)
+        return await asyncio.wrap_future(future)
+
+    async def sas_version(self):
+        return await self.long_poll("GetSASVersion", self.communicator.commands.sas_version)
+
+    async def asset_number(self):
+        response = await self.long_poll("ReadAssetNo", self.communicator.commands.read_asset_number)
+        return int.from_bytes(response[4:8], 'little')
+
+    async def balance(self):
+        """Balance query; returns (cashable, restricted, nonrestricted) as parsed by SasMoney."""
+        money = self.communicator.sas_money
+        await self.long_poll("MoneyQuery", self.communicator.commands.balance_query,
+                             parse=money.handle_balance_frame)
+        return money.yanit_bakiye_tutar, money.yanit_restricted_amount, money.yanit_nonrestricted_amount
+
+    async def meters(self, isall=0):
+        money = self.communicator.sas_money
+        command = money.meter_command(isall)
+        if command is None:
+            return None
+        return await self.long_poll("getmeter2", command, METER_POLICY, parse=money.handle_meter_frame)
@@ -0,0 +1,78 @@
+# SAS Command Frame Library
+# Final wire bytes (address, command, data, CRC) for the long polls this host sends.
+# Constant and address-parameterised frames are built once and cached; dynamic frames
+# get their CRC from the table-driven utils.crc_kermit.
+
+from functools import lru_cache
+
+import bcd
+from utils import add_crc
+
+# Meter sets requested by SasMoney.komut_get_meter (command body after the address)
+METERS_2F_BASIC = bytes.fromhex("2F0C0000A0B802031E00010BA2BA")
+METERS_2F_ALL = bytes.fromhex("2F0C00000405060C191D7FFAFBFC")
+METERS_AF_BASIC = bytes.fromhex("AF1A0000A000B800020003001E00000001000B00A200BA0005000600")
+
+MAX_2F_METERS = 10  # Meter codes per 2F/AF request, as the fixed meter sets use
+
+
+def meters_body(codes, game_number=0, extended=False):
+    """
+    2F body (command, length, game number, codes) for meter codes; AF (2 byte codes) if
+    extended or a code is above 0xFF.
+    """
+    game = bcd.encode(game_number, 2)
+    if not extended and all(code <= 0xFF for code in codes):
+        return bytes((0x2F, 2 + len(codes))) + game + bytes(codes)
+    body = b"".join(code.to_bytes(2, "little") for code in codes)
+    return bytes((0xAF, 2 + len(body))) + game + body
+
+
+@lru_cache(maxsize=1024)
+def command_frame(address, body):
+    """Cached wire frame for address + body (body is bytes, without address and CRC)."""
+    return add_crc(bytes((address,)) + body)
+
+
+class SASCommandLibrary:
+    """Precomputed frames for one SAS address. Get instances through command_library()."""
+
+    def __init__(self, address):
+        self.address = address
+        self.sas_version = command_frame(address, b"\x54")
+        # Lock code 00 (query only), transfer condition 00, lock timeout 0000
+        self.balance_query = command_frame(address, b"\x74\x00\x00\x00\x00")
+        self.cancel_aft = command_frame(address, b"\x72\x01\x80")
+        self.read_asset_number = command_frame(address, b"\x73\x01\xFF")
+        self.meters_2f_basic = command_frame(address, METERS_2F_BASIC)
+        self.meters_2f_all = command_frame(address, METERS_2F_ALL)
+        self.meters_af_basic = command_frame(address, METERS_AF_BASIC)
+        self.bill_meters = command_frame(address, b"\x1E")
+        self.enabled_games = command_frame(address, b"\x56")
+        self.real_time_on = command_frame(address, b"\x0E\x01")
+        self.real_time_off = command_frame(address, b"\x0E\x00")
+        self._game_meters = {}
+
+    def frame(self, body):
+        """Cached frame for any constant command body."""
+        return command_frame(self.address, body)
+
+    def game_meters(self, game_number):
+        """0x52 meters for game N (game number is 2 bytes BCD)."""
+        frame = self._game_meters.get(game_number)
+        if frame is None:
+            frame = self._game_meters[game_number] = command_frame(self.address, b"\x52" + bcd.encode(game_number, 2))
+        return frame
+
+    def meters(self, codes, game_number=0, extended=False):
+        """Meter request for up to MAX_2F_METERS codes (see meters_body)."""
+        return command_frame(self.address, meters_body(tuple(codes), game_number, extended))
+
+    def dynamic(self, body):
+        """Uncached frame for commands that change every time (AFT transfers and the like)."""
+        return add_crc(bytes((self.address,)) + body)
+
+
+@lru_cache(maxsize=None)
+def command_library(address):
+    return SASCommandLibrary(address)
@@ -2,30 +2,65 @@ print("sas_communicator.py loaded")
 import serial
 import time
 import datetime
+import threading
 import platform
-import termios  # For Linux parity control
 from crccheck.crc import CrcKermit
 from decimal import Decimal
 from card_reader import CardReader  # Import the CardReader class
 from sas_money_functions import SasMoney
+from meter_sweep import MeterSweep
 from billacceptor_functions import BillAcceptorFunctions
-from utils import decode_to_hex, get_crc, read_asset_to_int, add_left_bcd
-import re
-
-# Helper functions
+from sas_commands import command_library
+from sas_reader import SASReaderThread
+from sas_requests import PendingRequests, RetryPolicy, response_key
+from sas_scheduler import SASScheduler
+from poll_loop import poll_interval_for
+from sas_workers import DEFAULT_WORKERS, HandlerPool
+from sas_multidrop import SASMachine, WeightedAddressRotation, parse_addresses
+from sas_transmitter import WakeupBitTransmitter
+from sas_dispatch import SASDispatcher, ignore_handler, log_handler
+from sas_events import SASEventStream, parse_event
+from event_bus import sas_topic
+from sas_frame import EXCEPTION_COMMAND, LENGTH_BYTE_RESPONSES, SASFrame
+from sas_frame_parser import frame_length, split_frames
+
+GENERAL_POLL_80 = b"\x80"
+GENERAL_POLL_81 = b"\x81"
+
+ASSET_NUMBER_POLICY = RetryPolicy(timeout=0.5, retries=3)
 
 class SASCommunicator:
     """SAS Communication - Converted to match EXACTLY the working code logic"""
+
+    # Responses parse_message flags as important (length byte responses and exceptions)
+    IMPORTANT_RESPONSES = LENGTH_BYTE_RESPONSES | {EXCEPTION_COMMAND}
     
-    def __init__(self, port_name, global_config, baud_rate=19200, timeout=0.1):
+    def __init__(self, port_name, global_config, baud_rate=19200, timeout=0.1, address=None, device_type_id=None):
         self.port_name = port_name
         self.baud_rate = baud_rate
         self.timeout = timeout
         self.global_config = global_config
         self.serial_port = None
-        self.sas_address = self.global_config.get('sas', 'address', '01')
+        # address / device_type_id override the config for hosts driving several links
+        self.sas_address = address or self.global_config.get('sas', 'address', '01')
+        self.address = int(self.sas_address, 16)
+        self.commands = command_library(self.address)
+        # Machines on this link: [sas] addresses for multi-drop loops, else the single address
+        addresses = [] if address else parse_addresses(self.global_config.get('sas', 'addresses'))
+        self.machines = {a: SASMachine(a, w) for a, w in addresses or [(self.address, 1)]}
+        if self.address not in self.machines:
+            self.address = next(iter(self.machines))
+            self.sas_address = f"{self.address:02X}"
+            self.commands = command_library(self.address)
+        self.rotation = WeightedAddressRotation(self.machines.values())
+        self.polled_address = self.address  # Address the next response comes from
+        self.polled_at = None  # When the last general or long poll went out (event latency)
+        self.long_poll_key = None  # response_key() of the last poll if it was a long poll
+        self.real_time_reporting = False  # Long poll 0E sent: events carry data, also answer long polls
+        self.events = SASEventStream()
+        self.parsers = []  # Frame parsers that follow polled_address
         self.is_port_open = False
-        self.device_type_id = self.global_config.getint('machine', 'devicetypeid', 8)
+        self.device_type_id = device_type_id or self.global_config.getint('machine', 'devicetypeid', 8)
         
         # CRITICAL: Match working code's global variables
         self.last_sent_poll_type = 81  # Sas_LastSent equivalent
@@ -34,7 +69,7 @@ class SASCommunicator:
         self.last_81_time = datetime.datetime.now()  # G_Last_81
         
         # Command queue like working code
-        self.pending_command = ""  # GENEL_GonderilecekKomut equivalent
+        self.pending_command = b""  # GENEL_GonderilecekKomut equivalent
         
         # Initialize platform detection
         if platform.system().startswith("Window"):
@@ -42,12 +77,29 @@ class SASCommunicator:
         else:
             self.is_communication_by_windows = 0
 
+        self.reader = None  # SASReaderThread once the port is open
+        self.send_lock = threading.Lock()
+        self.requests = PendingRequests(self.sas_send_command_with_queue)
+        self.scheduler = SASScheduler(self._send_long_poll, self.send_general_poll,
+                                      poll_interval_for(self.global_config, self.device_type_id))
+        self.transmitter = None  # WakeupBitTransmitter, built on first send after the port opens
+        self.on_link_fault = None  # on_link_fault(error) on serial I/O errors, see link_supervisor
+
         self.card_reader = None  # Will hold CardReader instance
         self.sas_money = SasMoney(self.global_config, self)
+        self.meter_sweep = MeterSweep(self.sas_money)  # Per game meters at idle priority, see meter_sweep
         self.bill_acceptor = BillAcceptorFunctions()
+        self.handler_pool = HandlerPool(self.global_config.getint('sas', 'handlerworkers', DEFAULT_WORKERS))
+        self.dispatcher = SASDispatcher(self._handle_unknown_frame, self.handler_pool)
+        self.events.executor = self.handler_pool  # Slow subscribers must not hold up the reader
+        self._register_sas_handlers()
 
-    def open_port(self):
-        """Opens SAS port - EXACTLY matching working code's OpenCloseSasPort logic"""
+    def open_port(self, read_asset_number=True):
+        """
+        Opens SAS port - EXACTLY matching working code's OpenCloseSasPort logic.
+        With read_asset_number the reader thread is started and the asset number read;
+        hosts that drive the port from their own loop pass False.
+        """
         if self.is_port_open:
             return True
             
@@ -75,21 +127,23 @@ class SASCommunicator:
             # CRITICAL: Device type specific initialization like working code
             if self.device_type_id in [1, 4]:  # Novomatic/Octavian
                 print("Device type is Novomatic/Octavian, setting parity to EVEN after initial polls.")
-                self._send_sas_port("80")
+                self._send_sas_port(GENERAL_POLL_80)
                 time.sleep(0.05)
-                self._send_sas_port("81")
+                self._send_sas_port(GENERAL_POLL_81)
                 self.serial_port.close()
                 self.serial_port.parity = serial.PARITY_EVEN
                 self.serial_port.open()
                 print(f"SAS port {self.port_name} re-opened with EVEN parity.")
             else:
                 # Initial poll for other devices
-                self._send_sas_port("80")
+                self._send_sas_port(GENERAL_POLL_80)
                 time.sleep(0.05)
             
             print(f"SAS port {self.port_name} opened successfully.")
-            # Read and print asset number after port is opened
-            self.read_and_print_asset_number()
+            if read_asset_number:
+                self.start_reader()
+                # Read and print asset number after port is opened
+                self.read_and_print_asset_number()
             return True
             
         except serial.SerialException as e:
@@ -99,151 +153,241 @@ class SASCommunicator:
 
     def close_port(self):
         """Closes the serial port."""
+        self.stop_polling()
+        self.stop_reader()
+        self.transmitter = None
+        self.is_port_open = False
         if self.serial_port and self.serial_port.is_open:
-            self.serial_port.close()
-            self.is_port_open = False
+            try:
+                self.serial_port.close()
+            except (OSError, serial.SerialException) as e:
+                print(f"Error closing SAS port {self.port_name}: {e}")
             print(f"SAS port {self.port_name} closed.")
 
-    def _send_sas_port(self, command_hex):
-        """Send raw hex to SAS port - EXACTLY like working code's SendSASPORT"""
+    def start_reader(self):
+        """Hand the receive side of the port to a dedicated reader thread."""
+        if not self.is_port_open or not self.serial_port:
+            return False
+        if self.reader and self.reader.is_alive():
+            return True
+        self.handler_pool.start()
+        self.reader = SASReaderThread(self.serial_port, self._on_frame_received, self.polled_address,
+                                     on_tick=self.requests.expire, on_error=self._link_fault)
+        self.attach_parser(self.reader.parser)
+        self.reader.start()
+        return True
+
+    def stop_reader(self):
+        if self.reader:
+            self.reader.stop()
+            self.detach_parser(self.reader.parser)
+            self.reader = None
+        self.handler_pool.stop()
+
+    def start_polling(self):
+        """Hand the transmit side of the port to the scheduler: general polls plus queued long polls."""
+        if not self.is_port_open or not self.serial_port:
+            return False
+        self.scheduler.start()
+        return True
+
+    def stop_polling(self):
+        if self.scheduler.is_alive():
+            self.scheduler.stop()
+
+    @property
+    def is_multidrop(self):
+        return len(self.machines) > 1
+
+    def attach_parser(self, parser):
+        """Keep parser.address on the address of the machine that answers next."""
+        parser.address = self.polled_address
+        self.parsers.append(parser)
+
+    def detach_parser(self, parser):
+        if parser in self.parsers:
+            self.parsers.remove(parser)
+
+    def expect_response_from(self, address):
+        # Single byte replies carry no address: they belong to the machine polled last
+        self.polled_address = address
+        for parser in self.parsers:
+            parser.address = address
+
+    def machine_for(self, frame):
+        """SASMachine a received frame belongs to."""
+        if len(frame) > 1:
+            return self.machines.get(frame[0])
+        return self.machines.get(self.polled_address)
+
+    def machine_stats(self):
+        return {f"{address:02X}": machine.as_dict() for address, machine in self.machines.items()}
+
+    def _on_frame_received(self, frame):
+        """Called from the reader thread for every complete frame."""
+        self.scheduler.response_received()
+        machine = self.machine_for(frame)
+        if machine:
+            machine.record(frame)
+        if frame.is_exception:
+            self.events.publish(parse_event(frame, self.polled_at))
+            # In real time mode an event may take the place of the long poll response: send it again
+            if self.real_time_reporting and self.long_poll_key:
+                self.requests.requeue(self.long_poll_key)
+                self.long_poll_key = None
+        # A response somebody is waiting for goes to that request, everything else to the handlers
+        if self.requests.resolve(frame):
+            return
+        self.dispatcher.dispatch(frame)
+
+    def attach_event_bus(self, bus):
+        """Publish SAS events (sas.<event name>) and bill acceptor events on an event_bus.EventBus."""
+        self.events.subscribe(lambda event: bus.publish(sas_topic(event), event, self.port_name))
+        self.bill_acceptor.event_bus = bus
+
+    def set_real_time_reporting(self, enable=True):
+        """Long poll 0E: switch real time event reporting on or off."""
+        self.real_time_reporting = enable
+        if enable:
+            print("Real time reporting is on")
+            self.sas_send_command_with_queue("RTP-1", self.commands.real_time_on, 0)
+        else:
+            print("Real time reporting is off")
+            self.sas_send_command_with_queue("RTP-0", self.commands.real_time_off, 0)
+
+    def request(self, command_name, command, policy=None, parse=None, expect=None, priority=None):
+        """
+        Send a long poll and return a Future for its response, resolved by the reader thread.
+        The result is parse(frame) if parse is given, else the response SASFrame.
+        priority overrides the scheduler class of the command (sas_scheduler.PRIORITY_*).
+        """
+        return self.requests.submit(command_name, command, expect, policy, parse, priority)
+
+    def can_wait_for_response(self):
+        """True if a caller may block on a request: the reader runs and this is not the reader thread."""
+        return bool(self.reader and self.reader.is_alive() and not self.reader.is_reader_thread())
+
+    def _link_fault(self, error):
+        # Serial I/O errors (adapter unplugged, cable loose) go to the link supervisor, if any
+        if self.on_link_fault and isinstance(error, OSError):
+            self.on_link_fault(error)
+
+    def _send_sas_port(self, data):
+        """Write raw bytes to SAS port - like working code's SendSASPORT"""
         if not self.is_port_open or not self.serial_port:
             return
             
         try:
-            data_bytes = decode_to_hex(command_hex)
-            self.serial_port.write(data_bytes)
+            self.serial_port.write(data)
             # CRITICAL: Flush input like working code
             # self.serial_port.flushInput()  # Commented in working code
         except Exception as e:
             print(f"Error in _send_sas_port: {e}")
+            self._link_fault(e)
 
-    def send_sas_command(self, command_hex):
-        """Send SAS command - EXACTLY matching working code's SendSASCommand"""
-        
-        command_hex = command_hex.replace(" ", "")
+    def send_sas_command(self, command):
+        """Send SAS command (bytes, or legacy hex string) - matching working code's SendSASCommand"""
+        if isinstance(command, str):
+            command = bytes.fromhex(command.replace(" ", ""))
         
         # Update last sent times like working code
-        if command_hex == "81":
+        if command == GENERAL_POLL_81:
             self.last_81_time = datetime.datetime.now()
             self.last_sent_poll_type = 81
             
-        if command_hex == "80":
+        if command == GENERAL_POLL_80:
             self.last_80_time = datetime.datetime.now()
             self.last_sent_poll_type = 80
 
         # Log like working code
-        if len(command_hex) >= 3:
-            print("TX: ", self.device_type_id, command_hex, self.serial_port.port, datetime.datetime.now())
+        if len(command) >= 2:
+            print("TX: ", self.device_type_id, command.hex().upper(), self.serial_port.port, datetime.datetime.now())
 
-        # CRITICAL: Device type specific sending logic - EXACTLY like working code
+        # CRITICAL: Device type specific sending logic - like working code
         if self.device_type_id == 1 or self.device_type_id == 4:
             # Novomatic/Octavian - just send normally
-            self._send_sas_port(command_hex)
+            self._send_sas_port(command)
         else:
+            if not self.is_port_open or not self.serial_port:
+                return
             try:
-                # Determine sending method like working code
-                is_new_sending_msg = 0
-                if self.is_communication_by_windows == 1 or self.device_type_id == 11:
-                    is_new_sending_msg = 1
-                    
-                if self.device_type_id == 6:
-                    is_new_sending_msg = 0
-
-                if is_new_sending_msg == 1:  # Windows or Interblock
-                    sleeptime = 0.005
-                    if self.device_type_id == 11:
-                        sleeptime = 0.003
-                    
-                    # MARK parity for first byte
-                    if self.serial_port.parity != serial.PARITY_MARK:
-                        self.serial_port.parity = serial.PARITY_MARK
-                    self._send_sas_port(command_hex[0:2])
-                    time.sleep(sleeptime)
-                    
-                    # SPACE parity for rest
-                    if len(command_hex) > 2:
-                        if self.serial_port.parity != serial.PARITY_SPACE:
-                            self.serial_port.parity = serial.PARITY_SPACE
-                        self._send_sas_port(command_hex[2:])
-                        
-                else:
-                    # Linux with termios - EXACTLY like working code
-                    saswaittime = 0.001  # From working code comment: "2020-12-25 test ok gibi.."
-                    
-                    iflag, oflag, cflag, lflag, ispeed, ospeed, cc = termios.tcgetattr(self.serial_port)
-                    
-                    CMSPAR = 0x40000000  # EXACTLY like working code
-                    
-                    # MARK parity for first byte
-                    cflag |= termios.PARENB | CMSPAR | termios.PARODD
-                    termios.tcsetattr(self.serial_port, termios.TCSANOW, [iflag, oflag, cflag, lflag, ispeed, ospeed, cc])
-                    
-                    self._send_sas_port(command_hex[0:2])
-                    
-                    if len(command_hex) > 2:
-                        time.sleep(saswaittime)
-                        
-                        # SPACE parity for rest
-                        iflag, oflag, cflag, lflag, ispeed, ospeed, cc = termios.tcgetattr(self.serial_port)
-                        cflag |= termios.PARENB
-                        cflag &= ~termios.PARODD
-                        termios.tcsetattr(self.serial_port, termios.TCSANOW, [iflag, oflag, cflag, lflag, ispeed, ospeed, cc])
-                        
-                        self._send_sas_port(command_hex[2:])
+                if self.transmitter is None:
+                    # Windows and Interblock switch parity through pyserial, others through termios
+                    use_termios = not (self.is_communication_by_windows == 1 or self.device_type_id == 11)
+                    if self.device_type_id == 6:
+                        use_termios = True
+                    self.transmitter = WakeupBitTransmitter(self.serial_port, use_termios)
+                self.transmitter.send(command)
                         
             except Exception as e:
                 print(f"Error in send_sas_command: {e}")
+                self._link_fault(e)
 
     def get_data_from_sas_port(self, is_message_sent=0):
-        """Receive data - EXACTLY like working code's GetDataFromSasPort"""
+        """Receive raw bytes - like working code's GetDataFromSasPort. Used before the reader starts."""
         if not self.is_port_open or not self.serial_port:
-            return ""
+            return b""
+        if self.reader and self.reader.is_alive():
+            return b""  # The reader thread owns the receive side
             
         try:
             data_left = self.serial_port.in_waiting
             if data_left == 0:
-                return ""
+                return b""
             
-            out = ''
+            out = bytearray()
             read_count_timeout = 3  # From working code
             
             while read_count_timeout > 0:
                 read_count_timeout = read_count_timeout - 1
                 
                 while self.serial_port.in_waiting > 0:
-                    out += self.serial_port.read_all().hex()
+                    out += self.serial_port.read_all()
                     time.sleep(0.005)
             
-            return out.upper()
+            return bytes(out)
             
         except Exception as e:
             print(f"Error in get_data_from_sas_port: {e}")
-            return ""
+            return b""
 
-    def sas_send_command_with_queue(self, command_name, command, do_save_db=0):
-        """Send command with queue - EXACTLY like working code's SAS_SendCommand"""
+    def sas_send_command_with_queue(self, command_name, command, do_save_db=0, on_sent=None, priority=None):
+        """
+        Send command with queue - like working code's SAS_SendCommand. command is bytes (or hex).
+        While the scheduler owns the line the command is queued in its priority class
+        (sas_scheduler.command_priority unless priority is given); otherwise it is sent now.
+        on_sent() is called once the command has been written.
+        """
         try:
-            # Wait for pending command to clear - EXACTLY like working code
-            while len(self.pending_command) > 0:
-                time.sleep(0.01)
-            
-            if len(command) % 2 != 0:
-                print("PROBLEM BUYUK!!! Length not even")
+            if isinstance(command, str):
+                if len(command) % 2 != 0:
+                    print("PROBLEM BUYUK!!! Length not even")
+                    return
+                command = bytes.fromhex(command)
+
+            if self.scheduler.is_alive():
+                self.scheduler.submit(command_name, command, priority, on_sent)
                 return
-                
-            self.pending_command = command
+
+            self._send_long_poll(command)
+            if on_sent:
+                on_sent()
             
-            # Send immediately like working code
+        except Exception as e:
+            print(f"Error in sas_send_command_with_queue: {e}")
+
+    def _send_long_poll(self, command):
+        # One command on the wire at a time; waiting senders block on the lock, not on sleeps
+        with self.send_lock:
+            self.expect_response_from(command[0])
+            self.pending_command = command
             try:
                 self.send_command_if_exists()
             except Exception as e:
                 print("Gondermede hata")
-                
-            # Clear the queue
-            self.pending_command = ""
-            
-        except Exception as e:
-            print(f"Error in sas_send_command_with_queue: {e}")
+            self.pending_command = b""
+            self.polled_at = time.monotonic()
+            self.long_poll_key = response_key(command) if len(command) > 1 else None
 
     def send_command_if_exists(self):
         """Send pending command - like working code's SendCommandIsExist"""
@@ -251,239 +395,171 @@ class SASCommunicator:
             self.send_sas_command(self.pending_command)
 
     def send_general_poll(self):
-        """Send general poll - alternating 80/81 like working code"""
+        """Send general poll - 80|address; address 01 alternates 80/81 like working code"""
         if not self.is_port_open:
             return
-            
+
+        if self.is_multidrop:
+            machine = self.rotation.next()
+            machine.polled()
+            self.expect_response_from(machine.address)
+            self.send_sas_command(bytes((0x80 | machine.address,)))
+            self.polled_at = time.monotonic()
+            self.long_poll_key = None
+            return
+
+        if self.address != 0x01:
+            poll_command = bytes((0x80 | self.address,))
         # Alternate between 80 and 81 like working code
-        if self.last_sent_poll_type == 80:
-            poll_command = "81"
+        elif self.last_sent_poll_type == 80:
+            poll_command = GENERAL_POLL_81
         else:
-            poll_command = "80"
-            
+            poll_command = GENERAL_POLL_80
+
+        self.machines[self.address].polled()
+        self.expect_response_from(self.address)
         self.send_sas_command(poll_command)
+        self.polled_at = time.monotonic()
+        self.long_poll_key = None
 
     def request_sas_version(self):
         """Send 0x54 command like working code"""
-        command = get_crc("0154")
-        self.sas_send_command_with_queue("GetSASVersion", command, 1)
+        self.sas_send_command_with_queue("GetSASVersion", self.commands.sas_version, 1)
 
-    def request_balance_info(self, lock_code="00", timeout_bcd="9000"):
+    def request_balance_info(self, lock_code=0x00, timeout_bcd=b"\x90\x00"):
         """Send 0x74 command like working code"""
-        command_body = f"74{lock_code}{timeout_bcd}"
-        command = get_crc(self.sas_address + command_body)
+        command = self.commands.frame(bytes((0x74, lock_code)) + timeout_bcd)
         self.sas_send_command_with_queue("RequestBalanceInfo", command, 1)
 
     def parse_message(self, message):
-        """Parse received message - EXACTLY like working code's ParseMessage"""
+        """
+        Split the first frame off a received hex message using the response format table.
+        Returns (frame, crc, rest_of_message, is_important) as hex strings.
+        """
         if not message:
             return None, None, None, 0
-            
-        message_found = ""
-        message_found_crc = ""
-        message_rest_of_message = ""
-        message_important = 0
-        
-        # Check if length exists - EXACTLY like working code
-        is_length_exist = 0
-        if (message[0:4] == "0172" or message[0:4] == "0174" or 
-            message[0:4] == "012F" or message[0:4] == "0154" or message[0:4] == "01AF"):
-            is_length_exist = 1
-        
-        if is_length_exist == 1:
-            message_important = 1
-            message_length = (int(message[4:6], 16) * 2)
-            
-            message_found = message[0:message_length + 6 + 4]
-            message_found_crc = message[message_length + 6:message_length + 6 + 4]
-            message_rest_of_message = message[message_length + 6 + 4:len(message)]
-            
-        else:  # Messages without length
-            if message[0:4] == "01FF":
-                message_important = 1
-                message_length = 2
-                
-                message_found = message[4:6]
-                
-                # Specific message types like working code
-                if message_found == "4F":  # Bill accepted
-                    message_length = 8
-                if message_found == "69":  # AFT TRANSFER COMPLETED
-                    message_length = 2
-                if message_found == "7C":  # Legacy bonus pay
-                    message_length = 12
-                if message_found == "7E":  # Game started
-                    message_length = 10
-                if message_found == "7F":  # Game end
-                    message_length = 6
-                if message_found == "88":  # Reel stopped
-                    message_length = 4
-                if message_found == "8A":  # Game recall entered
-                    message_length = 6
-                if message_found == "8B":  # Card held
-                    message_length = 3
-                if message_found == "8C":  # Game selected
-                    message_length = 4
-                
-                message_length = ((message_length + 1) * 2)
-                message_found = message[0:message_length + 4]
-                message_found_crc = message[message_length:message_length + 4]
-                try:
-                    message_rest_of_message = message[message_length + 4 + 4:len(message)]
-                except:
-                    print("Parse error at 01FF")
-            else:
-                message_length = len(message)
-                message_found = message[0:message_length]
-                message_found_crc = message[message_length - 4:message_length]
-        
-        return message_found, message_found_crc, message_rest_of_message, message_important
+        try:
+            data = bytes.fromhex(message)
+        except ValueError:
+            return message, message[-4:], "", 0
+
+        length = frame_length(data, self.polled_address)
+        if not length or length > len(data):
+            # Unknown format or incomplete: the whole buffer is the message
+            length = len(data)
+        frame = data[:length]
+        message_important = 1 if len(frame) > 2 and frame[1] in self.IMPORTANT_RESPONSES else 0
+        return frame.hex().upper(), frame[-2:].hex().upper(), data[length:].hex().upper(), message_important
+
+    def _register_sas_handlers(self):
+        """Dispatch table for received frames, covering all message types from the reference."""
+        d = self.dispatcher
+
+        # Single byte replies to general polls, long poll ACK (address echo) and NACK
+        for code in (0x00, 0x01, 0x1F, 0x51, 0x81):
+            d.register_single_byte(code, log_handler("Simple ACK"))
+        d.register_single_byte(0x69, log_handler("AFT Transfer is completed"))
+        d.register_single_byte(0x87, log_handler("Gaming machine unable to perform transfers at this time"))
+
+        # Exceptions (01FF); anything not listed goes to _handle_exception_message
+        d.register(EXCEPTION_COMMAND, self._handle_exception_message)
+        d.register_exception(0x00, ignore_handler)  # Suppress real time reporting print
+        d.register_exception(0x70, ignore_handler)
+        d.register_exception(0x1F, log_handler("send gaming machine id - information"))
+        d.register_exception(0x83, log_handler("Ignore: known message"))
+        d.register_exception(0x82, log_handler("Display meters or attendant menu has been entered"))
+        d.register_exception(0x20, log_handler("General tilt"))
+        d.register_exception(0x29, log_handler("Bill acceptor hardware failure!"))
+        d.register_exception(0x51, log_handler("Handpay is pending"))
+        d.register_exception(0x52, log_handler("Handpay was reset"))
+        d.register_exception(0x54, log_handler("Progressive win"))
+        d.register_exception(0x66, log_handler("Cashout is pressed or Hopper Limit Reached"))
+        d.register_exception(0x69, log_handler("AFT Transfer is completed"))
+        d.register_exception(0x6A, log_handler("AFT Request for host cashout"))
+        d.register_exception(0x6B, log_handler("AFT request for host to cash out win"))
+        d.register_exception(0x6C, log_handler("AFT request to register"))
+        d.register_exception(0x6F, log_handler("Game locked"))
+        d.register_exception(0x7C, log_handler("Legacy bonus pay"))
+        d.register_exception(0x7E, self._handle_exception_message)
+        d.register_exception(0x7F, self._handle_exception_message)
+        d.register_exception(0x88, log_handler("Reel N has stopped"))
+        d.register_exception(0x8A, log_handler("Game Recall Entry Displayed"))
+        d.register_exception(0x8C, log_handler("Game selected"))
+
+        # Long poll responses
+        d.register(0x1B, log_handler("HandpayInformation"))
+        d.register(0x1F, self._handle_machine_id_response)
+        d.register(0x53, log_handler("GameConfiguration"))
+        d.register(0x54, self._handle_sas_version_response)
+        d.register(0x56, self.meter_sweep.handle_enabled_games)
+        d.register(0x72, self._handle_aft_response)
+        d.register(0x73, self._handle_register_response)
+        d.register(0x94, self._handle_remote_handpay_reset_response)
+        d.register(0xB5, log_handler("Game Info"))
+
+        # Money (meters, balance) and bill acceptor handlers live with their modules
+        self.sas_money.register_sas_handlers(d)
+        self.bill_acceptor.register_sas_handlers(d)
+
+    def _handle_unknown_frame(self, frame):
+        print(f"DEBUG: Received SAS message: {frame}")
+
+    def _handle_machine_id_response(self, frame):
+        if len(frame) > 5:
+            print("Send gaming machine ID & information")
+
+    def _handle_remote_handpay_reset_response(self, frame):
+        if len(frame) > 2 and frame[2] == 0x00:
+            print("Handpay is reseted")
+
+    def _handle_register_response(self, frame):
+        """0x73 response: full registration data, or the asset number read"""
+        if frame.declared_length == 0x1D:
+            print("Register Gaming Machine Response")
+            return
+        print("DEBUG: Asset number response detected")
+        asset = frame[4:8]
+        print(f"[ASSET NO] HEX: {asset.hex().upper()}  DEC: {int.from_bytes(asset, 'little')}")
+        print("DEBUG: About to call get_meter (main run)")
+        self.sas_money.get_meter(isall=0)
+        print("DEBUG: get_meter call finished")
 
     def handle_received_sas_command(self, tdata):
-        """Comprehensive SAS response handler, covering all message types from the reference."""
-        print(f"[DEBUG] RAW SAS DATA: {tdata}")
-        # Only print debug for meter responses
-        if tdata.startswith("012F") or tdata.startswith("01AF"):
-            print(f"DEBUG: handle_received_sas_command called with tdata={tdata}")
+        """Handle received data (bytes or hex text): split it into frames and dispatch each one."""
         try:
             if not tdata:
                 return
-            tdata = tdata.replace(" ", "").upper()
-
-            # Early returns for simple ACKs and known short responses
-            early_acks = {
-                "01FF838F13": "Ignore: known message",
-                "01FF001CA501FF001CA5": "Ignore: known message",
-                "01FF001CA501": "Ignore: known message",
-                "81": "Simple ACK",
-                "01FF820602": "Display meters or attendant menu has been entered",
-                "01FF201E84": "General tilt",
-                "0101FF001CA5": "Ignore: known message",
-            }
-            if tdata in early_acks:
-                print(early_acks[tdata])
-                return
-            if tdata[0:6] == "01FF1F":
-                print("send gaming machine id - information")
-                return
-
-            # Dispatch table for exact and prefix matches
-            dispatch = [
-                (lambda d: d.startswith("01FF7C"), lambda d: print("Legacy bonus pay")),
-                (lambda d: d.startswith("01FF6B"), lambda d: print("AFT request for host to cash out win")),
-                (lambda d: d.startswith("01FF6C"), lambda d: print("AFT request to register")),
-                (lambda d: d.startswith("011B"), lambda d: print("HandpayInformation")),
-                (lambda d: d.startswith("0153"), lambda d: print("GameConfiguration")),
-                (lambda d: d.startswith("01731D"), lambda d: print("Register Gaming Machine Response")),
-                (lambda d: d.startswith("01FF6FED3E"), lambda d: print("Game locked")),
-                (lambda d: d[0:10] == "01FF5110E6", lambda d: print("Handpay is pending")),
-                (lambda d: d[0:10].startswith("01FF52"), lambda d: print("Handpay was reset")),
-                (lambda d: d[0:4] == "0172", lambda d: print("AFT response")),
-                (lambda d: d[0:4] == "0174", lambda d: print("Balance query response")),
-                (lambda d: d.startswith("01FF54BDB1"), lambda d: print("Progressive win")),
-                (lambda d: d == "01FF29DF19", lambda d: print("Bill acceptor hardware failure!")),
-                (lambda d: d == "00", lambda d: print("Simple ACK")),
-                (lambda d: d == "01", lambda d: print("Simple ACK")),
-                (lambda d: d == "51", lambda d: print("Simple ACK")),
-                (lambda d: d.startswith("01FF69DB5B") or d == "FF69DB5B" or d == "69DB5B" or d == "69", lambda d: print("AFT Transfer is completed")),
-                (lambda d: "01FF66" in d, lambda d: print("Cashout is pressed or Hopper Limit Reached")),
-                (lambda d: d[0:6] == "01FF8A", lambda d: print("Game Recall Entry Displayed")),
-                (lambda d: d[0:4] == "0156", lambda d: print("EnabledGameNumbers")),
-                (lambda d: d[0:6] == "01FF6A" or "01FF6A4069" in d, lambda d: print("AFT Request for host cashout")),
-                (lambda d: d[0:2] == "87", lambda d: print("Gaming machine unable to perform transfers at this time")),
-                (lambda d: d[0:4] == "011F" and len(d) > 10, lambda d: print("Send gaming machine ID & information")),
-                (lambda d: d[0:6] == "019400", lambda d: print("Handpay is reseted")),
-                (lambda d: d[0:4] == "0154", lambda d: self._handle_sas_version_response(d)),
-                (lambda d: d == "1F", lambda d: print("Simple ACK")),
-                # Suppress real time reporting print
-                (lambda d: d == "01FF001CA5" or d == "01FF1F6A4D" or d == "01FF709BD6", lambda d: None),
-                (lambda d: d[0:6] == "01FF88", lambda d: print("Reel N has stopped")),
-                (lambda d: d[0:4] == "01B5", lambda d: print("Game Info")),
-                (lambda d: d[0:6] == "01FF8C", lambda d: print("Game selected")),
-            ]
-            for cond, action in dispatch:
-                try:
-                    if cond(tdata):
-                        action(tdata)
-                        return
-                except Exception as e:
-                    print(f"Error in dispatch for SAS message: {e}")
-
-            # Asset number response (0x73)
-            if tdata.startswith("0173"):
-                print("DEBUG: Asset number response detected")
-                asset_hex = tdata[8:16]
-                if len(asset_hex) % 2 != 0:
-                    asset_hex = '0' + asset_hex
-                reversed_hex = ''.join([asset_hex[i:i+2] for i in range(len(asset_hex)-2, -2, -2)])
-                asset_dec = int(reversed_hex, 16)
-                print(f"[ASSET NO] HEX: {asset_hex}  DEC: {asset_dec}")
-                print("DEBUG: About to call get_meter (main run)")
-                self.sas_money.get_meter(isall=0)
-                print("DEBUG: get_meter call finished")
-                print("DEBUG: Returning after asset number handling")
-                return
-            # SAS Version response (0x54) (fallback)
-            if tdata.startswith("0154"):
-                self._handle_sas_version_response(tdata)
-                return
-            # Balance query response (0x74) (fallback)
-            if tdata.startswith("0174"):
-                self._handle_balance_response(tdata)
-                return
-            # AFT response (0x72) (fallback)
-            if tdata.startswith("0172"):
-                self._handle_aft_response(tdata)
-                return
-            # Exception messages (01FF) (fallback)
-            if tdata.startswith("01FF"):
-                self._handle_exception_message(tdata)
-                return
-            # Add this to handle meter responses and clear the waiting flag
-            if tdata.startswith("012F") or tdata.startswith("01AF"):
-                print("Meter response received.")
-                self.sas_money.is_waiting_for_meter = False
-                self.sas_money.meter_response_received = True  # Prevent further retries in get_meter
-                # Improved: Split on every 012F or 01AF and parse each block
-                split_blocks = re.split(r'(?=012F|01AF)', tdata)
-                for block in split_blocks:
-                    if block.startswith("012F") or block.startswith("01AF"):
-                        print(f"[DEBUG] Parsing meter block: {block}")
-                        self.sas_money.handle_single_meter_response(block)
-                return
-            # Handle single meter responses (codes 10-2C)
-            if tdata[:4] in [f"01{code}" for code in self.sas_money.SINGLE_METER_CODES.values()]:
-                self.sas_money.handle_single_meter_response(tdata)
-                return
-            print(f"DEBUG: Received SAS message: {tdata}")
-        except Exception as e:
+            if isinstance(tdata, str):
+                tdata = bytes.fromhex(tdata.replace(" ", ""))
+        except ValueError as e:
             print(f"Error in handle_received_sas_command: {e}")
-        print("DEBUG: handle_received_sas_command end")
+            return
+        print(f"[DEBUG] RAW SAS DATA: {tdata.hex().upper()}")
+
+        # Several responses read in one go: handle each frame on its own
+        frames, rest = split_frames(tdata, self.polled_address)
+        if rest:
+            frames.append(SASFrame(rest))
+        for frame in frames:
+            self._on_frame_received(frame)
 
-    def _handle_sas_version_response(self, tdata):
-        """Handle SAS version response"""
+    def _handle_sas_version_response(self, frame):
+        """Handle SAS version response: address, 54, length, version (3 ASCII), serial number"""
         try:
             print("SAS Version response received")
-            if len(tdata) >= 10:
-                sas_version = tdata[6:12]  # 3 bytes for version
+            data = frame.data
+            if len(data) >= 3:
+                sas_version = bytes(data[0:3]).decode('ascii', 'replace')
                 print(f"SAS Version: {sas_version}")
                 
                 # Serial number is the rest
-                serial_data = tdata[12:-4]  # Exclude CRC
+                serial_data = bytes(data[3:]).decode('ascii', 'replace')
                 print(f"Serial Number data: {serial_data}")
                 
         except Exception as e:
             print(f"Error parsing SAS version: {e}")
 
-    def _handle_balance_response(self, tdata):
-        """Handle balance query response"""
-        try:
-            print("Balance response received")
-            self.sas_money.yanit_bakiye_sorgulama(tdata)
-        except Exception as e:
-            print(f"Error parsing balance response: {e}")
-
-    def _handle_aft_response(self, tdata):
+    def _handle_aft_response(self, frame):
         """Handle AFT response"""
         try:
             print("AFT response received")
@@ -491,47 +567,43 @@ class SASCommunicator:
         except Exception as e:
             print(f"Error parsing AFT response: {e}")
 
-    def _handle_exception_message(self, tdata):
+    def _handle_exception_message(self, frame):
         """Handle exception messages (01FF)"""
         try:
-            if len(tdata) >= 6:
-                exception_code = tdata[4:6]
-                print(f"Exception code: {exception_code}")
+            exception_code = frame.exception_code
+            if exception_code is not None:
+                print(f"Exception code: {exception_code:02X}")
                 
                 # Specific exceptions like working code
-                if tdata == "01FF69DB5B":
+                if exception_code == 0x69:
                     print("AFT Transfer is completed")
-                elif tdata.startswith("01FF7E"):
+                elif exception_code == 0x7E:
                     print("Game started")
-                elif tdata.startswith("01FF7F"):
+                elif exception_code == 0x7F:
                     print("Game ended")
-                elif tdata.startswith("01FF6A"):
+                elif exception_code == 0x6A:
                     print("AFT request for host cashout")
                     
         except Exception as e:
             print(f"Error parsing exception message: {e}")
 
     def read_and_print_asset_number(self):
-        """Read asset number from SAS and print it to screen."""
+        """Read asset number from SAS and print it to screen. Returns the asset number or None."""
+        if not self.can_wait_for_response():
+            self.sas_send_command_with_queue('ReadAssetNo', self.commands.read_asset_number, 0)
+            return None
         try:
-            command = self.sas_address + '7301FF'
-            command_crc = get_crc(command)
-            self.sas_send_command_with_queue('ReadAssetNo', command_crc, 0)
-            for _ in range(10):
-                time.sleep(0.2)
-                response = self.get_data_from_sas_port()
-                if response and response.startswith('0173'):
-                    asset_hex = response[8:16]
-                    if len(asset_hex) % 2 != 0:
-                        asset_hex = '0' + asset_hex
-                    # Reverse by bytes
-                    reversed_hex = ''.join([asset_hex[i:i+2] for i in range(len(asset_hex)-2, -2, -2)])
-                    asset_dec = int(reversed_hex, 16)
-                    print(f"[ASSET NO] HEX: {asset_hex}  DEC: {asset_dec}  DEBUG: Port test asset number")
-                    return
+            future = self.request('ReadAssetNo', self.commands.read_asset_number, ASSET_NUMBER_POLICY)
+            response = self.requests.wait(future)
+            if len(response) >= 8:
+                asset = response[4:8]
+                asset_number = int.from_bytes(asset, 'little')
+                print(f"[ASSET NO] HEX: {asset.hex().upper()}  DEC: {asset_number}  DEBUG: Port test asset number")
+                return asset_number
             print("[ASSET NO] Could not read asset number from SAS.")
         except Exception as e:
-            print(f"[ASSET NO] Error reading from SAS: {e}")
+            print(f"[ASSET NO] Could not read asset number from SAS: {e}")
+        return None
 
     def find_ports_with_card_reader(self, port_list):
         """
@@ -580,24 +652,21 @@ class SASCommunicator:
         meter_type: 'basic', 'extended', 'bill', 'game'
         game_id: required for 'game' type
         """
-        if meter_type == 'basic':
-            print("[SAS TEST] Sending one-time read ALL BASIC meters command (012F0C0000)...")
-            command = get_crc("012F0C0000")
-        elif meter_type == 'extended':
-            print("[SAS TEST] Sending one-time read EXTENDED meters command (01AF...)")
-            # Example extended meters command (commonly used set)
-            command = get_crc("01AF1A0000A000B800020003001E00000001000B00A200BA0005000600")
+        if meter_type in ('basic', 'extended'):
+            # Through the meter cache: fresh meters are not read again, concurrent reads are shared
+            print(f"[SAS TEST] Reading {meter_type.upper()} meters through the meter cache...")
+            print(self.sas_money.get_meter(isall=1 if meter_type == 'basic' else 2, sender="TestReadMeters"))
+            return
         elif meter_type == 'bill':
             print("[SAS TEST] Sending one-time read BILL meters command (011E)...")
-            command = get_crc("011E")
+            command = self.commands.bill_meters
         elif meter_type == 'game':
             if game_id is None:
                 print("[SAS TEST] Game ID required for game meters!")
                 return
             print(f"[SAS TEST] Sending one-time read GAME meters command (0152) for game_id={game_id}...")
             # 0152 + game_id (2 bytes, BCD)
-            game_id_bcd = f"{int(game_id):04X}"  # 2 bytes, hex
-            command = get_crc(f"0152{game_id_bcd}")
+            command = self.commands.game_meters(int(game_id))
         else:
             print(f"[SAS TEST] Unknown meter_type: {meter_type}")
             return
@@ -609,8 +678,8 @@ class SASCommunicator:
         Assumes each code is 2 hex digits and each value is 8 hex digits (4 bytes).
         """
         hex_block = hex_block.replace(" ", "").upper()
-        # Skip header if present (012Fxx or 01AFxx)
-        if hex_block.startswith("012F") or hex_block.startswith("01AF"):
+        # Skip header if present (<address>2Fxx or <address>AFxx)
+        if hex_block[2:4] in ("2F", "AF"):
             hex_block = hex_block[6:]
         print("Parsed SAS Meter Block:")
         i = 0
@@ -0,0 +1,98 @@
+# SAS Received Message Dispatch
+# Resolves the handlers for a received frame from its (address, command) or exception code.
+# Handlers are registered by the communicator and by the money, bill acceptor and card modules.
+
+from sas_frame import EXCEPTION_COMMAND
+
+SINGLE_BYTE = -1  # Address slot of keys for single byte general poll replies
+
+
+def frame_key(frame):
+    """Dispatch key of a frame: (SINGLE_BYTE, code), (address, FF, code) or (address, command)."""
+    if len(frame) == 1:
+        return (SINGLE_BYTE, frame[0])
+    if frame[1] == EXCEPTION_COMMAND and len(frame) > 2:
+        return (frame[0], EXCEPTION_COMMAND, frame[2])
+    return (frame[0], frame[1])
+
+
+def log_handler(message):
+    """Handler that only prints message, for frames that need no processing."""
+    def handler(frame):
+        print(message)
+    return handler
+
+
+def ignore_handler(frame):
+    """Handler for frames that are known and deliberately not reported."""
+    return None
+
+
+class SASDispatcher:
+    """
+    Maps received frames to handlers with a single dictionary lookup.
+    Registrations may be address specific or for any address (address=None); the
+    most specific match is resolved once per key and cached, so steady state
+    dispatch costs one key build and one lookup.
+    With an executor (sas_workers.HandlerPool) handlers run there instead of inline.
+    """
+
+    def __init__(self, default_handler=None, executor=None):
+        self.handlers = {}
+        self.default_handler = default_handler
+        self.executor = executor
+        self._resolved = {}
+
+    def _add(self, key, handler):
+        self.handlers[key] = self.handlers.get(key, ()) + (handler,)
+        self._resolved.clear()
+
+    def register(self, command, handler, address=None):
+        """Handle long poll responses with this command byte (0xFF is the default for exceptions)."""
+        self._add((address, command), handler)
+
+    def register_exception(self, code, handler, address=None):
+        """Handle 01FF exception/event messages with this exception code."""
+        self._add((address, EXCEPTION_COMMAND, code), handler)
+
+    def register_single_byte(self, code, handler):
+        """Handle single byte replies to general polls (and long poll ACK/NACK)."""
+        self._add((SINGLE_BYTE, code), handler)
+
+    def _lookup_candidates(self, key):
+        if key[0] == SINGLE_BYTE:
+            return (key,)
+        address = key[0]
+        if len(key) == 3:
+            return (key, (None,) + key[1:], (address, EXCEPTION_COMMAND), (None, EXCEPTION_COMMAND))
+        return (key, (None, key[1]))
+
+    def resolve(self, key):
+        """Handlers for key, most specific registration first; empty tuple if none."""
+        handlers = self._resolved.get(key)
+        if handlers is None:
+            handlers = ()
+            for candidate in self._lookup_candidates(key):
+                if candidate in self.handlers:
+                    handlers = self.handlers[candidate]
+                    break
+            self._resolved[key] = handlers
+        return handlers
+
+    def dispatch(self, frame):
+        """Run the handlers of frame. Returns False if it fell through to the default handler."""
+        handlers = self.resolve(frame_key(frame))
+        if not handlers:
+            if self.default_handler:
+                self.default_handler(frame)
+            return False
+        if self.executor:
+            for handler in handlers:
+                self.executor.submit(handler, frame)
+            return True
+        for handler in handlers:
+            try:
+                handler(frame)
+            except Exception as e:
+                print(f"Error in dispatch for SAS message: {e}")
+        return True
@@ -0,0 +1,251 @@
+# SAS Real Time Events
+# Reference: docs/sas-protocol-info.md section 12 (real time event reporting, long poll 0E)
+# Every 01FF exception message becomes a typed SASEvent. With real time event reporting on,
+# the gaming machine appends event data (bill accepted, game start/end, reel stops ...) and
+# reports events in answer to long polls too; the payloads are decoded here. Each event is
+# stamped with the time the poll that drew it went out and the time its frame completed.
+
+import datetime
+import threading
+import time
+from collections import deque
+
+from sas_frame import EXCEPTION_DATA_LENGTHS
+import bcd
+
+EVENT_NAMES = {
+    0x00: "no_activity",
+    0x11: "slot_door_opened",
+    0x12: "slot_door_closed",
+    0x17: "ac_power_applied",
+    0x18: "ac_power_lost",
+    0x19: "cashbox_door_opened",
+    0x1A: "cashbox_door_closed",
+    0x1F: "no_activity_waiting_for_input",
+    0x20: "general_tilt",
+    0x29: "bill_acceptor_failure",
+    0x3D: "cash_out_ticket_printed",
+    0x3E: "handpay_validated",
+    0x3F: "validation_id_not_configured",
+    0x47: "bill_1_accepted",
+    0x48: "bill_5_accepted",
+    0x49: "bill_10_accepted",
+    0x4A: "bill_20_accepted",
+    0x4B: "bill_50_accepted",
+    0x4C: "bill_100_accepted",
+    0x4F: "bill_accepted",
+    0x51: "handpay_pending",
+    0x52: "handpay_reset",
+    0x54: "progressive_win",
+    0x57: "system_validation_request",
+    0x66: "cash_out_button_pressed",
+    0x67: "ticket_inserted",
+    0x68: "ticket_transfer_complete",
+    0x69: "aft_transfer_complete",
+    0x6A: "aft_request_host_cashout",
+    0x6B: "aft_request_host_cashout_win",
+    0x6C: "aft_request_register",
+    0x6D: "aft_registration_acknowledged",
+    0x6E: "aft_registration_cancelled",
+    0x6F: "game_locked",
+    0x70: "exception_buffer_overflow",
+    0x7C: "legacy_bonus_pay",
+    0x7E: "game_started",
+    0x7F: "game_ended",
+    0x82: "attendant_menu_entered",
+    0x83: "attendant_menu_exited",
+    0x88: "reel_stopped",
+    0x8A: "game_recall_entry",
+    0x8B: "card_held",
+    0x8C: "game_selected",
+}
+
+
+def _bill_accepted(data):
+    country, meter = bcd.decode_fields(data, ((0, 1), (2, 4)))
+    return {"country_code": country, "denomination_code": data[1], "bill_meter": meter}
+
+
+def _handpay_pending(data):
+    amount, partial = bcd.decode_fields(data, ((2, 5), (7, 2)))
+    return {"progressive_group": data[0], "level": data[1], "amount": amount,
+            "partial_pay": partial, "reset_id": data[9]}
+
+
+def _legacy_bonus(data):
+    multiplier, win, bonus = bcd.decode_fields(data, ((0, 1), (1, 4), (6, 4)))
+    return {"multiplier": multiplier, "multiplied_win": win, "tax_status": data[5], "bonus": bonus}
+
+
+def _game_started(data):
+    wagered, coin_in = bcd.decode_fields(data, ((0, 2), (2, 4)))
+    return {"credits_wagered": wagered, "coin_in_meter": coin_in,
+            "wager_type": data[6], "progressive_group": data[7]}
+
+
+def _game_ended(data):
+    return {"game_win": bcd.decode(data[0:4])}
+
+
+def _reel_stopped(data):
+    return {"reel": data[0], "physical_stop": data[1]}
+
+
+def _game_recall(data):
+    game, index = bcd.decode_fields(data, ((0, 2), (2, 2)))
+    return {"game_number": game, "recall_index": index}
+
+
+def _card_held(data):
+    return {"card": data[0] & 0x7F, "held": bool(data[0] & 0x80)}
+
+
+def _game_selected(data):
+    return {"game_number": bcd.decode(data[0:2])}
+
+
+# Real time event payload decoders, one per code in sas_frame.EXCEPTION_DATA_LENGTHS
+EVENT_PARSERS = {
+    0x4F: _bill_accepted,
+    0x51: _handpay_pending,
+    0x7C: _legacy_bonus,
+    0x7E: _game_started,
+    0x7F: _game_ended,
+    0x88: _reel_stopped,
+    0x8A: _game_recall,
+    0x8B: _card_held,
+    0x8C: _game_selected,
+}
+
+
+class SASEvent:
+    """One exception / real time event from a gaming machine."""
+
+    __slots__ = ("address", "code", "fields", "frame", "polled_at", "received_at", "timestamp")
+
+    def __init__(self, address, code, fields, frame, polled_at=None, received_at=None):
+        self.address = address
+        self.code = code
+        self.fields = fields
+        self.frame = frame
+        self.polled_at = polled_at
+        self.received_at = time.monotonic() if received_at is None else received_at
+        self.timestamp = datetime.datetime.now()
+
+    @property
+    def name(self):
+        return EVENT_NAMES.get(self.code, f"exception_{self.code:02X}")
+
+    @property
+    def is_real_time(self):
+        """True if the event carried its real time reporting data."""
+        return bool(self.fields)
+
+    @property
+    def latency(self):
+        """Poll on the line -> event frame complete, in seconds (None if the poll time is unknown)."""
+        if self.polled_at is None:
+            return None
+        return self.received_at - self.polled_at
+
+    def as_dict(self):
+        latency = self.latency
+        return {
+            "address": f"{self.address:02X}",
+            "code": f"{self.code:02X}",
+            "name": self.name,
+            "fields": self.fields,
+            "timestamp": self.timestamp.isoformat(),
+            "latency_ms": round(latency * 1000, 3) if latency is not None else None,
+        }
+
+    def __repr__(self):
+        return f"SASEvent({self.address:02X} {self.name} {self.fields})"
+
+
+def parse_event(frame, polled_at=None, received_at=None):
+    """SASEvent for a 01FF frame (bare or with real time data), None for anything else."""
+    if not frame.is_exception:
+        return None
+    code = frame[2]
+    fields = {}
+    length = EXCEPTION_DATA_LENGTHS.get(code)
+    if length is not None and len(frame) == 5 + length:
+        fields = EVENT_PARSERS[code](bytes(frame[3:3 + length]))
+    return SASEvent(frame[0], code, fields, frame, polled_at, received_at)
+
+
+class EventStats:
+    """Count and latency of the events of one code."""
+
+    __slots__ = ("count", "timed", "total_latency", "max_latency")
+
+    def __init__(self):
+        self.count = 0
+        self.timed = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def add(self, event):
+        self.count += 1
+        latency = event.latency
+        if latency is not None:
+            self.timed += 1
+            self.total_latency += latency
+            if latency > self.max_latency:
+                self.max_latency = latency
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "avg_latency_ms": round(self.total_latency / self.timed * 1000, 3) if self.timed else None,
+            "max_latency_ms": round(self.max_latency * 1000, 3),
+        }
+
+
+class SASEventStream:
+    """
+    Typed events in arrival order: subscribers are called with every event (or the codes they
+    asked for), and the most recent events are kept for callers that look back.
+    With an executor (sas_workers.HandlerPool) subscribers run there, not on the reader thread.
+    """
+
+    def __init__(self, history=256, executor=None):
+        self.executor = executor
+        self.subscribers = []
+        self.recent = deque(maxlen=history)
+        self.per_code = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, callback, codes=None):
+        """callback(event) for every event, or only for the exception codes in codes."""
+        entry = (callback, frozenset(codes) if codes is not None else None)
+        with self.lock:
+            self.subscribers = self.subscribers + [entry]
+        return entry
+
+    def unsubscribe(self, entry):
+        with self.lock:
+            self.subscribers = [s for s in self.subscribers if s is not entry]
+
+    def publish(self, event):
+        with self.lock:
+            self.recent.append(event)
+            stats = self.per_code.get(event.code)
+            if stats is None:
+                stats = self.per_code[event.code] = EventStats()
+            stats.add(event)
+        for callback, codes in self.subscribers:
+            if codes is None or event.code in codes:
+                if self.executor:
+                    self.executor.submit(callback, event)
+                    continue
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"[SASEvents] Subscriber error on {event.name}: {e}")
+
+    def stats(self):
+        with self.lock:
+            return {EVENT_NAMES.get(code, f"exception_{code:02X}"): s.as_dict()
+                    for code, s in sorted(self.per_code.items())}
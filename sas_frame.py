@@ -0,0 +1,189 @@
+# SAS Frame
+# Reference: docs/sas-protocol-info.md and the SAS 6.0x long poll response formats
+# Response format tables, and the frame type that carries a SAS message as raw bytes
+# from serial read to handlers. Hex text is only produced for logging (str(frame)).
+
+from utils import crc_kermit
+
+EXCEPTION_COMMAND = 0xFF
+
+# Long poll responses carrying a length byte: address, command, length, data[length], CRC(2)
+LENGTH_BYTE_RESPONSES = frozenset({
+    0x2F,  # Selected meters for game N
+    0x54,  # SAS version and machine serial number
+    0x56,  # Enabled game numbers
+    0x6F,  # Selected meters for game N (extended, alternate)
+    0x70,  # Ticket validation data
+    0x71,  # Redeem ticket
+    0x72,  # AFT transfer funds
+    0x73,  # AFT register gaming machine
+    0x74,  # AFT game lock and status
+    0x7B,  # Extended validation status
+    0x7C,  # Set extended ticket data
+    0x7D,  # Set ticket data
+    0x85,  # SAS progressive win amount
+    0x87,  # Multiple SAS progressive win amounts
+    0xAF,  # Extended meters for game N
+    0xB2,  # Enabled player denominations
+    0xB4,  # Wager category information
+    0xB5,  # Extended game information
+    0xB7,  # Set machine numbers
+})
+
+# Fixed size long poll responses: total frame length including address, command and CRC
+FIXED_LENGTH_RESPONSES = {
+    0x0F: 28,  # Meters 10-15
+    0x10: 8,   # Total cancelled credits
+    0x11: 8,   # Total coin in
+    0x12: 8,   # Total coin out
+    0x13: 8,   # Total drop
+    0x14: 8,   # Total jackpot
+    0x15: 8,   # Games played
+    0x16: 8,   # Games won
+    0x17: 8,   # Games lost
+    0x18: 8,   # Games since power up / door closure
+    0x19: 24,  # Meters 11-15
+    0x1A: 8,   # Current credits
+    0x1B: 24,  # Handpay information
+    0x1C: 36,  # Meters
+    0x1D: 20,  # Cumulative progressive wins
+    0x1E: 28,  # Bill meters
+    0x1F: 24,  # Gaming machine ID and information
+    0x20: 8,   # Dollar value of bills meter
+    0x21: 6,   # ROM signature
+    0x2A: 8,   # True coin in
+    0x2B: 8,   # True coin out
+    0x2C: 8,   # Current hopper level
+    0x2D: 10,  # Total hand paid cancelled credits
+    0x31: 8, 0x32: 8, 0x33: 8, 0x34: 8, 0x35: 8, 0x36: 8, 0x37: 8,  # Bill denomination meters
+    0x38: 8, 0x39: 8, 0x3A: 8, 0x3B: 8, 0x3C: 8, 0x3D: 8, 0x3E: 8, 0x3F: 8,
+    0x48: 10,  # Last accepted bill information
+    0x4C: 10,  # Secure enhanced validation ID
+    0x4D: 35,  # Enhanced validation information
+    0x50: 14,  # Validation meters
+    0x51: 6,   # Total number of games implemented
+    0x52: 22,  # Game N meters
+    0x53: 26,  # Game N configuration
+    0x55: 6,   # Selected game number
+    0x57: 10,  # Pending cashout information
+    0x58: 5,   # Receive validation number status
+    0x7E: 11,  # Current date and time
+    0x84: 11,  # Progressive win amount
+    0x8E: 10,  # Card information
+    0x94: 5,   # Remote handpay reset status
+    0x9A: 18,  # Legacy bonus meters
+    0xA4: 8,   # Cash out limit
+    0xA8: 5,   # Enable jackpot handpay reset method
+    0xB1: 5,   # Current player denomination
+    0xB3: 5,   # Token denomination
+}
+
+# Data bytes following the exception code of a 01FF message in real time event reporting mode.
+# Without real time reporting the same codes arrive bare (address, FF, code, CRC).
+EXCEPTION_DATA_LENGTHS = {
+    0x4F: 6,   # Bill accepted: country code, denomination code, bill meter
+    0x51: 20,  # Handpay is pending: handpay information
+    0x7C: 10,  # Legacy bonus pay: multiplier, multiplied win, tax status, bonus
+    0x7E: 8,   # Game started: credits wagered, coin in meter, wager type, progressive group
+    0x7F: 4,   # Game end: game win
+    0x88: 2,   # Reel N stopped: reel number, physical stop
+    0x8A: 4,   # Game recall entered: game number, recall index
+    0x8B: 1,   # Card held/not held
+    0x8C: 2,   # Game selected: game number
+}
+
+BARE_EXCEPTION_LENGTH = 5
+
+FORMAT_FIXED = 1
+FORMAT_LENGTH_BYTE = 2
+FORMAT_EXCEPTION = 3
+
+# 256-entry command lookup: (format, fixed total length)
+RESPONSE_FORMATS = [None] * 256
+for _command, _length in FIXED_LENGTH_RESPONSES.items():
+    RESPONSE_FORMATS[_command] = (FORMAT_FIXED, _length)
+for _command in LENGTH_BYTE_RESPONSES:
+    RESPONSE_FORMATS[_command] = (FORMAT_LENGTH_BYTE, 0)
+RESPONSE_FORMATS[EXCEPTION_COMMAND] = (FORMAT_EXCEPTION, 0)
+
+
+def crc_ok(frame):
+    """True if the last two bytes of frame are its CRC-16/Kermit (low byte first)."""
+    if len(frame) < 3:
+        return False
+    crc = crc_kermit(frame[:-2])
+    return frame[-2] == (crc & 0xFF) and frame[-1] == (crc >> 8)
+
+
+class SASFrame(bytes):
+    """
+    Immutable bytes subclass with SAS field accessors. Field accessors return
+    memoryviews so handlers can read payloads without copying.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_hex(cls, hex_str):
+        return cls(bytes.fromhex(hex_str.replace(" ", "")))
+
+    def __str__(self):
+        return self.hex().upper()
+
+    def __repr__(self):
+        return f"SASFrame({self.hex().upper()})"
+
+    @property
+    def address(self):
+        return self[0] if self else None
+
+    @property
+    def command(self):
+        """Command byte of a long poll response or exception message, None for single byte replies."""
+        return self[1] if len(self) > 1 else None
+
+    @property
+    def is_exception(self):
+        return len(self) > 2 and self[1] == EXCEPTION_COMMAND
+
+    @property
+    def exception_code(self):
+        """01FF exception code, or the code of a single byte general poll reply."""
+        if len(self) == 1:
+            return self[0]
+        if self.is_exception:
+            return self[2]
+        return None
+
+    @property
+    def data(self):
+        """Memoryview of the data between the header (address, command[, length/code]) and the CRC."""
+        if len(self) < 4:
+            return memoryview(b"")
+        fmt = RESPONSE_FORMATS[self[1]]
+        start = 2 if fmt and fmt[0] == FORMAT_FIXED else 3
+        return memoryview(self)[start:-2]
+
+    @property
+    def declared_length(self):
+        """Value of the length byte for length-byte responses, else None."""
+        fmt = RESPONSE_FORMATS[self[1]] if len(self) > 2 else None
+        if fmt and fmt[0] == FORMAT_LENGTH_BYTE:
+            return self[2]
+        return None
+
+    @property
+    def crc(self):
+        return bytes(self[-2:]) if len(self) > 2 else b""
+
+    @property
+    def crc_ok(self):
+        return crc_ok(self)
+
+
+def as_frame(data):
+    """Accept a SASFrame, bytes-like or (legacy) hex string and return a SASFrame."""
+    if isinstance(data, SASFrame):
+        return data
+    if isinstance(data, str):
+        return SASFrame.from_hex(data)
+    return SASFrame(data)
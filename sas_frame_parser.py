@@ -0,0 +1,106 @@
+# SAS Response Frame Parser
+# Reference: docs/sas-protocol-info.md and the SAS 6.0x long poll response formats
+# Splits a byte stream coming from the gaming machine into complete SASFrames in one pass
+
+from sas_frame import (BARE_EXCEPTION_LENGTH, EXCEPTION_DATA_LENGTHS, FORMAT_FIXED,
+                       FORMAT_LENGTH_BYTE, RESPONSE_FORMATS, SASFrame, crc_ok)
+
+
+def frame_length(buf, address=0x01):
+    """
+    Total length of the frame at the start of buf.
+    Returns 0 if more header bytes are needed to know it, or None if the command
+    has no known format and the frame ends at the inter-byte gap.
+    """
+    n = len(buf)
+    if n == 0:
+        return 0
+    if buf[0] != address:
+        return 1  # General poll reply or NACK: a single byte
+    if n < 2:
+        return 0
+    command = buf[1]
+    fmt = RESPONSE_FORMATS[command]
+    if fmt is None:
+        if command == address:
+            return 1  # Long poll ACK (address echo) followed by the next frame
+        return None
+    kind, length = fmt
+    if kind == FORMAT_FIXED:
+        return length
+    if n < 3:
+        return 0
+    if kind == FORMAT_LENGTH_BYTE:
+        return 3 + buf[2] + 2
+    data_length = EXCEPTION_DATA_LENGTHS.get(buf[2])
+    if not data_length:
+        return BARE_EXCEPTION_LENGTH
+    if n < BARE_EXCEPTION_LENGTH:
+        return BARE_EXCEPTION_LENGTH
+    # Real time event reporting may be off: a bare exception has a valid CRC after 5 bytes
+    if crc_ok(buf[:BARE_EXCEPTION_LENGTH]):
+        return BARE_EXCEPTION_LENGTH
+    return 3 + data_length + 2
+
+
+def split_frames(data, address=0x01):
+    """
+    Split a buffer holding back-to-back responses into frames in one pass.
+    Returns (frames, rest) where rest is an incomplete trailing frame.
+    A frame of unknown format takes the remainder of the buffer, as the gap ends it.
+    """
+    view = memoryview(data)
+    end = len(view)
+    frames = []
+    pos = 0
+    while pos < end:
+        length = frame_length(view[pos:], address)
+        if length is None:
+            frames.append(SASFrame(view[pos:]))
+            pos = end
+            break
+        if length == 0 or pos + length > end:
+            break
+        frames.append(SASFrame(view[pos:pos + length]))
+        pos += length
+    return frames, bytes(view[pos:])
+
+
+class SASFrameParser:
+    """
+    Streaming parser: bytes are fed as they arrive and every complete frame is
+    emitted through on_frame as soon as its last byte is in. Partial frames stay
+    buffered until the rest arrives or the reader reports an inter-byte gap.
+    """
+
+    def __init__(self, on_frame, address=0x01):
+        self.on_frame = on_frame
+        self.address = address
+        self.buffer = bytearray()
+
+    def bytes_needed(self):
+        """Number of bytes the reader should wait for next, or None to read until the gap."""
+        length = frame_length(self.buffer, self.address)
+        if length is None:
+            return None
+        if length == 0:
+            return 3 - len(self.buffer) if self.buffer else 1
+        return length - len(self.buffer)
+
+    def feed(self, data):
+        """Append received bytes and emit every frame that is now complete."""
+        self.buffer += data
+        while self.buffer:
+            length = frame_length(self.buffer, self.address)
+            if not length or len(self.buffer) < length:
+                break
+            frame = SASFrame(self.buffer[:length])
+            del self.buffer[:length]
+            self.on_frame(frame)
+
+    def flush(self):
+        """Inter-byte gap seen: whatever is buffered is the end of a message."""
+        if self.buffer:
+            frame = SASFrame(self.buffer)
+            self.buffer.clear()
+            self.on_frame(frame)
@@ -0,0 +1,203 @@
+# SAS Multi-Link Host
+# One process, one thread, many SAS links: every link is a SASCommunicator on its own serial
+# device and address. The receive sides are multiplexed with selectors (epoll on Linux) and
+# each link's scheduler gets its poll slots from the same loop on its own deadline grid.
+# Handlers of all links share one worker pool. State and statistics stay per link.
+#
+# settings.ini:
+#   [host]
+#   links = /dev/ttyUSB0:01, /dev/ttyUSB1:01:4
+# (port:address[:devicetypeid]; devicetypeid defaults to [machine] devicetypeid)
+
+import os
+import selectors
+import time
+
+from sas_communicator import SASCommunicator
+from sas_frame_parser import SASFrameParser
+from sas_workers import DEFAULT_WORKERS, HandlerPool
+
+
+def parse_links(value):
+    """[host] links value -> list of (port, address, device_type_id or None)."""
+    links = []
+    for entry in (value or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        fields = entry.split(":")
+        port = fields[0]
+        address = fields[1] if len(fields) > 1 and fields[1] else "01"
+        device_type = int(fields[2]) if len(fields) > 2 and fields[2] else None
+        links.append((port, address, device_type))
+    return links
+
+
+class LinkStats:
+    """Response latency of one link: general or long poll written -> first frame completed."""
+
+    def __init__(self):
+        self.frames = 0
+        self.bytes = 0
+        self.responses = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def add_latency(self, latency):
+        self.responses += 1
+        self.total_latency += latency
+        if latency > self.max_latency:
+            self.max_latency = latency
+
+    def as_dict(self):
+        return {
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "responses": self.responses,
+            "avg_latency_ms": round(self.total_latency / self.responses * 1000, 3) if self.responses else 0.0,
+            "max_latency_ms": round(self.max_latency * 1000, 3),
+        }
+
+
+class SASLink:
+    """Per-link state: communicator, frame parser, poll deadline and statistics."""
+
+    def __init__(self, communicator, inter_byte_timeout=0.01):
+        self.communicator = communicator
+        self.name = f"{communicator.port_name}@{communicator.sas_address}"
+        self.parser = SASFrameParser(self._on_frame, communicator.address)
+        self.inter_byte_timeout = inter_byte_timeout
+        self.stats = LinkStats()
+        self.fd = None
+        self.deadline = 0.0
+        self.gap_deadline = None
+        self.awaiting_since = None
+
+    @property
+    def scheduler(self):
+        return self.communicator.scheduler
+
+    def _on_frame(self, frame):
+        self.stats.frames += 1
+        if self.awaiting_since is not None:
+            self.stats.add_latency(time.monotonic() - self.awaiting_since)
+            self.awaiting_since = None
+        self.communicator._on_frame_received(frame)
+
+    def on_readable(self, now):
+        data = os.read(self.fd, 4096)
+        if not data:
+            return
+        self.stats.bytes += len(data)
+        self.parser.feed(data)
+        # Unknown length or partial frame: it ends at the inter-byte gap
+        self.gap_deadline = now + self.inter_byte_timeout if self.parser.buffer else None
+
+    def on_gap(self):
+        self.gap_deadline = None
+        self.parser.flush()
+
+    def run_slot(self):
+        started = time.monotonic()
+        self.scheduler.run_slot()
+        self.communicator.requests.expire(started)
+        self.awaiting_since = self.scheduler.last_sent
+        self.deadline = self.scheduler.loop.record_cycle(self.deadline, started, time.monotonic())
+
+    def as_dict(self):
+        stats = self.stats.as_dict()
+        stats["scheduler"] = self.scheduler.stats()
+        return stats
+
+
+class SASHost:
+    """Drives any number of SAS links from one thread."""
+
+    def __init__(self, global_config, handler_workers=DEFAULT_WORKERS):
+        self.global_config = global_config
+        self.selector = selectors.DefaultSelector()
+        self.links = []
+        self.handler_pool = HandlerPool(handler_workers)
+        self.running = False
+
+    @classmethod
+    def from_config(cls, global_config):
+        host = cls(global_config, global_config.getint('sas', 'handlerworkers', DEFAULT_WORKERS))
+        for port, address, device_type in parse_links(global_config.get('host', 'links')):
+            host.add_link(SASCommunicator(port, global_config, address=address, device_type_id=device_type))
+        return host
+
+    def add_link(self, communicator):
+        """Open (if needed) and take over a communicator's port. Returns the SASLink, or None."""
+        if not communicator.is_port_open and not communicator.open_port(read_asset_number=False):
+            print(f"[SASHost] Could not open {communicator.port_name}")
+            return None
+        communicator.stop_polling()
+        communicator.stop_reader()
+        communicator.dispatcher.executor = self.handler_pool
+        communicator.events.executor = self.handler_pool
+        communicator.scheduler.attach()
+        link = SASLink(communicator)
+        communicator.attach_parser(link.parser)
+        link.fd = communicator.serial_port.fileno()
+        os.set_blocking(link.fd, False)
+        link.deadline = time.monotonic()
+        self.selector.register(link.fd, selectors.EVENT_READ, link)
+        self.links.append(link)
+        print(f"[SASHost] Link {link.name} added ({len(self.links)} links).")
+        return link
+
+    def remove_link(self, link):
+        self.selector.unregister(link.fd)
+        link.scheduler.detach()
+        link.communicator.detach_parser(link.parser)
+        self.links.remove(link)
+
+    def run_once(self, max_wait=0.1):
+        """Wait for input until the next poll or gap deadline, then serve every due link."""
+        now = time.monotonic()
+        next_due = now + max_wait
+        for link in self.links:
+            if link.deadline < next_due:
+                next_due = link.deadline
+            if link.gap_deadline is not None and link.gap_deadline < next_due:
+                next_due = link.gap_deadline
+        for key, _ in self.selector.select(max(0.0, next_due - now)):
+            try:
+                key.data.on_readable(time.monotonic())
+            except OSError as e:
+                print(f"[SASHost] Read error on {key.data.name}: {e}")
+        now = time.monotonic()
+        for link in self.links:
+            if link.gap_deadline is not None and link.gap_deadline <= now:
+                link.on_gap()
+            if link.deadline <= now:
+                try:
+                    link.run_slot()
+                except Exception as e:
+                    print(f"[SASHost] Poll error on {link.name}: {e}")
+
+    def run(self):
+        self.running = True
+        self.handler_pool.start()
+        print(f"[SASHost] Running {len(self.links)} links.")
+        try:
+            while self.running:
+                self.run_once()
+        except KeyboardInterrupt:
+            print("Shutdown requested.")
+        finally:
+            self.close()
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        for link in list(self.links):
+            self.remove_link(link)
+            link.communicator.close_port()
+        self.handler_pool.stop()
+        self.selector.close()
+
+    def stats(self):
+        return {link.name: link.as_dict() for link in self.links}
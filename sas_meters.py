@@ -0,0 +1,266 @@
+# SAS Meter Decoder
+# Reference: docs/sas-protocol-info.md (meter codes), SAS long polls 2F and AF
+# Table driven decoding of 2F (selected meters for game N) and AF (extended meters) responses,
+# and of the single meter long polls (10-17, 1A) and game N meters (52).
+# The meter code table is compiled once into a 256-entry list of (name, size, scale); a frame
+# is decoded in one pass into a MeterBlock holding the codes and raw values in compact arrays.
+# BCD values are read from one hex() of the frame: the hex digits of packed BCD are the decimal
+# digits, so int() of the slice is the value.
+
+from array import array
+
+import bcd
+
+COMMAND_METERS = 0x2F
+COMMAND_EXTENDED_METERS = 0xAF
+
+# address(1) command(1) length(1) game number(2) before the first meter
+METER_DATA_OFFSET = 5
+
+# Single meter long poll -> the meter code its 4 byte BCD response carries
+SINGLE_METER_POLLS = {
+    0x10: 0x04,  # Total cancelled credits
+    0x11: 0x00,  # Total coin in
+    0x12: 0x01,  # Total coin out
+    0x13: 0x24,  # Total drop
+    0x14: 0x02,  # Total jackpot
+    0x15: 0x05,  # Games played
+    0x16: 0x06,  # Games won
+    0x17: 0x07,  # Games lost
+    0x1A: 0x0C,  # Current credits
+}
+SINGLE_METER_LENGTH = 8  # address(1) command(1) meter(4) CRC(2)
+
+# Long poll 52 (meters of game N): game number(2) then these four 4 byte meters
+COMMAND_GAME_METERS = 0x52
+GAME_METER_CODES = (0x00, 0x01, 0x02, 0x05)  # Coin in, coin out, jackpot, games played
+GAME_METERS_LENGTH = 22
+
+# Scales are divisors from the raw BCD value to the reported value
+CREDITS = 10   # Credit meters, displayed as money: divide by 10 for this machine
+COUNT = 1      # Counters (games, bills, tickets): reported as they are
+PERCENT = 100  # Weighted average theoretical payback, 2 decimals
+
+# 2F meters of these codes are 5 bytes, all others 4 (reference implementation)
+FIVE_BYTE_METERS = frozenset((0x0D, 0x0E, 0x0F, 0x10, 0x80, 0x82, 0x84, 0x86, 0x88, 0x8A, 0x8C, 0x8E,
+                              0x90, 0x92, 0xA0, 0xA2, 0xA4, 0xA6, 0xA8, 0xAA, 0xAC, 0xAE, 0xB0, 0xB8,
+                              0xBA, 0xBC))
+
+# Meter code -> (name, scale). Names of the codes SasMoney reported before are kept as they were.
+METER_CODES = {
+    0x00: ("total_turnover", CREDITS),
+    0x01: ("total_win", CREDITS),
+    0x02: ("total_jackpot", CREDITS),
+    0x03: ("total_handpay", CREDITS),
+    0x04: ("total_cancelled_credits", CREDITS),
+    0x05: ("games_played", COUNT),
+    0x06: ("games_won", COUNT),
+    0x07: ("games_lost", COUNT),
+    0x08: ("coin_acceptor_credits", CREDITS),
+    0x09: ("hopper_paid_credits", CREDITS),
+    0x0A: ("coins_to_drop_credits", CREDITS),
+    0x0B: ("bills_accepted", CREDITS),
+    0x0C: ("current_credits", CREDITS),
+    0x0D: ("sas_cashable_ticket_in", CREDITS),
+    0x0E: ("sas_cashable_ticket_out", CREDITS),
+    0x0F: ("sas_restricted_ticket_in", CREDITS),
+    0x10: ("sas_restricted_ticket_out", CREDITS),
+    0x11: ("sas_cashable_ticket_in_count", COUNT),
+    0x12: ("sas_cashable_ticket_out_count", COUNT),
+    0x13: ("sas_restricted_ticket_in_count", COUNT),
+    0x14: ("sas_restricted_ticket_out_count", COUNT),
+    0x15: ("total_ticket_in", CREDITS),
+    0x16: ("total_ticket_out", CREDITS),
+    0x17: ("total_electronic_in", CREDITS),
+    0x18: ("total_electronic_out", CREDITS),
+    0x19: ("restricted_played", CREDITS),
+    0x1A: ("nonrestricted_played", CREDITS),
+    0x1B: ("current_restricted_credits", CREDITS),
+    0x1C: ("machine_paid_paytable_win", CREDITS),
+    0x1D: ("machine_paid_progressive", CREDITS),
+    0x1E: ("total_bonus", CREDITS),
+    0x1F: ("attendant_paid_paytable_win", CREDITS),
+    0x20: ("attendant_paid_progressive", CREDITS),
+    0x21: ("attendant_paid_bonus", CREDITS),
+    0x22: ("total_won_credits", CREDITS),
+    0x23: ("total_handpaid_credits", CREDITS),
+    0x24: ("total_drop", CREDITS),
+    0x25: ("games_since_power_reset", COUNT),
+    0x26: ("games_since_door_closure", COUNT),
+    0x27: ("external_coin_acceptor_credits", CREDITS),
+    0x28: ("cashable_ticket_in", CREDITS),
+    0x29: ("regular_cashable_ticket_in", CREDITS),
+    0x2A: ("restricted_promo_ticket_in", CREDITS),
+    0x2B: ("nonrestricted_promo_ticket_in", CREDITS),
+    0x2C: ("cashable_ticket_out", CREDITS),
+    0x2D: ("restricted_promo_ticket_out", CREDITS),
+    0x3E: ("bills_in_stacker", COUNT),
+    0x3F: ("bills_in_stacker_value", CREDITS),
+    0x40: ("bills_1", COUNT),
+    0x41: ("bills_2", COUNT),
+    0x42: ("bills_5", COUNT),
+    0x43: ("bills_10", COUNT),
+    0x44: ("bills_20", COUNT),
+    0x45: ("bills_25", COUNT),
+    0x46: ("bills_50", COUNT),
+    0x47: ("bills_100", COUNT),
+    0x48: ("bills_200", COUNT),
+    0x49: ("bills_250", COUNT),
+    0x4A: ("bills_500", COUNT),
+    0x4B: ("bills_1000", COUNT),
+    0x4C: ("bills_2000", COUNT),
+    0x4D: ("bills_2500", COUNT),
+    0x4E: ("bills_5000", COUNT),
+    0x4F: ("bills_10000", COUNT),
+    0x50: ("bills_20000", COUNT),
+    0x51: ("bills_25000", COUNT),
+    0x52: ("bills_50000", COUNT),
+    0x53: ("bills_100000", COUNT),
+    0x54: ("bills_200000", COUNT),
+    0x55: ("bills_250000", COUNT),
+    0x56: ("bills_500000", COUNT),
+    0x57: ("bills_1000000", COUNT),
+    0x7F: ("weighted_avg_payback", PERCENT),
+    0xA0: ("total_coin_in", CREDITS),
+    0xA2: ("non_cashable_in", CREDITS),
+    0xA4: ("in_house_restricted_in", CREDITS),
+    0xA6: ("in_house_nonrestricted_in", CREDITS),
+    0xA8: ("debit_transfers_in", CREDITS),
+    0xAA: ("in_house_cashable_out", CREDITS),
+    0xAC: ("in_house_restricted_out", CREDITS),
+    0xAE: ("in_house_nonrestricted_out", CREDITS),
+    0xB0: ("bonus_cashable_in", CREDITS),
+    0xB8: ("total_coin_out", CREDITS),
+    0xBA: ("non_cashable_out", CREDITS),
+    0xBC: ("bonus_nonrestricted_in", CREDITS),
+    0xFA: ("regular_cashable_keyed", CREDITS),
+    0xFB: ("restricted_keyed", CREDITS),
+    0xFC: ("nonrestricted_keyed", CREDITS),
+}
+
+
+def _compile_table():
+    table = []
+    for code in range(256):
+        name, scale = METER_CODES.get(code, (f"{code:02X}", CREDITS))
+        table.append((name, 5 if code in FIVE_BYTE_METERS else 4, scale))
+    return table
+
+
+# Meter code -> (name, 2F size, scale), indexed by the code byte
+METER_TABLE = _compile_table()
+METER_SIZES = bytes(size for _, size, _ in METER_TABLE)
+
+
+def meter_info(code):
+    """(name, 2F size, scale) of a meter code; AF codes above 0xFF get a hex name."""
+    if code < 256:
+        return METER_TABLE[code]
+    return (f"{code:04X}", 4, CREDITS)
+
+
+class MeterBlock:
+    """Meters of one 2F/AF response: codes and raw (unscaled) values in parallel arrays."""
+
+    __slots__ = ("command", "game_number", "codes", "values", "complete")
+
+    def __init__(self, command, game_number):
+        self.command = command
+        self.game_number = game_number
+        self.codes = array('H')
+        self.values = array('Q')
+        self.complete = True  # False if the frame was shorter than its length byte says
+
+    def __len__(self):
+        return len(self.codes)
+
+    def raw(self, code):
+        """Raw value of a meter code, or None if the block does not hold it."""
+        for i, c in enumerate(self.codes):
+            if c == code:
+                return self.values[i]
+        return None
+
+    def scaled(self):
+        """{meter name: value} with each meter's scale applied."""
+        return scaled_meters(zip(self.codes, self.values))
+
+
+def scaled_meters(items):
+    """{meter name: value} for (code, raw value) pairs, with each meter's scale applied."""
+    result = {}
+    table = METER_TABLE
+    for code, value in items:
+        name, _, scale = table[code] if code < 256 else meter_info(code)
+        result[name] = value / scale if scale != COUNT else value
+    return result
+
+
+def decode_meter_frame(frame):
+    """
+    Decode a 2F or AF response frame in one pass. Returns a MeterBlock (complete=False if the
+    frame is truncated; the meters up to the cut are still decoded), or None for other frames.
+    Single meter poll responses give a block of game 0 with one meter.
+    """
+    if len(frame) < 2:
+        return None
+    command = frame[1]
+    code = SINGLE_METER_POLLS.get(command)
+    if code is not None:
+        block = MeterBlock(command, 0)
+        block.complete = len(frame) >= SINGLE_METER_LENGTH
+        if block.complete:
+            block.codes.append(code)
+            block.values.append(bcd.decode(frame[2:6]))
+        return block
+    if command == COMMAND_GAME_METERS:
+        block = MeterBlock(command, bcd.decode(frame[2:4]) if len(frame) >= 4 else 0)
+        block.complete = len(frame) >= GAME_METERS_LENGTH
+        if block.complete:
+            block.codes.extend(GAME_METER_CODES)
+            block.values.extend(bcd.decode_run(frame, 4, 4, len(GAME_METER_CODES)))
+        return block
+    if len(frame) < METER_DATA_OFFSET:
+        return None
+    if command != COMMAND_METERS and command != COMMAND_EXTENDED_METERS:
+        return None
+    message_length = frame[2] + 5
+    end = min(message_length, len(frame)) - 2
+    block = MeterBlock(command, bcd.decode(frame[3:5]))
+    block.complete = len(frame) >= message_length
+    codes = block.codes
+    fields = []  # (offset, size) of each meter value, decoded in one bcd.decode_fields call
+    idx = METER_DATA_OFFSET
+    if command == COMMAND_METERS:
+        # [code][value]... with the size given by the code
+        sizes = METER_SIZES
+        while idx < end:
+            code = frame[idx]
+            idx += 1
+            stop = idx + sizes[code]
+            if stop > end:
+                break
+            codes.append(code)
+            fields.append((idx, stop - idx))
+            idx = stop
+    else:
+        # [code lo][code hi][size][value]...
+        while idx + 3 <= end:
+            code = frame[idx] | (frame[idx + 1] << 8)
+            idx += 3
+            stop = idx + frame[idx - 1]
+            if stop > end:
+                break
+            codes.append(code)
+            fields.append((idx, stop - idx))
+            idx = stop
+    block.values.extend(bcd.decode_fields(frame, fields))
+    return block
+
+
+def request_codes(command):
+    """Meter codes a 2F/AF request frame (address, command, length, game number, codes, CRC) asks for."""
+    body = command[METER_DATA_OFFSET:-2]
+    if command[1] == COMMAND_EXTENDED_METERS:
+        return [body[i] | (body[i + 1] << 8) for i in range(0, len(body) - 1, 2)]
+    return list(body)
@@ -3,10 +3,20 @@
 # Implements: AFT (Advanced Funds Transfer), balance query, cashout, transfer, and related money operations
 
 import datetime
-import time
 from decimal import Decimal
 from threading import Thread
-from utils import get_crc, add_left_bcd
+import bcd
+from meter_cache import MeterCache
+from meter_planner import merge_blocks, meter_codes, plan_meters, profile_for
+from sas_commands import command_library
+from sas_frame import as_frame
+from sas_meters import METER_CODES, SINGLE_METER_POLLS, decode_meter_frame, request_codes, scaled_meters
+from sas_requests import RetryPolicy
+
+METER_POLICY = RetryPolicy(timeout=1.5, retries=2)  # Worst case 4.5 s, as the old 5 s wait
+
+# (offset, width) of the cashable, restricted and nonrestricted amounts in a 0x74 response
+BALANCE_AMOUNTS = ((12, 5), (17, 5), (22, 5))
 
 class SasMoney:
     """
@@ -32,167 +42,149 @@ class SasMoney:
         self.is_waiting_for_bakiye_sifirla = 0
         self.is_waiting_for_meter = False
         self.meter_response_received = False  # New flag to prevent multiple processing
+        self.last_meter_block = None  # sas_meters.MeterBlock of the last complete meter response
+        self.meter_history = None  # meter_history.MeterHistory recording every complete meter response
+        self.meter_listeners = []  # listener(block) for every complete meter response
+        self.meter_cache = MeterCache()  # Machine (game 0) meters, shared by all meter readers
+        self.meter_profile = None  # meter_planner.MeterProfile of the machine; from the config on first use
         # ... add other state as needed
 
+    def register_sas_handlers(self, dispatcher):
+        """Register handlers for the money related SAS responses."""
+        dispatcher.register(0x2F, self.handle_meter_frame)
+        dispatcher.register(0xAF, self.handle_meter_frame)
+        dispatcher.register(0x52, self.handle_meter_frame)
+        for command in sorted(set(SINGLE_METER_POLLS) | {int(c, 16) for c in self.SINGLE_METER_CODES.values()}):
+            dispatcher.register(command, self.handle_meter_frame)
+        dispatcher.register(0x74, self.handle_balance_frame)
+
+    def handle_meter_frame(self, frame):
+        print("Meter response received.")
+        self.is_waiting_for_meter = False
+        self.meter_response_received = True  # Prevent further retries in get_meter
+        return self.handle_single_meter_response(frame)
+
+    def handle_balance_frame(self, frame):
+        print("Balance response received")
+        self.yanit_bakiye_sorgulama(frame)
+
+    @property
+    def address(self):
+        return getattr(self.communicator, 'address', 0x01)
+
+    @property
+    def commands(self):
+        return command_library(self.address)
+
     def komut_cancel_aft_transfer(self):
-        command = "017201800BB4"
-        self.communicator.sas_send_command_with_queue("CancelAFT", command, 1)
+        self.communicator.sas_send_command_with_queue("CancelAFT", self.commands.cancel_aft, 1)
 
     def komut_bakiye_sorgulama(self, sender, isforinfo, sendertext='UndefinedBakiyeSorgulama'):
-        command = "017400000000"
-        command = get_crc(command)
+        command = self.commands.balance_query
         self.communicator.sas_send_command_with_queue("MoneyQuery", command, 0)
         return command
 
+    def build_aft_transfer(self, transfer_type, cashable, restricted, nonrestricted, transfer_flag,
+                           transactionid, assetnumber, registrationkey, pool_id=b"\x00\x00"):
+        """AFT transfer funds (0x72) command. Amounts are in cents, asset number and key are config hex."""
+        command = bytearray((0x00, 0x00, transfer_type))  # transfer code, transfer index, transfer type
+        command += bcd.from_cents(cashable)
+        command += bcd.from_cents(restricted)
+        command += bcd.from_cents(nonrestricted)
+        command.append(transfer_flag)
+        command += bytes.fromhex(assetnumber)
+        command += bytes.fromhex(registrationkey)
+        transaction_id = str(transactionid).encode('ascii')
+        command += bcd.encode(len(transaction_id), 1)
+        command += transaction_id
+        command += bytes(4)  # expiration date
+        command += pool_id
+        command.append(0x00)  # receipt data length
+        return self.commands.dynamic(bytes((0x72, len(command))) + command)
+
     def komut_para_yukle(self, doincreasetransactionid, transfertype, customerbalance, customerpromo, transactionid, assetnumber, registrationkey):
         self.last_para_yukle_date = datetime.datetime.now()
         if doincreasetransactionid:
             transactionid += 1
-        command_header = assetnumber + "72"
-        command = "00"  # transfer code
-        command += "00"  # transfer index
         if transfertype == 10:
-            command += "10"
+            transfer_type = 0x10
         elif transfertype == 11:
-            command += "11"
+            transfer_type = 0x11
         else:
-            command += "00"
-        customerbalanceint = int(customerbalance * 100)
-        command += add_left_bcd(str(customerbalanceint), 5)
-        command += add_left_bcd(str(int(customerpromo * 100)), 5)
-        command += "0000000000"  # nonrestricted amount
-        command += "07"  # transfer flag (hard mode)
-        command += assetnumber
-        command += registrationkey
-        transaction_id_hex = ''.join(f"{ord(c):02x}" for c in str(transactionid))
-        command += add_left_bcd(str(len(transaction_id_hex) // 2), 1)
-        command += transaction_id_hex
-        command += "00000000"  # expiration date
-        command += "0000"  # pool id
-        command += "00"  # receipt data length
-        command_header += hex(len(command) // 2).replace("0x", "")
-        full_command = get_crc(command_header + command)
+            transfer_type = 0x00
+        full_command = self.build_aft_transfer(
+            transfer_type, int(customerbalance * 100), int(customerpromo * 100), 0,
+            0x07,  # transfer flag (hard mode)
+            transactionid, assetnumber, registrationkey)
         self.communicator.sas_send_command_with_queue("ParaYukle", full_command, 1)
 
     def komut_para_sifirla(self, doincreaseid, transactionid, assetnumber, registrationkey):
         self.last_para_sifirla_date = datetime.datetime.now()
         if doincreaseid:
             transactionid += 1
-        command_header = assetnumber + "72"
-        command = "00"  # transfer code
-        command += "00"  # transfer index
-        command += "80"  # transfer type
-        command += add_left_bcd(str(int(self.yanit_bakiye_tutar * 100)), 5)
-        command += add_left_bcd(str(int(self.yanit_restricted_amount * 100)), 5)
-        command += add_left_bcd(str(int(self.yanit_nonrestricted_amount * 100)), 5)
-        command += "0F"  # transfer flag (hard mode)
-        command += assetnumber
-        command += registrationkey
-        transaction_id_hex = ''.join(f"{ord(c):02x}" for c in str(transactionid))
-        command += add_left_bcd(str(len(transaction_id_hex) // 2), 1)
-        command += transaction_id_hex
-        command += "00000000"  # expiration date
-        command += self.yanit_restricted_pool_id if len(self.yanit_restricted_pool_id) == 4 else "0030"
-        command += "00"  # receipt data length
-        command_header += hex(len(command) // 2).replace("0x", "")
-        full_command = get_crc(command_header + command)
+        pool_id = self.yanit_restricted_pool_id if len(self.yanit_restricted_pool_id) == 4 else "0030"
+        full_command = self.build_aft_transfer(
+            0x80,  # transfer type: host cashout
+            int(self.yanit_bakiye_tutar * 100), int(self.yanit_restricted_amount * 100),
+            int(self.yanit_nonrestricted_amount * 100),
+            0x0F,  # transfer flag (hard mode)
+            transactionid, assetnumber, registrationkey, bytes.fromhex(pool_id))
         self.communicator.sas_send_command_with_queue("Cashout", full_command, 1)
 
     def yanit_bakiye_sorgulama(self, yanit):
-        # Parse balance query response (simplified)
-        index = 0
-        address = yanit[index:index+2]
-        index += 2
-        command = yanit[index:index+2]
-        index += 2
-        length = yanit[index:index+2]
-        index += 2
-        asset_number = yanit[index:index+8]
-        index += 8
-        game_lock_status = yanit[index:index+2]
-        index += 2
-        available_transfers = yanit[index:index+2]
-        index += 2
-        host_cashout_status = yanit[index:index+2]
-        index += 2
-        aft_status = yanit[index:index+2]
-        index += 2
-        max_buffer_index = yanit[index:index+2]
-        index += 2
-        current_cashable_amount = yanit[index:index+10]
-        index += 10
-        current_restricted_amount = yanit[index:index+10]
-        index += 10
-        current_nonrestricted_amount = yanit[index:index+10]
-        index += 10
+        """Parse balance query (0x74) response"""
+        frame = as_frame(yanit)
+        # address(1) command(1) length(1) asset number(4) game lock status(1) available transfers(1)
+        # host cashout status(1) AFT status(1) max buffer index(1) cashable(5) restricted(5) nonrestricted(5) ...
+        asset_number = frame[3:7]
+        game_lock_status = frame[7]
+        available_transfers = frame[8]
+        host_cashout_status = frame[9]
+        aft_status = frame[10]
+        max_buffer_index = frame[11]
+        # cashable, restricted and nonrestricted amounts in BCD cents
+        cashable, restricted, nonrestricted = bcd.decode_fields(frame, BALANCE_AMOUNTS)
         # ... parse more as needed
-        self.yanit_bakiye_tutar = Decimal(current_cashable_amount) / 100
-        self.yanit_restricted_amount = Decimal(current_restricted_amount) / 100
-        self.yanit_nonrestricted_amount = Decimal(current_nonrestricted_amount) / 100
+        self.yanit_bakiye_tutar = Decimal(cashable) / 100
+        self.yanit_restricted_amount = Decimal(restricted) / 100
+        self.yanit_nonrestricted_amount = Decimal(nonrestricted) / 100
         print(f"Balance received: cashable={self.yanit_bakiye_tutar}, restricted={self.yanit_restricted_amount}, nonrestricted={self.yanit_nonrestricted_amount}")
 
-    def komut_get_meter(self, isall=0, gameid=0):
-        print("=== METER: komut_get_meter called ===")
-        print(f"METER: komut_get_meter params: isall={isall}, gameid={gameid}")
-        # Removed buffer clear to avoid missing fast meter responses
+    def meter_command(self, isall=0):
+        """Meter request frame for isall, or None for an unknown value."""
         G_CasinoId = int(self.config.get('casino', 'casinoid', fallback=8))
         IsNewMeter = 1 if G_CasinoId in [8, 11, 7] else 0
         if isall == 0 and IsNewMeter == 0:
-            command = get_crc("012F0C0000A0B802031E00010BA2BA")
+            command = self.commands.meters_2f_basic
         elif isall == 0 and IsNewMeter == 1:
-            command = get_crc("01AF1A0000A000B800020003001E00000001000B00A200BA0005000600")
+            command = self.commands.meters_af_basic
         elif isall == 1:
-            command = get_crc("012F0C00000405060C191D7FFAFBFC")
+            command = self.commands.meters_2f_all
         elif isall == 2:
-            command = get_crc("01AF1A0000A000B800020003001E00000001000B00A200BA0005000600")
+            command = self.commands.meters_af_basic
         else:
             print(f"METER: komut_get_meter unknown isall value: {isall}")
+            return None
+        return command
+
+    def komut_get_meter(self, isall=0, gameid=0):
+        print("=== METER: komut_get_meter called ===")
+        print(f"METER: komut_get_meter params: isall={isall}, gameid={gameid}")
+        command = self.meter_command(isall)
+        if command is None:
             return
-        print(f"METER: komut_get_meter sending command: {command}")
+        print(f"METER: komut_get_meter sending command: {command.hex().upper()}")
         self.communicator.sas_send_command_with_queue("getmeter2", command, 0)
         print("=== METER: komut_get_meter end ===")
 
     def bcd_to_int(self, bcd_str):
         """Convert a BCD string (e.g., '00012345') to an integer."""
-        # Each pair of hex digits is a BCD byte
-        # Convert to decimal by treating each nibble as a digit
-        digits = ''
-        for i in range(0, len(bcd_str), 2):
-            byte = bcd_str[i:i+2]
-            if len(byte) < 2:
-                continue
-            high = int(byte[0], 16)
-            low = int(byte[1], 16)
-            digits += f"{high}{low}"
+        if bcd.is_valid_bcd(bcd_str):
+            return bcd.decode_hex(bcd_str)
+        # A-F nibbles are written out as the digits 10-15, as this method always did ('1A' -> 110)
+        digits = "".join(str(int(c, 16)) for c in bcd_str[:len(bcd_str) & ~1])
         return int(digits.lstrip('0') or '0')
 
-    METER_CODE_MAP = {
-        '00': ('total_turnover', 5),
-        '01': ('total_win', 5),
-        '02': ('total_jackpot', 5),
-        '03': ('total_handpay', 5),
-        '04': ('total_cancelled_credits', 5),
-        '05': ('games_played', 4),
-        '06': ('games_won', 4),
-        '0B': ('bills_accepted', 4),
-        '0C': ('current_credits', 5),
-        '15': ('total_ticket_in', 5),
-        '16': ('total_ticket_out', 5),
-        '17': ('total_electronic_in', 5),
-        '18': ('total_electronic_out', 5),
-        '1D': ('machine_paid_progressive', 5),
-        '1E': ('total_bonus', 5),
-        '23': ('total_handpaid_credits', 5),
-        '7F': ('weighted_avg_payback', 4),
-        'A0': ('total_coin_in', 5),
-        'A2': ('non_cashable_in', 5),
-        'B8': ('total_coin_out', 5),
-        'BA': ('non_cashable_out', 5),
-        'FA': ('regular_cashable_keyed', 5),
-        'FB': ('restricted_keyed', 5),
-        'FC': ('nonrestricted_keyed', 5),
-    }
-
     # Single meter command codes (for individual meter requests)
     SINGLE_METER_CODES = {
         'total_bet': '11',
@@ -206,170 +198,110 @@ class SasMoney:
         'bills_total': '1E',
     }
 
-    def get_length_by_meter_code(self, meter_code):
-        """
-        Determine meter value length by code, exactly matching the reference implementation.
-        Some meters are 5 bytes, others are 4 bytes.
-        """
-        five_byte_codes = ["0D", "0E", "0F", "10", "80", "82", "84", "86", "88", "8A", "8C", "8E", 
-                          "90", "92", "A0", "A2", "A4", "A6", "A8", "AA", "AC", "AE", "B0", "B8", 
-                          "BA", "BC"]
-        
-        if meter_code.upper() in five_byte_codes:
-            return 5
-        return 4
-
     def handle_single_meter_response(self, tdata):
         """
-        Parses a SAS meter response using the exact logic from the working reference Yanit_MeterAll function.
-        Supports both 2F and AF command types with dynamic code/length parsing.
+        Decode a 2F/AF/single meter response (sas_meters table decoder) and return {meter name: value}.
+        Accepts a SASFrame/bytes, or hex text as the legacy callers pass. Returns None for a
+        truncated response or a frame that is not a meter block.
         """
-        print(f"--- Parsing SAS Meter Response: {tdata} ---")
-        if len(tdata) < 10:
-            print(f"Response too short to be a valid meter block: {tdata}")
-            return
+        block = self.accept_meter_frame(tdata)
+        return block.scaled() if block is not None else None
 
-        idx = 0
-        address = tdata[idx:idx+2]
-        idx += 2
-        command = tdata[idx:idx+2].upper()
-        idx += 2
-        length = tdata[idx:idx+2]
-        idx += 2
-        
-        message_length = (int(tdata[4:6], 16) * 2) + 10
-        
-        if command == "2F":
-            game_number = tdata[idx:idx+4]
-            idx += 4
-
-        parsed_meters = {}
-        received_all_meter = f"{tdata}|"
-
-        def money_fmt(val):
-            return f"{val:,.2f} TL"
-
-        print(f"[DEBUG] Entered handle_single_meter_response with command: {command}")
-
-        if command == "2F":
-            # Parse as block using reference logic: [code][value]...[code][value]...
-            meter_code = "XXXX"
-            # Calculate where meter data should end (exclude CRC)
-            meter_data_end = message_length - 4  # Subtract 4 for CRC
-            
-            while len(meter_code) > 0 and idx < meter_data_end:
-                if idx + 2 > meter_data_end:
-                    break
-                    
-                meter_code = tdata[idx:idx+2].upper()
-                if not meter_code or len(meter_code) < 2:
-                    break
-                idx += 2
-                
-                next_length = self.get_length_by_meter_code(meter_code) * 2
-                
-                if idx + next_length > meter_data_end:
-                    print(f"[DEBUG] Would exceed meter data boundary, stopping at code {meter_code}")
-                    break
-                    
-                meter_val = tdata[idx:idx+next_length]
-                idx += next_length
-                
-                print(f"[DEBUG] meter_code={meter_code}, length={next_length//2} bytes, meter_val={meter_val}")
-                
-                try:
-                    # Use decimal interpretation, divide by 10 (not 100) for this machine
-                    meter_value = int(meter_val) / 10.0
-                    
-                    # Store the parsed meter using the same variable names as reference
-                    meter_name = self.METER_CODE_MAP.get(meter_code, (meter_code, next_length//2))[0]
-                    parsed_meters[meter_name] = meter_value
-                    received_all_meter += f"{meter_code}-{meter_val}|"
-                    
-                    print(f"  {meter_name} ({meter_code}): {money_fmt(meter_value)}")
-                    
-                except Exception as e:
-                    print(f"Meter parse error: {meter_code} {meter_val} {e}")
-                    break
-            print("--- End of 2F Meter Block ---")
-            
-        elif command == "AF":
-            # Parse AF format: [code][00][len][value]...
-            try_count = 0
-            while try_count < 15 and idx < len(tdata):
-                try_count += 1
-                
-                meter_code = tdata[idx:idx+2].upper()
-                idx += 4  # skip code + 00
-                
-                if idx + 2 > len(tdata):
-                    break
-                    
-                meter_length = int(tdata[idx:idx+2], 16)
-                idx += 2
-                hex_len = meter_length * 2
-                
-                if idx + hex_len > len(tdata):
-                    break
-                    
-                meter_val = tdata[idx:idx+hex_len]
-                idx += hex_len
-                
-                print(f"[DEBUG] AF meter_code={meter_code}, length={meter_length} bytes, meter_val={meter_val}")
-                
-                try:
-                    # Use decimal interpretation, divide by 10 (not 100) for this machine
-                    meter_value = int(meter_val) / 10.0
-                    meter_name = self.METER_CODE_MAP.get(meter_code, (meter_code, meter_length))[0]
-                    parsed_meters[meter_name] = meter_value
-                    received_all_meter += f"{meter_code}-{meter_val}|"
-                    print(f"  {meter_name} ({meter_code}): {money_fmt(meter_value)}")
-                    
-                except Exception as e:
-                    print(f"AF Meter parse error: {meter_code} {meter_val} {e}")
-                    break
-            print("--- End of AF Meter Block ---")
-            
-        else:
-            print(f"Unknown meter response command: {command}")
-
-        # Check message length like the reference
-        if len(tdata) < message_length:
+    def accept_meter_frame(self, tdata):
+        """Decode a meter response and hand it to the cache, history and listeners. Returns the MeterBlock, or None."""
+        frame = as_frame(tdata)
+        block = decode_meter_frame(frame)
+        if block is None:
+            print(f"Unknown or too short meter response: {frame}")
+            return None
+        if not block.complete:
             print("********** METER RECEIVED BUT NOT ACCEPTED! ***************")
-            print(f"Expected length: {message_length}, actual: {len(tdata)}")
-            return
-            
-        # Clear waiting flag like the reference
+            print(f"Truncated meter response ({len(frame)} bytes): {frame}")
+            return None
         self.is_waiting_for_meter = False
-        print(received_all_meter)
-        print("Meter is received")
-        
-        print(f"[DEBUG] handle_single_meter_response finished. Parsed meters: {parsed_meters}")
-        return parsed_meters
+        self.last_meter_block = block
+        if block.game_number == 0:
+            # Machine totals; per game meters go to the listeners only (meter_sweep.GameMeterTable)
+            self.meter_cache.update(block)
+            if self.meter_history is not None:
+                self.meter_history.append(block)
+        for listener in self.meter_listeners:
+            try:
+                listener(block)
+            except Exception as e:
+                print(f"Meter listener error: {e}")
+        print(f"Meter is received: {len(block)} meters ({frame[1]:02X}, game {block.game_number})")
+        return block
+
+    def _meter_response(self, frame):
+        self.meter_response_received = True
+        return self.accept_meter_frame(frame)
 
-    def get_meter(self, isall=0, sender="Unknown", gameid=0):
+    def get_meter(self, isall=0, sender="Unknown", gameid=0, max_age=None):
         """
-        Sends a meter request and waits for a response with a simple timeout.
-        This version avoids sending rapid, duplicate commands.
+        Meters of the fixed set for isall as {name: value}, or None. Meters younger than max_age
+        seconds (default: each meter's TTL) come from the meter cache; the others are read with
+        one request that concurrent callers share. Without a reader to wait on (or when called
+        from a handler on the reader thread) the request is only sent and the meter handler
+        processes the response.
         """
         print(f"=== METER: Getting meters (isall={isall}, sender={sender}) ===")
         start_time = datetime.datetime.now()
-        self.is_waiting_for_meter = True
-        self.meter_response_received = False
-        # Send the command once
-        self.komut_get_meter(isall, gameid)
-        # Wait for a response with a timeout
-        timeout_seconds = 5
-        while self.is_waiting_for_meter and (datetime.datetime.now() - start_time).total_seconds() < timeout_seconds:
-            time.sleep(0.1) # Poll for the response flag every 100ms
-        if not self.is_waiting_for_meter:
-            print("METER: Success! Meter response received.")
-        else:
-            # If we're still waiting, it's a timeout
-            self.is_waiting_for_meter = False # Ensure the loop terminates
-            print(f"METER: Timeout after {timeout_seconds} seconds waiting for meter response.")
+        command = self.meter_command(isall)
+        if command is None:
+            return None
+        meters = self.get_meters(request_codes(command), max_age)
         duration = datetime.datetime.now() - start_time
         print(f"=== METER: Process completed in {duration.total_seconds():.2f} seconds ===")
+        return meters
+
+    def get_meters(self, meters=None, max_age=None):
+        """
+        {name: value} of any meters (names from sas_meters.METER_CODES or codes; None for the
+        whole catalogue), through the meter cache. None if none could be read.
+        """
+        values = self.read_meters(METER_CODES if meters is None else meter_codes(meters), max_age)
+        if not values:
+            print("METER: No meter response")
+            return None
+        print(f"METER: Success! {len(values)} meters.")
+        return scaled_meters(values.items())
+
+    def read_meters(self, codes, max_age=None):
+        """
+        Raw values {code: value} of machine (game 0) meters, through the meter cache. Meters
+        that could not be read are left out.
+        """
+        return self.meter_cache.get(list(codes), self.request_meters, max_age)
+
+    def request_meters(self, meters, game_number=0):
+        """
+        Read meters (names or codes) with the fewest requests meter_planner finds for this
+        machine's profile and merge the responses into one MeterBlock. Without a reader to wait
+        on the requests are only sent and None is returned.
+        """
+        if self.meter_profile is None:
+            self.meter_profile = profile_for(self.config)
+        plan = plan_meters(meters, self.meter_profile, self.address, game_number)
+        if plan.unsupported:
+            print(f"METER: {self.meter_profile.name} machines do not report {plan.unsupported}")
+        if not self.communicator.can_wait_for_response():
+            for frame in plan.frames:
+                self.communicator.sas_send_command_with_queue("getmeter2", frame, 0)
+            return None
+        self.is_waiting_for_meter = True
+        self.meter_response_received = False
+        futures = [self.communicator.request("getmeter2", frame, METER_POLICY, parse=self._meter_response)
+                   for frame in plan.frames]
+        blocks = []
+        for future in futures:
+            try:
+                blocks.append(self.communicator.requests.wait(future))
+            except Exception as e:
+                print(f"METER: No meter response: {e}")
+                blocks.append(None)
+        self.is_waiting_for_meter = self.meter_cache.is_reading()
+        return merge_blocks(blocks, game_number)
 
     def run_all_meters(self):
         print("DEBUG: run_all_meters START")
@@ -378,4 +310,4 @@ class SasMoney:
 
     def is_valid_bcd(self, hex_str):
         """Check if a hex string is valid BCD (only 0-9 digits)."""
-        return all(c in '0123456789' for c in hex_str) 
\ No newline at end of file
+        return bcd.is_valid_bcd(hex_str)
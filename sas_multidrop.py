@@ -0,0 +1,95 @@
+# SAS Multi-drop
+# Reference: docs/sas-protocol-info.md (general poll 0x80 | address)
+# Several gaming machines on one physical loop, each answering to its own address.
+# General polls rotate over the addresses by weight; every received frame is booked
+# into the state of the machine that sent it (or, for single byte replies, was polled).
+#
+# settings.ini:
+#   [sas]
+#   addresses = 01, 02:2, 05
+# (address[:weight]; without it the single [sas] address is polled)
+
+import time
+
+from sas_commands import command_library
+from sas_frame import EXCEPTION_COMMAND
+
+# A machine that sees no poll for this long may declare the link down
+MAX_POLL_GAP = 5.0
+
+
+def parse_addresses(value):
+    """[sas] addresses value -> list of (address int, weight)."""
+    addresses = []
+    for entry in (value or "").split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        address, _, weight = entry.partition(":")
+        addresses.append((int(address, 16), max(1, int(weight)) if weight else 1))
+    return addresses
+
+
+class SASMachine:
+    """State of one gaming machine on a multi-drop link."""
+
+    def __init__(self, address, weight=1):
+        self.address = address
+        self.weight = weight
+        self.commands = command_library(address)
+        self.general_polls = 0
+        self.frames = 0
+        self.exceptions = 0
+        self.last_exception = None
+        self.last_poll = None
+        self.max_poll_gap = 0.0
+        self.last_frame_at = None
+        self.poll_gap_warned = False
+
+    def polled(self, now=None):
+        now = time.monotonic() if now is None else now
+        if self.last_poll is not None:
+            gap = now - self.last_poll
+            if gap > self.max_poll_gap:
+                self.max_poll_gap = gap
+            if gap > MAX_POLL_GAP and not self.poll_gap_warned:
+                self.poll_gap_warned = True
+                print(f"[SASMultidrop] Address {self.address:02X} not polled for {gap:.1f} s")
+        self.last_poll = now
+        self.general_polls += 1
+
+    def record(self, frame, now=None):
+        self.frames += 1
+        self.last_frame_at = time.monotonic() if now is None else now
+        code = frame.exception_code
+        if code is not None and (len(frame) == 1 or frame[1] == EXCEPTION_COMMAND) and code != 0x00:
+            self.exceptions += 1
+            self.last_exception = code
+
+    def as_dict(self):
+        return {
+            "weight": self.weight,
+            "general_polls": self.general_polls,
+            "frames": self.frames,
+            "exceptions": self.exceptions,
+            "last_exception": f"{self.last_exception:02X}" if self.last_exception is not None else None,
+            "max_poll_gap_ms": round(self.max_poll_gap * 1000, 1),
+        }
+
+
+class WeightedAddressRotation:
+    """Smooth weighted round-robin over machine addresses: weights 2:1 poll A, B, A, A, B, A..."""
+
+    def __init__(self, machines):
+        self.machines = list(machines)
+        self.current = {m.address: 0 for m in self.machines}
+        self.total = sum(m.weight for m in self.machines)
+
+    def next(self):
+        best = None
+        for machine in self.machines:
+            self.current[machine.address] += machine.weight
+            if best is None or self.current[machine.address] > self.current[best.address]:
+                best = machine
+        self.current[best.address] -= self.total
+        return best
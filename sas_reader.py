@@ -0,0 +1,111 @@
+import threading
+import time
+from sas_frame_parser import SASFrameParser
+
+DEFAULT_INTER_BYTE_GAP = 0.01  # A frame of unknown length ends when the line is quiet this long
+
+
+def set_read_timeout(port, timeout):
+    # pyserial reconfigures the port on every assignment: only touch it when it changes
+    if port.timeout != timeout:
+        port.timeout = timeout
+
+
+def read_until_gap(port, size, timeout, gap=DEFAULT_INTER_BYTE_GAP):
+    """
+    Up to size bytes: wait up to timeout for the first one, then read on until size bytes
+    are in or the line stays quiet for gap seconds. The gap is timed here, with short reads:
+    pyserial's inter_byte_timeout becomes VTIME (tenths of a second) on POSIX, where 10 ms
+    rounds down to 0 and does nothing.
+    """
+    set_read_timeout(port, timeout)
+    data = bytearray(port.read(1))
+    if not data:
+        return b""
+    set_read_timeout(port, gap)
+    while len(data) < size:
+        chunk = port.read(min(size - len(data), port.in_waiting or 1))
+        if not chunk:
+            break
+        data += chunk
+    return bytes(data)
+
+
+class SASReaderThread:
+    """
+    Owns the receive side of the SAS port. Does blocking reads sized to the frame
+    being assembled and hands complete frames to on_frame without any sleeps.
+    A frame of unknown length ends at the first read of inter_byte_timeout that stays empty.
+    """
+
+    READ_CHUNK = 256
+
+    def __init__(self, serial_port, on_frame, address=0x01, read_timeout=0.1,
+                 inter_byte_timeout=DEFAULT_INTER_BYTE_GAP, on_tick=None, on_error=None):
+        self.serial_port = serial_port
+        self.parser = SASFrameParser(on_frame, address)
+        self.on_tick = on_tick  # Called after every read step, e.g. to expire overdue requests
+        self.on_error = on_error  # Called with every read exception, e.g. to report a link fault
+        self.read_timeout = read_timeout
+        self.inter_byte_timeout = inter_byte_timeout
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            print("[SASReader] Reader already running.")
+            return
+        set_read_timeout(self.serial_port, self.read_timeout)
+        self.running = True
+        self.thread = threading.Thread(target=self._read_loop, name="sas-reader", daemon=True)
+        self.thread.start()
+        print(f"[SASReader] Reader started on {self.serial_port.port}")
+
+    def stop(self):
+        self.running = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1)
+        self.thread = None
+        print("[SASReader] Reader stopped.")
+
+    def is_reader_thread(self):
+        """True when called from the reader thread itself (handlers must not block on responses)."""
+        return self.thread is threading.current_thread()
+
+    def is_alive(self):
+        return bool(self.thread and self.thread.is_alive())
+
+    def _read_loop(self):
+        while self.running:
+            try:
+                self.read_once()
+                if self.on_tick:
+                    self.on_tick()
+            except Exception as e:
+                if self.running:
+                    print(f"[SASReader] Read error: {e}")
+                    self.parser.buffer.clear()
+                    if self.on_error:
+                        self.on_error(e)
+                    # Do not spin on a dead port
+                    time.sleep(self.read_timeout)
+
+    def read_once(self):
+        """
+        Single read step; returns the bytes read. On an idle line it waits up to read_timeout
+        for the first byte of a frame; inside a frame it reads what has arrived, or waits up
+        to inter_byte_timeout for one more byte. An empty wait there is the gap that ends it.
+        """
+        port = self.serial_port
+        if not self.parser.buffer:
+            set_read_timeout(port, self.read_timeout)
+            chunk = port.read(1)
+        else:
+            needed = self.parser.bytes_needed() or self.READ_CHUNK
+            set_read_timeout(port, self.inter_byte_timeout)
+            chunk = port.read(min(needed, port.in_waiting or 1))
+            if not chunk:
+                self.parser.flush()
+        if chunk:
+            self.parser.feed(chunk)
+        return chunk
@@ -0,0 +1,193 @@
+# SAS Request/Response Correlation
+# A long poll sent through PendingRequests returns a Future that the reader thread resolves
+# when the matching response (address + command) arrives, so callers never poll shared flags.
+# Meter responses of one game (2F, AF, 52) also carry its game number, so a machine total
+# read and a per game read in flight at the same time each get their own response.
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError
+
+
+class RetryPolicy:
+    """
+    Per-command response timeout and number of resends. requeues bounds the extra resends
+    of a long poll whose response a real time event took (see PendingRequests.requeue).
+    """
+
+    def __init__(self, timeout=0.5, retries=2, requeues=3):
+        self.timeout = timeout
+        self.retries = retries
+        self.requeues = requeues
+
+    @property
+    def total_timeout(self):
+        return self.timeout * (self.retries + 1)
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+# Commands whose request and response carry the 2 byte BCD game number at the same offset
+GAME_NUMBER_OFFSETS = {0x2F: 3, 0xAF: 3, 0x52: 2}
+
+
+def response_key(frame):
+    """(address, command[, game number bytes]) shared by a long poll and its response."""
+    offset = GAME_NUMBER_OFFSETS.get(frame[1])
+    if offset is not None and len(frame) >= offset + 2:
+        return (frame[0], frame[1], bytes(frame[offset:offset + 2]))
+    return (frame[0], frame[1])
+
+
+class SASRequest:
+    """One outstanding long poll."""
+
+    def __init__(self, name, command, key, policy, parse, priority=None):
+        self.name = name
+        self.command = command
+        self.key = key
+        self.policy = policy
+        self.parse = parse
+        self.priority = priority  # Scheduler priority class, None for the command's own
+        self.future = Future()
+        self.attempts = 0
+        self.requeues = 0
+        self.sent_at = None
+        self.deadline = None
+
+
+class PendingRequests:
+    """
+    Outstanding requests keyed by the expected response_key() of their response.
+    Requests with the same key are answered in the order they were sent.
+    resolve() and expire() are called from the reader thread.
+    """
+
+    def __init__(self, send):
+        self.send = send  # send(name, command, on_sent[, priority]): on_sent() once the command is on the line
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.completed = 0
+        self.timeouts = 0
+        self.resends = 0
+        self.requeues = 0
+
+    def submit(self, name, command, expect=None, policy=None, parse=None, priority=None):
+        """
+        Send command and return a Future for its response.
+        expect defaults to the response_key() of the command itself.
+        The future's result is parse(frame) if parse is given, else the frame.
+        """
+        key = expect or response_key(command)
+        request = SASRequest(name, command, key, policy or DEFAULT_POLICY, parse, priority)
+        with self.lock:
+            self.pending.setdefault(key, deque()).append(request)
+        self._transmit(request)
+        return request.future
+
+    def _transmit(self, request, count=True):
+        if count:
+            request.attempts += 1
+        # The response timeout runs from the moment the command is on the line, not from queueing
+        request.deadline = None
+        if request.priority is None:
+            self.send(request.name, request.command, on_sent=lambda: self._started(request))
+        else:
+            self.send(request.name, request.command, on_sent=lambda: self._started(request),
+                      priority=request.priority)
+
+    def _started(self, request):
+        request.sent_at = time.monotonic()
+        request.deadline = request.sent_at + request.policy.timeout
+
+    def resolve(self, frame):
+        """Complete the oldest request waiting for this frame. Returns False if nobody was waiting."""
+        if len(frame) < 2 or not self.pending:
+            return False
+        key = response_key(frame)
+        with self.lock:
+            queue = self.pending.get(key)
+            if not queue:
+                return False
+            request = queue.popleft()
+            if not queue:
+                del self.pending[key]
+        self.completed += 1
+        try:
+            result = request.parse(frame) if request.parse else frame
+            request.future.set_result(result)
+        except Exception as e:
+            request.future.set_exception(e)
+        return True
+
+    def expire(self, now=None):
+        """Resend or fail requests whose response is overdue."""
+        if not self.pending:
+            return
+        now = time.monotonic() if now is None else now
+        resend = []
+        failed = []
+        with self.lock:
+            for key in list(self.pending):
+                queue = self.pending[key]
+                for request in list(queue):
+                    if request.deadline is None or request.deadline > now:
+                        continue
+                    if request.attempts <= request.policy.retries:
+                        resend.append(request)
+                    else:
+                        queue.remove(request)
+                        failed.append(request)
+                if not queue:
+                    del self.pending[key]
+        for request in resend:
+            self.resends += 1
+            self._transmit(request)
+        for request in failed:
+            self.timeouts += 1
+            request.future.set_exception(TimeoutError(
+                f"No response to {request.name} after {request.attempts} attempts"))
+
+    def requeue(self, key):
+        """
+        The machine answered the long poll for key with a real time event instead of its response:
+        send the oldest one already on the line again now, without using up one of its retries.
+        After policy.requeues such resends it waits out its timeout and retries like any other,
+        so a machine that keeps reporting events cannot keep a request alive forever.
+        """
+        with self.lock:
+            queue = self.pending.get(key)
+            request = next((r for r in queue if r.deadline is not None), None) if queue else None
+            if request is None or request.requeues >= request.policy.requeues:
+                return False
+            request.requeues += 1
+        self.requeues += 1
+        self._transmit(request, count=False)
+        return True
+
+    def cancel(self, future):
+        """Forget the request behind future (caller gave up waiting)."""
+        with self.lock:
+            for key in list(self.pending):
+                queue = self.pending[key]
+                for request in list(queue):
+                    if request.future is future:
+                        queue.remove(request)
+                if not queue:
+                    del self.pending[key]
+        future.cancel()
+
+    def wait(self, future, slack=0.5):
+        """Block for the result of a submitted request, bounded by its retry policy."""
+        request_timeout = DEFAULT_POLICY.total_timeout
+        with self.lock:
+            for queue in self.pending.values():
+                for request in queue:
+                    if request.future is future:
+                        request_timeout = request.policy.total_timeout
+        try:
+            return future.result(timeout=request_timeout + slack)
+        except TimeoutError:
+            self.cancel(future)
+            raise
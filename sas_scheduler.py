@@ -0,0 +1,225 @@
+# SAS Line Scheduler
+# Reference: docs/sas-protocol-info.md (general poll cadence, host long polls)
+# One thread owns the transmit side of the SAS line. Every slot carries either a general
+# poll (80/81) or the highest priority queued long poll, and a long poll is always followed
+# by a general poll so exceptions keep flowing while the queue drains. After a long poll the
+# line is held until its reply has come in (response_received()) or response_timeout has
+# passed: a 2F/AF reply at 19200 baud can outlast a 40 ms slot.
+
+import heapq
+import itertools
+import threading
+import time
+
+from poll_loop import DEFAULT_POLL_INTERVAL, PollLoop
+
+DEFAULT_RESPONSE_TIMEOUT = 0.2  # Reply starts within 20 ms; 258 bytes at 19200 baud take ~150 ms
+
+PRIORITY_AFT = 0        # AFT transfers, registration, game lock / enable / disable
+PRIORITY_EXCEPTION = 1  # Long polls sent in reaction to an exception (handpay, tickets, bills)
+PRIORITY_BALANCE = 2    # Balance / AFT status interrogation
+PRIORITY_INFO = 3       # Meters and informational queries
+PRIORITY_IDLE = 4       # Background reads (per game meter sweep): only slots nothing else wants
+
+PRIORITY_NAMES = {
+    PRIORITY_AFT: "aft",
+    PRIORITY_EXCEPTION: "exception",
+    PRIORITY_BALANCE: "balance",
+    PRIORITY_INFO: "info",
+    PRIORITY_IDLE: "idle",
+}
+
+COMMAND_PRIORITIES = {
+    0x01: PRIORITY_AFT,        # Shutdown (lock out play)
+    0x02: PRIORITY_AFT,        # Startup (enable play)
+    0x0E: PRIORITY_EXCEPTION,  # Enable/disable real time event reporting
+    0x72: PRIORITY_AFT,        # AFT transfer funds
+    0x73: PRIORITY_AFT,        # AFT register gaming machine
+    0x1B: PRIORITY_EXCEPTION,  # Handpay information
+    0x48: PRIORITY_EXCEPTION,  # Last accepted bill information
+    0x4D: PRIORITY_EXCEPTION,  # Enhanced validation information
+    0x57: PRIORITY_EXCEPTION,  # Pending cashout information
+    0x58: PRIORITY_EXCEPTION,  # Receive validation number
+    0x70: PRIORITY_EXCEPTION,  # Ticket validation data
+    0x71: PRIORITY_EXCEPTION,  # Redeem ticket
+    0x94: PRIORITY_EXCEPTION,  # Remote handpay reset
+}
+
+
+def command_priority(command):
+    """Priority class of a long poll frame (bytes: address, command, data, CRC)."""
+    if len(command) < 2:
+        return PRIORITY_INFO
+    code = command[1]
+    if code == 0x74:
+        # Lock code 00 with a lock timeout is a game lock request, anything else a status query
+        if len(command) >= 6 and command[2] == 0x00 and (command[4] or command[5]):
+            return PRIORITY_AFT
+        return PRIORITY_BALANCE
+    return COMMAND_PRIORITIES.get(code, PRIORITY_INFO)
+
+
+class ScheduledCommand:
+    """A queued long poll."""
+
+    __slots__ = ("name", "command", "priority", "queued_at", "on_sent")
+
+    def __init__(self, name, command, priority, on_sent=None):
+        self.name = name
+        self.command = command
+        self.priority = priority
+        self.queued_at = time.monotonic()
+        self.on_sent = on_sent
+
+
+class QueueStats:
+    """Wait time statistics for one priority class."""
+
+    def __init__(self):
+        self.sent = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def add(self, wait):
+        self.sent += 1
+        self.total_wait += wait
+        if wait > self.max_wait:
+            self.max_wait = wait
+
+    def as_dict(self, depth):
+        return {
+            "depth": depth,
+            "sent": self.sent,
+            "avg_wait_ms": round(self.total_wait / self.sent * 1000, 2) if self.sent else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+
+
+class SASScheduler:
+    """
+    Owns the SAS line. send_long_poll(command) and send_general_poll() are called on the
+    scheduler thread only; other threads hand long polls in through submit().
+    Slots are driven by a PollLoop every poll_interval seconds (40 ms like the working code),
+    or by another driver (the asyncio engine) that calls run_slot() after attach().
+    """
+
+    def __init__(self, send_long_poll, send_general_poll, poll_interval=DEFAULT_POLL_INTERVAL,
+                 response_timeout=DEFAULT_RESPONSE_TIMEOUT):
+        self.send_long_poll = send_long_poll
+        self.send_general_poll = send_general_poll
+        self.response_timeout = response_timeout
+        self.loop = PollLoop(self.run_slot, poll_interval, name="sas-scheduler")
+        self.queue = []
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        self.stats_by_priority = {p: QueueStats() for p in PRIORITY_NAMES}
+        self.depth = {p: 0 for p in PRIORITY_NAMES}
+        self.general_polls = 0
+        self.long_polls = 0
+        self.busy_slots = 0  # Slots where a long poll was waiting behind the general poll
+        self.held_slots = 0  # Slots skipped while a long poll reply was still coming in
+        self.response_timeouts = 0  # Long polls whose reply never completed
+        self.awaiting_until = None  # Line held for a long poll reply until then
+        self.last_was_long_poll = False
+        self.last_sent = 0.0
+        self.driver_thread = None  # Thread of an external driver, see attach()
+
+    def submit(self, name, command, priority=None, on_sent=None):
+        """Queue a long poll; on_sent() is called right after it is written to the line."""
+        if priority is None:
+            priority = command_priority(command)
+        item = ScheduledCommand(name, command, priority, on_sent)
+        with self.lock:
+            heapq.heappush(self.queue, (priority, next(self.sequence), item))
+            self.depth[priority] += 1
+        return item
+
+    def queue_depth(self):
+        return len(self.queue)
+
+    def is_scheduler_thread(self):
+        if self.driver_thread is not None:
+            return self.driver_thread is threading.current_thread()
+        return self.loop.is_loop_thread()
+
+    def attach(self):
+        """The calling thread drives the slots from now on (calls run_slot() itself)."""
+        self.driver_thread = threading.current_thread()
+
+    def detach(self):
+        self.driver_thread = None
+
+    def _next_long_poll(self):
+        with self.lock:
+            if not self.queue:
+                return None
+            item = heapq.heappop(self.queue)[2]
+            self.depth[item.priority] -= 1
+            return item
+
+    def response_received(self):
+        """A frame has completed on the line: the reply to the last long poll is in."""
+        self.awaiting_until = None
+
+    def is_holding(self, now=None):
+        """True while the reply to the last long poll may still be coming in."""
+        awaiting_until = self.awaiting_until
+        if awaiting_until is None:
+            return False
+        if (time.monotonic() if now is None else now) < awaiting_until:
+            return True
+        self.awaiting_until = None
+        self.response_timeouts += 1
+        return False
+
+    def run_slot(self):
+        """Transmit one slot: a queued long poll, or a general poll. Returns what was sent."""
+        if self.is_holding():
+            self.held_slots += 1
+            return None
+        item = None
+        if not self.last_was_long_poll:
+            item = self._next_long_poll()
+        elif self.queue:
+            self.busy_slots += 1
+        if item is None:
+            self.send_general_poll()
+            self.general_polls += 1
+            self.last_was_long_poll = False
+            self.last_sent = time.monotonic()
+            return None
+        self.send_long_poll(item.command)
+        self.last_sent = time.monotonic()
+        self.awaiting_until = self.last_sent + self.response_timeout
+        self.stats_by_priority[item.priority].add(self.last_sent - item.queued_at)
+        self.long_polls += 1
+        self.last_was_long_poll = True
+        if item.on_sent:
+            try:
+                item.on_sent()
+            except Exception as e:
+                print(f"[SASScheduler] on_sent error for {item.name}: {e}")
+        return item
+
+    def start(self):
+        self.loop.start()
+
+    def stop(self):
+        self.loop.stop()
+
+    def is_alive(self):
+        return self.loop.is_alive() or self.driver_thread is not None
+
+    def stats(self):
+        """Queue depth and wait times per priority class, plus slot usage."""
+        return {
+            "queue_depth": self.queue_depth(),
+            "general_polls": self.general_polls,
+            "long_polls": self.long_polls,
+            "busy_slots": self.busy_slots,
+            "held_slots": self.held_slots,
+            "response_timeouts": self.response_timeouts,
+            "loop": self.loop.stats(),
+            "classes": {name: self.stats_by_priority[p].as_dict(self.depth[p])
+                        for p, name in PRIORITY_NAMES.items()},
+        }
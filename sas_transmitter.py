@@ -0,0 +1,103 @@
+# SAS Wake-up Bit Transmitter
+# The address byte of every host message goes out with the 9th (wake-up) bit set, the rest
+# with it clear. The 9th bit is emulated with the UART parity bit: MARK for the address
+# byte, SPACE for the body.
+#
+# Attribute sets for every parity mode are computed once per open port. Switching uses
+# TCSADRAIN (the change waits until queued bytes are on the wire) instead of sleeps, and
+# the current mode is remembered so back-to-back general polls cost no termios calls.
+# When the whole command gets the right 9th bits from plain EVEN or ODD parity, it is sent
+# as a single write in that mode.
+
+import serial
+
+try:
+    import termios  # For Linux parity control
+except ImportError:  # Windows
+    termios = None
+
+CMSPAR = 0x40000000  # Mark/space parity, not exported by the termios module
+
+MODE_MARK = "mark"
+MODE_SPACE = "space"
+MODE_EVEN = "even"
+MODE_ODD = "odd"
+
+PYSERIAL_PARITY = {
+    MODE_MARK: serial.PARITY_MARK,
+    MODE_SPACE: serial.PARITY_SPACE,
+    MODE_EVEN: serial.PARITY_EVEN,
+    MODE_ODD: serial.PARITY_ODD,
+}
+
+# 1 if the byte has an odd number of set bits
+ODD_BITS = bytes(bin(i).count("1") & 1 for i in range(256))
+
+
+def single_write_modes(command):
+    """Parity modes in which the whole command can be written at once with correct wake-up bits."""
+    if len(command) == 1:
+        odd = ODD_BITS[command[0]]
+        return (MODE_MARK, MODE_EVEN) if odd else (MODE_MARK, MODE_ODD)
+    body_bits = {ODD_BITS[b] for b in command[1:]}
+    if len(body_bits) != 1:
+        return ()
+    address_odd = ODD_BITS[command[0]]
+    # EVEN sets the parity bit for bytes with an odd bit count, ODD for bytes with an even one
+    if address_odd and body_bits == {0}:
+        return (MODE_EVEN,)
+    if not address_odd and body_bits == {1}:
+        return (MODE_ODD,)
+    return ()
+
+
+class WakeupBitTransmitter:
+    """Sends SAS commands on an open serial port. Create it after the port is (re)opened."""
+
+    def __init__(self, serial_port, use_termios=True):
+        self.serial_port = serial_port
+        self.use_termios = use_termios and termios is not None
+        self.mode = None
+        self.attributes = {}
+        self.mode_switches = 0
+        self.single_writes = 0
+        if self.use_termios:
+            self._prepare_termios()
+
+    def _prepare_termios(self):
+        iflag, oflag, cflag, lflag, ispeed, ospeed, cc = termios.tcgetattr(self.serial_port.fileno())
+        base = cflag & ~(termios.PARENB | termios.PARODD | CMSPAR)
+        flags = {
+            MODE_MARK: base | termios.PARENB | CMSPAR | termios.PARODD,
+            MODE_SPACE: base | termios.PARENB | CMSPAR,
+            MODE_EVEN: base | termios.PARENB,
+            MODE_ODD: base | termios.PARENB | termios.PARODD,
+        }
+        for mode, mode_cflag in flags.items():
+            self.attributes[mode] = [iflag, oflag, mode_cflag, lflag, ispeed, ospeed, cc]
+
+    def _set_mode(self, mode):
+        if mode == self.mode:
+            return
+        if self.use_termios:
+            # TCSADRAIN: bytes already queued go out with the old parity first
+            termios.tcsetattr(self.serial_port.fileno(), termios.TCSADRAIN, self.attributes[mode])
+        else:
+            self.serial_port.flush()  # Wait until queued bytes are written
+            self.serial_port.parity = PYSERIAL_PARITY[mode]
+        self.mode = mode
+        self.mode_switches += 1
+
+    def send(self, command):
+        """Write command (bytes) with the wake-up bit on the address byte only."""
+        modes = single_write_modes(command)
+        if modes:
+            if self.mode not in modes:
+                self._set_mode(modes[0])
+            self.serial_port.write(command)
+            self.single_writes += 1
+            return
+        self._set_mode(MODE_MARK)
+        self.serial_port.write(command[0:1])
+        self._set_mode(MODE_SPACE)
+        self.serial_port.write(command[1:])
@@ -0,0 +1,128 @@
+# SAS Handler Worker Pool
+# The reader thread only parses frames and hands (handler, frame) jobs to a small fixed set of
+# worker threads, so a slow handler (meter read, database write) never holds up reading or polling.
+# Jobs are routed to a lane by handler, which keeps every handler's frames in arrival order.
+
+import queue
+import threading
+import time
+
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 256
+
+
+def handler_name(handler):
+    return getattr(handler, "__qualname__", None) or repr(handler)
+
+
+class HandlerTiming:
+    """Call count, run time and errors of one handler."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def add(self, elapsed, failed):
+        self.calls += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+        if failed:
+            self.errors += 1
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_ms": round(self.total_time / self.calls * 1000, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_time * 1000, 3),
+        }
+
+
+class HandlerPool:
+    """
+    Bounded pool of worker threads running dispatcher handlers.
+    submit() never blocks: when a lane's queue is full the job is dropped and counted.
+    When the pool is not started, handlers run inline on the caller's thread.
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, queue_size=DEFAULT_QUEUE_SIZE):
+        self.lanes = [queue.Queue(maxsize=queue_size) for _ in range(max(1, workers))]
+        self.threads = []
+        self.running = False
+        self.timings = {}
+        self.timings_lock = threading.Lock()
+        self.dropped = 0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.threads = [threading.Thread(target=self._work, args=(lane,), name=f"sas-handler-{i}", daemon=True)
+                        for i, lane in enumerate(self.lanes)]
+        for thread in self.threads:
+            thread.start()
+        print(f"[HandlerPool] {len(self.threads)} handler workers started.")
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        for lane in self.lanes:
+            try:
+                lane.put_nowait(None)
+            except queue.Full:
+                pass
+        current = threading.current_thread()
+        for thread in self.threads:
+            if thread is not current:
+                thread.join(timeout=1)
+        self.threads = []
+        print("[HandlerPool] Handler workers stopped.")
+
+    def submit(self, handler, frame):
+        if not self.running:
+            self.run(handler, frame)
+            return True
+        lane = self.lanes[hash(handler) % len(self.lanes)]
+        try:
+            lane.put_nowait((handler, frame))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            print(f"[HandlerPool] Queue full, dropped {frame} for {handler_name(handler)}")
+            return False
+
+    def run(self, handler, frame):
+        """Run one handler call and record its timing."""
+        started = time.monotonic()
+        failed = False
+        try:
+            handler(frame)
+        except Exception as e:
+            failed = True
+            print(f"Error in dispatch for SAS message: {e}")
+        elapsed = time.monotonic() - started
+        name = handler_name(handler)
+        with self.timings_lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = HandlerTiming()
+            timing.add(elapsed, failed)
+
+    def _work(self, lane):
+        while True:
+            job = lane.get()
+            if job is None:
+                break
+            self.run(*job)
+
+    def queue_depth(self):
+        return sum(lane.qsize() for lane in self.lanes)
+
+    def stats(self):
+        with self.timings_lock:
+            handlers = {name: timing.as_dict() for name, timing in self.timings.items()}
+        return {"queue_depth": self.queue_depth(), "dropped": self.dropped, "handlers": handlers}
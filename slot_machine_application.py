@@ -1,10 +1,14 @@
 print("slot_machine_application.py loaded")
-import threading
 import time
 from config_manager import ConfigManager
 from port_manager import PortManager
+from port_discovery import ROLE_CARD_READER, ROLE_SAS
 from sas_communicator import SASCommunicator
 from card_reader_manager import CardReaderManager
+from link_supervisor import LinkSupervisor, sas_link
+from event_bus import EventBus
+from meter_history import DEFAULT_HISTORY_FILE, MeterHistory
+from meter_refresher import DEFAULT_MAX_AGE, attach_meter_refresher
 
 class SlotMachineApplication:
     """Main application - simplified for SAS communication testing"""
@@ -14,8 +18,12 @@ class SlotMachineApplication:
         self.port_mgr = PortManager()
         self.sas_comm = None
         self.running = False
-        self.sas_poll_timer = None
         self.card_reader_mgr = None
+        self.discovery = None
+        self.supervisor = LinkSupervisor()  # Reopens SAS and card reader ports after USB/cable faults
+        self.event_bus = EventBus()  # SAS, card and bill events for UI, uplink and session accounting
+        self.meter_history = None
+        self.meter_refresher = None
 
     def check_system_info(self):
         """Check system and available ports"""
@@ -70,32 +78,48 @@ class SlotMachineApplication:
         # First check system
         self.check_system_info()
         
-        # Find SAS port
-        sas_port, device_type = self.port_mgr.find_sas_port(self.config)
+        # Probe all ports at once: SAS, card reader and bill acceptor
+        self.discovery = self.port_mgr.discover(self.config)
+        sas_port = self.discovery.port_for(ROLE_SAS)
+        device_type = self.config.getint('machine', 'devicetypeid', 8)
         
         if sas_port:
             print(f"Using SAS port: {sas_port}, device type: {device_type}")
             self.config.config.set('machine', 'devicetypeid', str(device_type))
             
             self.sas_comm = SASCommunicator(sas_port, self.config)
+            self.sas_comm.attach_event_bus(self.event_bus)
+            if self.config.getint('meters', 'history', 1):
+                try:
+                    self.meter_history = MeterHistory(self.config.get('meters', 'historyfile', DEFAULT_HISTORY_FILE))
+                    self.sas_comm.sas_money.meter_history = self.meter_history
+                except (OSError, ValueError) as e:
+                    print(f"[Main] Meter history disabled: {e}")
             if self.sas_comm.open_port():
                 print("SAS communication initialized successfully!")
-                # Trigger asset number read so main handler processes it and meters are called
-                self.sas_comm.send_sas_command(self.sas_comm.sas_address + '7301FF')
-                # Wait for asset number response to be processed
-                time.sleep(1.0)
-                # After reading asset number, request and print meters
+                self.sas_comm.start_reader()
+                sas_link(self.sas_comm, self.supervisor)
+                if self.config.getint('sas', 'realtimereporting', 0):
+                    self.sas_comm.set_real_time_reporting(True)
+                self.supervisor.start()
+                # open_port has read the asset number; request and print meters
                 print("[INFO] Requesting meters after asset number read...")
                 self.sas_comm.sas_money.get_meter(isall=0)
+                # Meters are read again when events say they changed; started with the scheduler
+                if self.config.getint('meters', 'eventrefresh', 1):
+                    self.meter_refresher = attach_meter_refresher(
+                        self.sas_comm, max_age=self.config.getint('meters', 'maxage', int(DEFAULT_MAX_AGE)))
                 # --- Card reader manager integration ---
-                if hasattr(self.port_mgr, 'get_all_ports'):
-                    port_list = self.port_mgr.get_all_ports()
+                card_port = self.discovery.port_for(ROLE_CARD_READER)
+                if card_port:
+                    port_list = [{'port_no': card_port, 'is_used': 0, 'device_name': ROLE_CARD_READER}]
                 else:
-                    port_list = []
+                    port_list = [p for p in self.port_mgr.available_ports if not p['is_used']]
                 if not any(p.get('port_no') == '/dev/ttyUSB0' or p.get('port') == '/dev/ttyUSB0' for p in port_list):
                     port_list.append({'port_no': '/dev/ttyUSB0', 'is_used': 0, 'device_name': ''})
                 print(f"[DEBUG] Port list for card reader: {port_list}")
-                self.card_reader_mgr = CardReaderManager(port_list)
+                self.card_reader_mgr = CardReaderManager(port_list, supervisor=self.supervisor,
+                                                         event_bus=self.event_bus)
                 print("[Main] Starting card reader manager thread...")
                 self.card_reader_mgr.start()
                 # --- End card reader manager integration ---
@@ -108,24 +132,17 @@ class SlotMachineApplication:
             return False
 
     def sas_polling_loop(self):
-        """SAS polling loop"""
+        """Start SAS polling: the scheduler polls at the device type's cadence and slots long polls in"""
         if not self.running or not self.sas_comm or not self.sas_comm.is_port_open:
             return
-        
-        # Send poll
-        self.sas_comm.send_general_poll()
-        
-        # Check for response
-        time.sleep(0.05)  # Give time for response
-        response = self.sas_comm.get_data_from_sas_port()
-        if response:
-            self.sas_comm.handle_received_sas_command(response)
-        
-        # Schedule next poll
-        if self.running:
-            self.sas_poll_timer = threading.Timer(0.04, self.sas_polling_loop)  # 40ms like working code
-            self.sas_poll_timer.daemon = True
-            self.sas_poll_timer.start()
+        if not self.sas_comm.start_polling():
+            return
+        # Background meter reads only once the scheduler owns the line and slots them in
+        if self.meter_refresher:
+            self.meter_refresher.start()
+        # Per game meters, pipelined into the slots nothing else wants
+        if self.config.getint('meters', 'gamesweep', 1):
+            self.sas_comm.meter_sweep.start()
 
     def test_sas_commands(self):
         """Test basic SAS commands"""
@@ -138,20 +155,12 @@ class SlotMachineApplication:
         # Test SAS version
         print("Requesting SAS version...")
         self.sas_comm.request_sas_version()
-        time.sleep(0.2)
-        response = self.sas_comm.get_data_from_sas_port()
-        if response:
-            self.sas_comm.handle_received_sas_command(response)
-        
         time.sleep(1)
         
         # Test balance query
         print("Requesting balance info...")
         self.sas_comm.request_balance_info()
         time.sleep(0.2)
-        response = self.sas_comm.get_data_from_sas_port()
-        if response:
-            self.sas_comm.handle_received_sas_command(response)
 
     def start(self):
         """Start the application"""
@@ -182,9 +191,9 @@ class SlotMachineApplication:
         """Shutdown the application"""
         print("Shutting down...")
         self.running = False
-        
-        if self.sas_poll_timer:
-            self.sas_poll_timer.cancel()
+        self.supervisor.stop()
+        if self.meter_refresher:
+            self.meter_refresher.stop()
         
         if self.sas_comm:
             self.sas_comm.close_port()
@@ -192,5 +201,9 @@ class SlotMachineApplication:
         if self.card_reader_mgr:
             print("[Main] Stopping card reader manager thread...")
             self.card_reader_mgr.stop()
+
+        self.event_bus.close()
+        if self.meter_history:
+            self.meter_history.close()
         
         print("Shutdown complete.") 
\ No newline at end of file
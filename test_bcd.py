@@ -0,0 +1,46 @@
+import random
+
+import pytest
+
+import bcd
+
+
+def nibbles_ok(data):
+    return all((b >> 4) < 10 and (b & 0x0F) < 10 for b in data)
+
+
+def test_round_trip_all_widths():
+    rng = random.Random(20)
+    for width in range(1, 10):
+        for _ in range(200):
+            value = rng.randrange(10 ** (width * 2))
+            data = bcd.encode(value, width)
+            assert len(data) == width and bcd.decode(data) == value
+            assert bcd.decode_hex(data.hex()) == value
+    assert bcd.encode(12345, 5) == bytes.fromhex("0000012345")
+
+
+def test_validation_matches_nibble_check():
+    rng = random.Random(21)
+    for _ in range(500):
+        data = bytes(rng.randrange(256) for _ in range(rng.randrange(1, 6)))
+        assert bcd.is_valid_bcd(data) == nibbles_ok(data)
+        assert bcd.is_valid_bcd(data.hex()) == nibbles_ok(data)
+
+
+def test_fields_match_per_field_decode():
+    rng = random.Random(22)
+    data = bytes(rng.randrange(256) for _ in range(30))
+    layout = [(0, 1), (1, 4), (5, 5), (10, 2), (12, 9), (21, 9)]
+    assert bcd.decode_fields(data, layout) == [bcd.decode(data[o:o + w]) for o, w in layout]
+    assert bcd.decode_run(data, 2, 4, 3) == [bcd.decode(data[o:o + 4]) for o in (2, 6, 10)]
+
+
+def test_overflow_and_tolerant_decode():
+    with pytest.raises(ValueError):
+        bcd.encode(100, 1)
+    with pytest.raises(ValueError):
+        bcd.encode(-1, 2)
+    # A-F nibbles decode as high * 10 + low, as the original decoder did
+    assert bcd.decode(b"\x1A") == 20 and bcd.decode(b"\x01\xFF") == 100 + 165
+    assert bcd.to_cents(bcd.from_cents(123456)) == 123456
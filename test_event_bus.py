@@ -0,0 +1,54 @@
+import threading
+import time
+
+from card_reader import CardReader
+from event_bus import BLOCK, TOPIC_CARD_INSERTED, EventBus
+
+
+def test_topics_and_patterns_route_events():
+    bus = EventBus()
+    games = bus.subscribe("games", ["sas.game_started", "sas.game_ended"])
+    sas = bus.subscribe("sas", "sas.*")
+    everything = bus.subscribe("all", "*")
+    bus.publish("sas.game_started", {"credits_wagered": 5})
+    bus.publish("card.inserted", {"card_number": "1EE9E00A"})
+    bus.publish("sasx.other")
+    assert games.get(0).payload == {"credits_wagered": 5} and games.get(0) is None
+    assert [sas.get(0).topic, sas.get(0)] == ["sas.game_started", None]
+    assert [everything.get(0).sequence for _ in range(3)] == [1, 2, 3]
+    assert bus.stats()["subscriptions"]["all"]["delivered"] == 3
+
+
+def test_drop_oldest_keeps_latest_events_without_blocking():
+    bus = EventBus()
+    slow = bus.subscribe("ui", "*", capacity=3)
+    for n in range(10):
+        bus.publish("sas.reel_stopped", n)
+    assert [slow.get(0).payload for _ in range(3)] == [7, 8, 9]
+    stats = slow.stats()
+    assert stats["dropped"] == 7 and stats["max_depth"] == 3
+    assert bus.stats()["publish_latency"]["count"] == 10
+
+
+def test_block_policy_waits_for_the_consumer():
+    bus = EventBus()
+    uplink = bus.subscribe("uplink", "*", capacity=1, policy=BLOCK, block_timeout=2.0)
+    bus.publish("bill.stacked", 1)
+    threading.Timer(0.05, uplink.get).start()
+    started = time.monotonic()
+    bus.publish("bill.stacked", 2)
+    assert time.monotonic() - started >= 0.04
+    assert uplink.get(0).payload == 2 and uplink.stats()["dropped"] == 0 and uplink.stats()["blocked"] == 1
+
+
+def test_callback_subscription_and_card_reader_feed():
+    bus = EventBus()
+    seen = []
+    done = threading.Event()
+    bus.subscribe("session", "card.*", callback=lambda e: (seen.append(e), done.set()))
+    reader = CardReader()
+    reader.event_bus = bus
+    reader._update_card_state("020007" + "353159" + "1EE9E00A" + "03")
+    assert done.wait(1)
+    assert seen[0].topic == TOPIC_CARD_INSERTED and seen[0].payload == {"card_number": "1EE9E00A"}
+    bus.close()
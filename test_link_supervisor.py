@@ -0,0 +1,162 @@
+from link_supervisor import Backoff, DeviceWatcher, LinkSupervisor, SupervisedLink, sas_link
+
+
+class FakeLink:
+    """quiesce/reopen recorder; reopen fails until the device is back and allowed to open."""
+
+    def __init__(self, path):
+        self.path = path
+        self.calls = []
+        self.can_open = True
+
+    def quiesce(self):
+        self.calls.append("quiesce")
+
+    def reopen(self, port_name):
+        self.calls.append("reopen")
+        return self.can_open
+
+
+def test_backoff_is_exponential_and_bounded():
+    backoff = Backoff(initial=0.1, maximum=1.0)
+    assert [round(backoff.next(), 2) for _ in range(6)] == [0.1, 0.2, 0.4, 0.8, 1.0, 1.0]
+    backoff.reset()
+    assert backoff.next() == 0.1
+
+
+def test_removed_device_is_quiesced_and_reopened_when_back(tmp_path):
+    device = tmp_path / "ttyUSB0"
+    device.write_text("")
+    fake = FakeLink(str(device))
+    supervisor = LinkSupervisor()
+    link = supervisor.add(SupervisedLink("sas", str(device), fake.quiesce, fake.reopen,
+                                         Backoff(initial=0.1, maximum=0.4)))
+
+    supervisor.run_once(now=0.0)
+    assert fake.calls == [] and not link.faulted
+
+    device.unlink()
+    supervisor.run_once(now=1.0)
+    assert link.faulted and fake.calls == ["quiesce"]
+    # Device still gone: no open attempts, retries back off
+    supervisor.run_once(now=1.05)
+    assert fake.calls == ["quiesce"] and link.next_attempt > 1.0
+
+    device.write_text("")
+    fake.can_open = False
+    supervisor.run_once(now=1.2)
+    assert fake.calls == ["quiesce", "reopen"] and link.faulted
+    # Arrival reported by the watcher skips the remaining backoff
+    fake.can_open = True
+    supervisor.run_once({"ttyUSB0"}, now=1.21)
+    assert fake.calls == ["quiesce", "reopen", "reopen"] and not link.faulted
+    stats = supervisor.stats(now=2.0)["sas"]
+    assert stats["faults"] == 1 and stats["reconnects"] == 1 and stats["attempts"] == 2
+    assert stats["last_outage_ms"] == 210.0  # Down at 1.0, back at 1.21 on the same clock
+    assert stats["last_reason"] == "device removed" and stats["down_ms"] == 0.0
+
+
+def test_io_fault_reported_from_another_thread(tmp_path):
+    device = tmp_path / "ttyUSB1"
+    device.write_text("")
+    fake = FakeLink(str(device))
+    supervisor = LinkSupervisor()
+    link = supervisor.add(SupervisedLink("card", str(device), fake.quiesce, fake.reopen))
+    supervisor.report_fault(link, OSError(5, "Input/output error"))
+    supervisor.run_once(now=0.0)
+    # Device node still there: quiesced and reopened in the same step
+    assert fake.calls == ["quiesce", "reopen"] and not link.faulted
+    assert link.stats.faults == 1 and "Input/output error" in link.stats.last_reason
+
+
+def test_watcher_reports_device_nodes(tmp_path):
+    watcher = DeviceWatcher(str(tmp_path))
+    try:
+        (tmp_path / "ttyUSB3").write_text("")
+        names = watcher.wait(1.0)
+        if watcher.uses_inotify:
+            assert "ttyUSB3" in names
+        watcher.wake()
+        assert watcher.wait(1.0) == set()
+    finally:
+        watcher.close()
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.alive = False
+
+    def is_alive(self):
+        return self.alive
+
+
+class FakeSweep:
+    def __init__(self, calls):
+        self.calls = calls
+        self.started_at = None
+
+    def refresh(self):
+        self.calls.append("sweep")
+        return True
+
+
+class FakeCommunicator:
+    """The parts of a SASCommunicator sas_link drives; records what was sent after a reopen."""
+
+    def __init__(self, port_name):
+        self.port_name = port_name
+        self.scheduler = FakeScheduler()
+        self.real_time_reporting = False
+        self.on_link_fault = None
+        self.calls = []
+        self.meter_sweep = FakeSweep(self.calls)
+
+    def close_port(self):
+        self.calls.append("close")
+        self.scheduler.alive = False
+
+    def open_port(self, read_asset_number=True):
+        self.calls.append("open")
+        return True
+
+    def start_reader(self):
+        self.calls.append("reader")
+
+    def start_polling(self):
+        self.calls.append("polling")
+        self.scheduler.alive = True
+
+    def set_real_time_reporting(self, enable=True):
+        self.calls.append(f"rte {enable}")
+        self.real_time_reporting = enable
+
+
+def test_sas_link_reopen_restores_polling_and_real_time_reporting(tmp_path):
+    device = tmp_path / "ttyUSB2"
+    device.write_text("")
+    comm = FakeCommunicator(str(device))
+    comm.start_polling()
+    comm.set_real_time_reporting(True)
+    supervisor = LinkSupervisor()
+    link = sas_link(comm, supervisor)
+    comm.calls.clear()
+    comm.on_link_fault(OSError(5, "Input/output error"))
+    supervisor.run_once(now=0.0)
+    assert not link.faulted
+    # Long poll 0E goes out once the scheduler owns the line again
+    assert comm.calls == ["close", "open", "reader", "polling", "rte True"]
+
+
+def test_sas_link_reopen_sweeps_the_game_meters_again(tmp_path):
+    device = tmp_path / "ttyUSB3"
+    device.write_text("")
+    comm = FakeCommunicator(str(device))
+    comm.start_polling()
+    comm.meter_sweep.started_at = 1.0
+    supervisor = LinkSupervisor()
+    sas_link(comm, supervisor)
+    comm.calls.clear()
+    comm.on_link_fault(OSError(5, "Input/output error"))
+    supervisor.run_once(now=0.0)
+    # The machine may have been reset while the link was down: its game table is stale
+    assert comm.calls == ["close", "open", "reader", "polling", "sweep"]
@@ -0,0 +1,102 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import bcd
+from meter_cache import MeterCache
+from sas_frame import SASFrame
+from sas_meters import METER_SIZES, MeterBlock, request_codes
+from sas_money_functions import SasMoney
+from utils import add_crc
+
+
+def block_of(values):
+    block = MeterBlock(0x2F, 0)
+    for code, value in values.items():
+        block.codes.append(code)
+        block.values.append(value)
+    return block
+
+
+def test_fresh_values_are_served_by_ttl_and_max_age():
+    cache = MeterCache(ttls={0x0C: 1.0}, default_ttl=10.0)
+    cache.update(block_of({0x00: 100, 0x0C: 5}), now=0.0)
+    assert cache.fresh([0x00, 0x0C], now=0.5) == ({0x00: 100, 0x0C: 5}, [])
+    assert cache.fresh([0x00, 0x0C], now=2.0) == ({0x00: 100}, [0x0C])
+    assert cache.fresh([0x00], max_age=0.1, now=2.0) == ({}, [0x00])
+
+
+def test_concurrent_reads_share_one_request():
+    cache = MeterCache()
+    entered = threading.Event()
+    release = threading.Event()
+    fetched = []
+
+    def fetch(codes):
+        fetched.append(codes)
+        entered.set()
+        release.wait(2)
+        cache.update(block_of({code: code * 10 for code in codes}))
+
+    results = {}
+    first = threading.Thread(target=lambda: results.update(a=cache.get([0x00, 0x01, 0x05], fetch)))
+    first.start()
+    entered.wait(2)
+    second = threading.Thread(target=lambda: results.update(b=cache.get([0x00, 0x01], fetch)))
+    second.start()
+    deadline = time.monotonic() + 2
+    while cache.stats()["coalesced"] < 2 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    first.join(2)
+    second.join(2)
+    assert fetched == [(0x00, 0x01, 0x05)]
+    assert results["b"] == {0x00: 0, 0x01: 10} and results["a"][0x05] == 50
+    assert cache.get([0x05], fetch) == {0x05: 50}
+    stats = cache.stats()
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (3, 2, 1)
+
+
+class FakeConfig:
+    def get(self, section, option, fallback=None):
+        return fallback
+
+
+class FakeCommunicator:
+    """Answers every meter request at once with value = code for each meter."""
+
+    address = 0x01
+
+    def __init__(self):
+        self.sent = []
+        self.requests = self
+
+    def can_wait_for_response(self):
+        return True
+
+    def request(self, name, command, policy=None, parse=None):
+        self.sent.append(command)
+        body = bytearray()
+        for code in request_codes(command):
+            body.append(code)
+            body += bcd.encode(code, METER_SIZES[code])
+        body = bytes((0x01, 0x2F, 2 + len(body))) + b"\x00\x00" + bytes(body)
+        future = Future()
+        future.set_result(parse(SASFrame(add_crc(body))))
+        return future
+
+    def wait(self, future):
+        return future.result()
+
+
+def test_get_meter_is_served_from_the_cache_until_stale():
+    comm = FakeCommunicator()
+    money = SasMoney(FakeConfig(), comm)
+    meters = money.get_meter(isall=1)
+    assert len(comm.sent) == 1 and meters["games_played"] == 5 and meters["weighted_avg_payback"] == 1.27
+    # A second reader within the TTLs does not touch the line
+    assert money.get_meter(isall=1) == meters and money.read_meters([0x05]) == {0x05: 5}
+    assert len(comm.sent) == 1
+    money.get_meter(isall=1, max_age=0)
+    assert len(comm.sent) == 2
+    assert money.meter_cache.stats()["hits"] == 11 and money.meter_cache.stats()["misses"] == 20
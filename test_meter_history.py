@@ -0,0 +1,62 @@
+import datetime
+import os
+
+from meter_history import MeterHistory
+from sas_frame import SASFrame
+from sas_money_functions import SasMoney
+
+T0 = datetime.datetime(2026, 3, 2, 0, 0).timestamp()
+CODES = (0x00, 0x01, 0x05, 0xA0)
+
+
+def fill(history, minutes):
+    values = [1000, 800, 50, 5000]
+    for minute in range(minutes):
+        values[0] += 10  # Coin-in moves every minute, the others every 7th
+        if minute % 7 == 0:
+            values[1] += 3
+            values[2] += 1
+        history.record(CODES, values, T0 + minute * 60)
+    return values
+
+
+def test_range_queries_read_only_the_overlapping_segments(tmp_path):
+    history = MeterHistory(str(tmp_path / "meters.bin"), keyframe_interval=30)
+    last = fill(history, 24 * 60)
+    at = lambda hour: T0 + hour * 3600
+    # Coin-in between 14:00 and 15:00: 60 minutes of 10 credits
+    assert history.change(0x00, at(14), at(15)) == 600
+    series = history.series(0x00, at(14), at(15))
+    assert len(series) == 61 and series[0] == (at(14), 1000 + 10 * (14 * 60 + 1))
+    assert history.value_at(0x00, T0 - 1) is None
+    assert history.snapshots()[-1].values == last
+    assert history.series(0x7F) == []
+    # Deltas are a few bytes per snapshot; a keyframe every 30
+    stats = history.stats()
+    assert stats["keyframes"] == 48 and stats["bytes"] < 24 * 60 * 12
+
+
+def test_reopen_recovers_index_and_torn_tail(tmp_path):
+    path = str(tmp_path / "meters.bin")
+    history = MeterHistory(path, keyframe_interval=30)
+    last = fill(history, 100)
+    history.close()
+    with open(path, "ab") as f:
+        f.write(b"\x44\x10\x01")  # Record cut short by a power loss
+    os.remove(path + ".idx")
+
+    history = MeterHistory(path, keyframe_interval=30)
+    assert history.last.values == last and history.stats()["keyframes"] == 4
+    history.record(CODES, [v + 1 for v in last], T0 + 100 * 60)
+    assert history.value_at(0xA0, T0 + 100 * 60) == last[3] + 1
+    assert len(history.snapshots(T0 + 90 * 60)) == 11
+
+
+def test_meter_responses_are_recorded(tmp_path):
+    money = SasMoney(config=None, communicator=None)
+    money.meter_history = MeterHistory(str(tmp_path / "meters.bin"))
+    money.handle_single_meter_response(SASFrame.from_hex(
+        "012F380000A00089475290B80090352290020000000003000000001E00000000001318700001"
+        "129982000B00276500A20000000000BA0000000000514C"))
+    snapshot = money.meter_history.last
+    assert snapshot.get(0xA0) == 89475290 and snapshot.get(0x00) == 13187000 and snapshot.command == 0x2F
@@ -0,0 +1,44 @@
+from meter_planner import PROFILES, MAX_RESPONSE_DATA, merge_blocks, plan_meters
+from sas_meters import METER_CODES, SINGLE_METER_POLLS, decode_meter_frame
+from sas_money_functions import SasMoney
+from test_support import PlannedMachine, respond
+from utils import add_crc
+
+
+def test_2f_plan_packs_ten_codes_and_sends_a_lone_meter_as_its_single_poll():
+    plan = plan_meters(list(range(10)) + ["current_credits"], PROFILES["2f"])
+    assert [r.kind for r in plan.requests] == [0x2F, 0x1A]
+    assert plan.requests[0].codes == tuple(range(10)) and plan.frames[1] == add_crc(b"\x01\x1A")
+    assert plan_meters([0x1234], PROFILES["2f"]).unsupported == [0x1234]
+    assert len(plan_meters(list(range(11)), PROFILES["2f"])) == 2
+
+
+def test_full_catalogue_in_three_af_polls():
+    plan = plan_meters(list(METER_CODES), PROFILES["af"])
+    assert len(plan) == 3 and not plan.unsupported
+    assert sorted(c for r in plan.requests for c in r.codes) == sorted(METER_CODES)
+    for request in plan.requests:
+        response = respond(request.frame)
+        assert response[2] <= MAX_RESPONSE_DATA
+        assert list(decode_meter_frame(response).codes) == list(request.codes)
+    # A machine that only answers the single meter polls
+    single = plan_meters(list(METER_CODES), PROFILES["single"])
+    assert len(single) == len(SINGLE_METER_POLLS) and len(single.unsupported) == len(METER_CODES) - len(single)
+
+
+def test_responses_merge_into_one_block():
+    plan = plan_meters(list(range(10)) + [0x0C, 0xA0], PROFILES["2f"])
+    block = merge_blocks(decode_meter_frame(respond(frame)) for frame in plan.frames)
+    assert block.complete and list(block.codes) == list(range(10)) + [0x0C, 0xA0]
+    assert block.raw(0xA0) == 0xA0 % 100
+    assert not merge_blocks([block, None]).complete
+
+
+def test_sas_money_reads_any_meter_set():
+    machine = PlannedMachine()
+    money = SasMoney({}, machine)
+    money.meter_profile = PROFILES["af"]
+    meters = money.get_meters(["games_played", "bills_100", "total_coin_in"])
+    assert meters == {"games_played": 5, "bills_100": 71, "total_coin_in": 6.0}
+    assert len(machine.sent) == 1 and machine.sent[0][1] == 0xAF
+    assert len(money.get_meters()) == len(METER_CODES) and len(machine.sent) == 4
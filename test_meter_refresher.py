@@ -0,0 +1,79 @@
+from meter_refresher import BILL_METERS, EVENT_METERS, GAME_METERS, MeterRefresher
+from sas_commands import MAX_2F_METERS
+from sas_events import SASEvent
+from sas_meters import SINGLE_METER_POLLS, MeterBlock, request_codes
+
+
+def event(code, address=0x01):
+    return SASEvent(address, code, {}, None)
+
+
+def codes_of(frame):
+    if frame[1] in SINGLE_METER_POLLS:
+        return [SINGLE_METER_POLLS[frame[1]]]
+    return request_codes(frame)
+
+
+def answered(refresher, frames, now):
+    """Feed back a meter response for every requested frame."""
+    for frame in frames:
+        block = MeterBlock(0x2F, 0)
+        for code in codes_of(frame):
+            block.codes.append(code)
+            block.values.append(0)
+        refresher.on_meter_block(block, now)
+    frames.clear()
+
+
+def make():
+    frames = []
+    refresher = MeterRefresher(lambda name, frame: frames.append(frame), settle=0.5, min_interval=2.0,
+                               max_age=600.0)
+    return refresher, frames
+
+
+def test_first_step_reads_all_tracked_meters_then_nothing_until_an_event():
+    refresher, frames = make()
+    refresher.run_once(now=0.0)
+    requested = sorted(code for frame in frames for code in codes_of(frame))
+    assert requested == refresher.tracked
+    assert len(frames) == -(-len(requested) // MAX_2F_METERS)
+    answered(refresher, frames, 0.1)
+    assert refresher.run_once(now=10.0) > 500 and frames == []
+
+
+def test_every_bill_accepted_exception_marks_the_bill_meters():
+    # 47-4E and 50: $1 - $500 bills without real time data, 4F: bill accepted with it
+    for code in list(range(0x47, 0x51)):
+        assert EVENT_METERS[code] == BILL_METERS
+
+
+def test_game_end_burst_is_one_request_for_the_game_meters():
+    refresher, frames = make()
+    refresher.run_once(now=0.0)
+    answered(refresher, frames, 0.1)
+    for t in (10.0, 10.2, 10.4):
+        refresher.on_event(event(0x7F), now=t)
+    refresher.on_event(event(0x7F, address=0x02), now=10.4)  # Another machine on the loop
+    refresher.run_once(now=10.5)
+    assert frames == []  # Still settling
+    refresher.run_once(now=11.0)
+    assert len(frames) == 1 and sorted(codes_of(frames[0])) == sorted(GAME_METERS)
+    assert refresher.stats()["coalesced"] == 2 * len(GAME_METERS)
+
+
+def test_min_interval_and_lost_responses():
+    refresher, frames = make()
+    refresher.run_once(now=0.0)
+    answered(refresher, frames, 0.1)
+    refresher.on_event(event(0x4F), now=0.5)
+    refresher.run_once(now=1.5)
+    assert frames == []  # Bill meters were read 1.4 s ago
+    refresher.run_once(now=2.2)
+    assert len(frames) == 1
+    frames.clear()
+    # No response: the bill meters are requested again after the response timeout
+    refresher.run_once(now=4.0)
+    assert frames == []
+    refresher.run_once(now=5.3)
+    assert len(frames) == 1 and refresher.stats()["timeouts"] == 5
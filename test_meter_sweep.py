@@ -0,0 +1,97 @@
+import bcd
+from meter_planner import PROFILES
+from meter_sweep import GameMeterTable, MeterSweep, enabled_game_numbers
+from sas_meters import decode_meter_frame
+from sas_money_functions import SasMoney
+from sas_scheduler import PRIORITY_IDLE
+from test_support import ScheduledMachine, SweptMachine, game_meters_response, games_response, respond
+from utils import add_crc
+
+GAMES = [1, 2, 15, 99]
+
+
+def sweep_for(machine, **options):
+    money = SasMoney({}, machine)
+    money.meter_profile = PROFILES["2f"]
+    return money, MeterSweep(money, **options)
+
+
+def test_enabled_games_and_game_meters_decode():
+    assert enabled_game_numbers(games_response(GAMES)) == GAMES
+    assert enabled_game_numbers(games_response([])) == []
+    block = decode_meter_frame(game_meters_response(add_crc(b"\x01\x52" + bcd.encode(15, 2)), lambda g, c: g + c))
+    assert block.game_number == 15 and list(block.codes) == [0x00, 0x01, 0x02, 0x05]
+    assert block.raw(0x05) == 20
+
+
+def test_sweep_reads_every_game_within_the_window():
+    machine = SweptMachine(GAMES)
+    money, sweep = sweep_for(machine, window=2)
+    assert sweep.start() and not sweep.start()  # One sweep at a time
+    machine.answer()
+    assert sweep.wait(1)
+    # 56, then a 52 and a 2F for each game, never more than the window queued at once
+    assert len(machine.sent) == 1 + 2 * len(GAMES) and machine.most_outstanding <= 2
+    assert machine.priorities == {PRIORITY_IDLE}
+    assert sweep.table.enabled_games == GAMES and sweep.table.games() == GAMES
+    assert sweep.table.game(15) == {code: 15000 + code for code in (0x00, 0x01, 0x02, 0x05, 0x06, 0x07)}
+    stats = sweep.stats()
+    assert stats["sweeps"] == 1 and stats["failures"] == 0 and not stats["running"]
+    # Per game meters stay out of the machine totals
+    assert money.meter_cache.fresh([0x00]) == ({}, [0x00])
+    assert sweep.start()
+
+
+def test_refresh_reruns_after_the_running_sweep():
+    machine = SweptMachine(GAMES)
+    money, sweep = sweep_for(machine)
+    assert sweep.start() and sweep.refresh()
+    assert len(machine.sent) == 1  # Still reading the first sweep's enabled games
+    machine.answer()
+    assert sweep.wait(1) and sweep.sweeps == 2 and not sweep.rerun
+    assert len(machine.sent) == 2 * (1 + 2 * len(GAMES))
+    assert sweep.refresh() and sweep.sweeps == 2 and sweep.is_running()
+
+
+def test_failed_game_does_not_stall_the_sweep():
+    machine = SweptMachine(GAMES, fail=(2,))
+    money, sweep = sweep_for(machine, window=3)
+    sweep.start()
+    machine.answer()
+    assert sweep.wait(1) and sweep.failures == 1
+    assert 0x00 not in sweep.table.game(2) and sweep.table.game(2)[0x06] == 2006
+    assert sweep.table.game(99)[0x00] == 99000
+
+
+def test_table_skips_machine_totals_and_scales_meters():
+    table = GameMeterTable()
+    table.update(decode_meter_frame(respond(add_crc(b"\x01\x2F\x03\x00\x00\x00"))))
+    assert table.games() == []
+    table.update(decode_meter_frame(game_meters_response(add_crc(b"\x01\x52\x00\x07"), lambda g, c: 250)))
+    meters = table.as_dict()[7]
+    assert set(meters) == {"total_turnover", "total_win", "total_jackpot", "games_played"}
+
+
+def test_sweep_waits_for_the_scheduler_and_yields_its_slots():
+    machine = ScheduledMachine(GAMES)
+    money, sweep = sweep_for(machine)
+    assert not sweep.start() and machine.sent == []  # Nobody owns the line yet
+    machine.scheduler.attach()
+    assert sweep.start()
+    for _ in range(5):
+        machine.run_slot()
+    # An AFT request queued mid sweep goes out in the next free slot
+    cancel = machine.request("CancelAFT", money.commands.cancel_aft)
+    while machine.scheduler.last_was_long_poll:
+        machine.run_slot()
+    machine.run_slot()
+    assert machine.line[-1] == money.commands.cancel_aft
+    for _ in range(40):
+        machine.run_slot()
+    assert sweep.wait(0) and sweep.failures == 0 and cancel.done()
+    assert sweep.table.games() == GAMES and sweep.table.game(99)[0x07] == 99007
+    # One long poll at a time, each followed by a general poll
+    long_polls = [i for i, frame in enumerate(machine.line) if frame != b"\x80"]
+    assert len(long_polls) == 2 + 2 * len(GAMES)
+    assert all(machine.line[i + 1] == b"\x80" for i in long_polls)
+    machine.scheduler.detach()
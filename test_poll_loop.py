@@ -0,0 +1,33 @@
+import time
+from config_manager import ConfigManager
+from poll_loop import DEFAULT_POLL_INTERVAL, PollLoop, poll_interval_for
+
+
+def test_deadlines_stay_on_grid_and_overruns_skip_missed_ticks():
+    loop = PollLoop(lambda: None, interval=0.04)
+    # On time, short tick: next deadline one interval later
+    assert abs(loop.record_cycle(1.0, 1.002, 1.005) - 1.04) < 1e-9
+    # Tick ran past two deadlines: both are skipped, phase is kept
+    assert abs(loop.record_cycle(1.04, 1.04, 1.13) - 1.16) < 1e-9
+    stats = loop.stats()
+    assert stats["cycles"] == 2 and stats["overruns"] == 1 and stats["missed_ticks"] == 2
+    assert stats["max_jitter_ms"] == 2.0
+
+
+def test_loop_runs_on_one_thread_at_interval():
+    threads = set()
+    loop = PollLoop(lambda: threads.add(loop.is_loop_thread()), interval=0.01)
+    loop.start()
+    time.sleep(0.2)
+    loop.stop()
+    assert threads == {True}
+    assert 10 <= loop.cycles <= 22
+
+
+def test_poll_interval_per_device_type(tmp_path):
+    settings = tmp_path / "settings.ini"
+    settings.write_text("[sas]\npollintervalms = 50\npollintervalms_11 = 80\n")
+    config = ConfigManager(str(settings))
+    assert poll_interval_for(config, 11) == 0.08
+    assert poll_interval_for(config, 8) == 0.05
+    assert poll_interval_for(ConfigManager(str(tmp_path / "missing.ini")), 8) == DEFAULT_POLL_INTERVAL
@@ -0,0 +1,55 @@
+import os
+import threading
+
+from port_cache import PortCache, device_identity, discover_with_cache
+from port_discovery import ROLE_SAS
+from test_port_discovery import ASSET_REPLY, COMMANDS, VERSION_REPLY, simulate
+
+
+def run_with_sas_port(callback):
+    master, slave = os.openpty()
+    port = os.ttyname(slave)
+    stop = threading.Event()
+    sim = threading.Thread(target=simulate, args=({
+        master: {COMMANDS.sas_version: VERSION_REPLY, COMMANDS.read_asset_number: ASSET_REPLY},
+    }, stop), daemon=True)
+    sim.start()
+    try:
+        return port, callback(port)
+    finally:
+        stop.set()
+        sim.join()
+        os.close(master)
+        os.close(slave)
+
+
+def test_cached_port_is_confirmed_with_one_probe(tmp_path):
+    path = str(tmp_path / "ports.json")
+    port, first = run_with_sas_port(lambda port: discover_with_cache([port], PortCache(path)))
+    assert first.port_for(ROLE_SAS) == port
+
+    cache = PortCache(path)
+    entry = cache.lookup(device_identity(port))
+    assert entry["role"] == ROLE_SAS and entry["parity"] == "wakeup" and entry["asset_number"] == 1234
+
+    # Same device on the next start: a single sas probe, no full discovery
+    port, second = run_with_sas_port(lambda p: (cache.devices.update({device_identity(p): entry}),
+                                                discover_with_cache([p], cache))[1])
+    report = second.reports[port]
+    assert second.port_for(ROLE_SAS) == port
+    assert [p.name for p in report.probes] == ["sas_wakeup"]
+
+
+def test_mismatch_falls_back_to_full_discovery(tmp_path):
+    cache = PortCache(str(tmp_path / "ports.json"))
+
+    def discover(port):
+        # Another machine was cabled to this port: the asset number no longer matches
+        cache.store(device_identity(port), port, {"role": ROLE_SAS, "device_type": 8, "parity": "wakeup",
+                                                  "address": "01", "asset_number": 9999})
+        return discover_with_cache([port], cache)
+
+    port, result = run_with_sas_port(discover)
+    assert result.port_for(ROLE_SAS) == port
+    assert result.info_for(ROLE_SAS)["asset_number"] == 1234
+    assert PortCache(cache.path).lookup(device_identity(port))["asset_number"] == 1234
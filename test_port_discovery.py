@@ -0,0 +1,57 @@
+import os
+import selectors
+import threading
+
+from port_discovery import (CARD_READER_POLL, ROLE_CARD_READER, ROLE_SAS, discover_ports)
+from sas_commands import command_library
+from utils import add_crc
+
+COMMANDS = command_library(0x01)
+VERSION_REPLY = add_crc(bytes.fromhex("015409") + b"602" + b"123456")
+ASSET_REPLY = add_crc(bytes.fromhex("01730B00D2040000000000000000"))
+
+
+def simulate(devices, stop):
+    """devices: master fd -> {request bytes: reply bytes}"""
+    sel = selectors.DefaultSelector()
+    for fd in devices:
+        sel.register(fd, selectors.EVENT_READ)
+    buffers = {fd: b"" for fd in devices}
+    while not stop.is_set():
+        for key, _ in sel.select(0.02):
+            buffers[key.fd] += os.read(key.fd, 256)
+            for request, reply in devices[key.fd].items():
+                if request in buffers[key.fd]:
+                    buffers[key.fd] = b""
+                    os.write(key.fd, reply)
+    sel.close()
+
+
+def test_ports_are_probed_concurrently_and_roles_assigned():
+    sas_master, sas_slave = os.openpty()
+    card_master, card_slave = os.openpty()
+    sas_port, card_port = os.ttyname(sas_slave), os.ttyname(card_slave)
+    stop = threading.Event()
+    sim = threading.Thread(target=simulate, args=({
+        sas_master: {COMMANDS.sas_version: VERSION_REPLY, COMMANDS.read_asset_number: ASSET_REPLY},
+        card_master: {CARD_READER_POLL: b"\x06"},
+    }, stop), daemon=True)
+    sim.start()
+    try:
+        result = discover_ports([card_port, sas_port, "/dev/does-not-exist"])
+    finally:
+        stop.set()
+        sim.join()
+        for fd in (sas_master, sas_slave, card_master, card_slave):
+            os.close(fd)
+
+    assert result.port_for(ROLE_SAS) == sas_port
+    assert result.port_for(ROLE_CARD_READER) == card_port
+    sas = result.info_for(ROLE_SAS)
+    assert sas["device_type"] == 8 and sas["sas_version"] == "602" and sas["asset_number"] == 1234
+    missing = result.reports["/dev/does-not-exist"]
+    assert missing.role is None and len(missing.probes) == 1 and missing.probes[0].error
+    # Card reader port ran the SAS probes (device types 8, 1, 2) before matching; ports ran side by side
+    card = result.reports[card_port]
+    assert [p.name for p in card.probes] == ["sas_wakeup", "sas_even", "sas_type2", "card_reader"]
+    assert result.elapsed < card.elapsed + result.reports[sas_port].elapsed
@@ -0,0 +1,55 @@
+import asyncio
+import os
+
+import serial
+
+from config_manager import ConfigManager
+from sas_async import AsyncSASEngine
+from sas_communicator import SASCommunicator
+from utils import add_crc
+
+ASSET_RESPONSE = add_crc(bytes.fromhex("01730B00D2040000000000000000"))
+
+
+def make_communicator(tmp_path, slave):
+    comm = SASCommunicator(os.ttyname(slave), ConfigManager(str(tmp_path / "settings.ini")))
+    comm.serial_port = serial.Serial(os.ttyname(slave), 19200)
+    comm.is_port_open = True
+    return comm
+
+
+def test_engine_polls_and_awaits_long_poll_on_one_loop(tmp_path):
+    master, slave = os.openpty()
+    comm = make_communicator(tmp_path, slave)
+    received = bytearray()
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+
+        def machine():
+            # The gaming machine: answer the asset number read, swallow general polls
+            data = os.read(master, 64)
+            received.extend(data)
+            if comm.commands.read_asset_number in received:
+                received.clear()
+                os.write(master, ASSET_RESPONSE)
+        loop.add_reader(master, machine)
+        engine = AsyncSASEngine(comm)
+        await engine.start()
+        try:
+            asset = await asyncio.wait_for(engine.asset_number(), 2)
+            await asyncio.sleep(0.1)
+        finally:
+            await engine.stop()
+            loop.remove_reader(master)
+        return asset
+
+    try:
+        assert asyncio.run(scenario()) == 1234
+        stats = comm.scheduler.stats()
+        assert stats["long_polls"] == 1 and stats["general_polls"] >= 3
+        assert not comm.scheduler.is_alive()
+    finally:
+        comm.serial_port.close()
+        os.close(master)
+        os.close(slave)
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+import random
+
+from crccheck.crc import CrcKermit
+
+from sas_commands import command_library
+from utils import add_crc, crc_kermit, get_crc
+
+
+def test_table_crc_matches_crccheck():
+    rng = random.Random(5)
+    for size in range(0, 80):
+        data = bytes(rng.randrange(256) for _ in range(size))
+        assert crc_kermit(data) == CrcKermit.calc(data)
+
+
+def test_incremental_crc():
+    assert crc_kermit(b"\x74\x00", crc_kermit(b"\x01")) == crc_kermit(b"\x01\x74\x00")
+
+
+def test_library_frames_match_legacy_hex_commands():
+    lib = command_library(0x01)
+    assert lib.balance_query == bytes.fromhex(get_crc("017400000000"))
+    assert lib.meters_2f_basic == bytes.fromhex(get_crc("012F0C0000A0B802031E00010BA2BA"))
+    assert lib.read_asset_number == bytes.fromhex(get_crc("017301FF"))
+    assert lib.game_meters(12) == add_crc(bytes.fromhex("01520012"))
+    assert lib.game_meters(12) is lib.game_meters(12)
+    assert command_library(0x02).sas_version == add_crc(b"\x02\x54")
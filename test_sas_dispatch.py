@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+from sas_dispatch import SASDispatcher, frame_key, SINGLE_BYTE
+from sas_frame import EXCEPTION_COMMAND
+
+
+def test_frame_keys():
+    assert frame_key(b"\x00") == (SINGLE_BYTE, 0x00)
+    assert frame_key(bytes.fromhex("01FF69DB5B")) == (0x01, EXCEPTION_COMMAND, 0x69)
+    assert frame_key(bytes.fromhex("01740200001111")) == (0x01, 0x74)
+
+
+def test_specific_registration_wins_over_any_address():
+    seen = []
+    d = SASDispatcher()
+    d.register(0x74, lambda f: seen.append("any"))
+    d.register(0x74, lambda f: seen.append("addr2"), address=0x02)
+    d.dispatch(bytes.fromhex("017400"))
+    d.dispatch(bytes.fromhex("027400"))
+    assert seen == ["any", "addr2"]
+
+
+def test_exception_falls_back_to_exception_default_then_default():
+    seen = []
+    d = SASDispatcher(lambda f: seen.append("default"))
+    d.register(EXCEPTION_COMMAND, lambda f: seen.append("exception"))
+    d.register_exception(0x69, lambda f: seen.append("aft"))
+    d.register_exception(0x69, lambda f: seen.append("aft2"))
+    d.dispatch(bytes.fromhex("01FF69DB5B"))
+    d.dispatch(bytes.fromhex("01FF7E0000"))
+    assert d.dispatch(bytes.fromhex("01E5")) is False
+    assert seen == ["aft", "aft2", "exception", "default"]
+
+
+def test_registration_after_dispatch_invalidates_cache():
+    seen = []
+    d = SASDispatcher(lambda f: seen.append("default"))
+    d.dispatch(b"\x51")
+    d.register_single_byte(0x51, lambda f: seen.append("ack"))
+    d.dispatch(b"\x51")
+    assert seen == ["default", "ack"]
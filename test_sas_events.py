@@ -0,0 +1,82 @@
+from config_manager import ConfigManager
+from sas_communicator import SASCommunicator
+from sas_events import SASEventStream, parse_event
+from sas_frame import SASFrame
+from utils import add_crc
+
+
+class FakePort:
+    port = "fake"
+    is_open = True
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(bytes(data))
+
+
+# Game started: 25 credits wagered, coin in meter 123456, wager type 1, progressive group 0
+GAME_START = SASFrame(add_crc(bytes.fromhex("01FF7E" + "0025" + "00123456" + "01" + "00")))
+
+
+def test_real_time_payloads_are_decoded():
+    event = parse_event(GAME_START, polled_at=10.0, received_at=10.012)
+    assert event.name == "game_started" and event.is_real_time
+    assert event.fields == {"credits_wagered": 25, "coin_in_meter": 123456, "wager_type": 1,
+                            "progressive_group": 0}
+    assert abs(event.latency - 0.012) < 1e-9
+    bill = parse_event(SASFrame(add_crc(bytes.fromhex("01FF4F" + "01" + "43" + "00000017"))))
+    assert bill.fields == {"country_code": 1, "denomination_code": 0x43, "bill_meter": 17}
+
+
+def test_bare_exception_is_an_event_without_fields():
+    event = parse_event(SASFrame(add_crc(bytes.fromhex("01FF7F"))))
+    assert event.name == "game_ended" and event.fields == {} and event.latency is None
+    assert parse_event(SASFrame(bytes.fromhex("0173"))) is None
+
+
+def test_stream_filters_subscribers_and_counts_per_code():
+    stream = SASEventStream()
+    games, everything = [], []
+    stream.subscribe(games.append, codes={0x7E, 0x7F})
+    stream.subscribe(everything.append)
+    stream.publish(parse_event(GAME_START, 0.0, 0.010))
+    stream.publish(parse_event(SASFrame(add_crc(bytes.fromhex("01FF88" + "0207"))), 0.0, 0.020))
+    assert [e.code for e in games] == [0x7E] and len(everything) == 2
+    stats = stream.stats()
+    assert stats["game_started"]["count"] == 1 and stats["reel_stopped"]["max_latency_ms"] == 20.0
+
+
+def test_event_in_place_of_long_poll_response_resends_it(tmp_path):
+    settings = tmp_path / "settings.ini"
+    settings.write_text("[sas]\naddress = 01\n")
+    comm = SASCommunicator("fake", ConfigManager(str(settings)), device_type_id=1)
+    comm.serial_port = FakePort()
+    comm.is_port_open = True
+    comm.set_real_time_reporting(True)
+    assert comm.serial_port.writes == [comm.commands.real_time_on]
+
+    future = comm.request("GetSASVersion", comm.commands.sas_version)
+    comm.handle_received_sas_command(GAME_START)
+    assert comm.serial_port.writes[-2:] == [comm.commands.sas_version, comm.commands.sas_version]
+    assert comm.requests.requeues == 1 and not future.done()
+    assert comm.events.recent[-1].fields["credits_wagered"] == 25
+    comm.handle_received_sas_command(add_crc(bytes.fromhex("015409") + b"602" + b"123456"))
+    assert future.result(0).data[:3] == b"602"
+
+
+def test_subscribers_run_on_the_executor():
+    jobs = []
+
+    class Executor:
+        def submit(self, handler, item):
+            jobs.append((handler, item))
+
+    stream = SASEventStream(executor=Executor())
+    seen = []
+    stream.subscribe(seen.append)
+    event = parse_event(GAME_START, 0.0, 0.010)
+    stream.publish(event)
+    # Counted and kept right away; the subscriber only runs when a worker picks up the job
+    assert stream.recent[-1] is event and seen == [] and jobs == [(seen.append, event)]
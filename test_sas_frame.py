@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+from decimal import Decimal
+
+from config_manager import ConfigManager
+from sas_communicator import SASCommunicator
+from sas_frame import SASFrame, as_frame
+from utils import add_crc, bcd_to_int
+
+
+class FakePort:
+    port = "fake"
+
+    def __init__(self):
+        self.written = []
+
+    def write(self, data):
+        self.written.append(bytes(data))
+
+
+def test_frame_fields():
+    frame = SASFrame(add_crc(bytes.fromhex("017402AABB")))
+    assert frame.address == 0x01 and frame.command == 0x74
+    assert frame.declared_length == 2
+    assert bytes(frame.data) == bytes.fromhex("AABB")
+    assert frame.crc_ok
+    assert str(frame) == add_crc(bytes.fromhex("017402AABB")).hex().upper()
+
+    event = as_frame(add_crc(bytes.fromhex("01FF7F00000500")).hex())
+    assert event.is_exception and event.exception_code == 0x7F
+    assert bytes(event.data) == bytes.fromhex("00000500")
+    assert as_frame(b"\x00").exception_code == 0x00
+
+
+def test_commands_written_as_bytes():
+    config = ConfigManager()
+    config.config.set('machine', 'devicetypeid', '1')  # Novomatic: whole command in one write
+    comm = SASCommunicator("fake", config)
+    comm.serial_port = FakePort()
+    comm.is_port_open = True
+
+    comm.request_sas_version()
+    comm.sas_money.komut_bakiye_sorgulama("test", 0)
+    assert comm.serial_port.written == [add_crc(b"\x01\x54"), add_crc(bytes.fromhex("017400000000"))]
+
+
+def test_aft_transfer_and_balance_parse():
+    config = ConfigManager()
+    comm = SASCommunicator("fake", config)
+    money = comm.sas_money
+    command = money.build_aft_transfer(0x00, 12345, 500, 0, 0x07, 511, "01000000", "00" * 20)
+    assert command[:2] == b"\x01\x72" and command[2] == len(command) - 5
+    assert bcd_to_int(command[6:11]) == 12345
+    assert bcd_to_int(command[11:16]) == 500
+    assert command[46:50] == b"\x03511"
+
+    balance = add_crc(bytes((0x01, 0x74, 0x23)) + bytes(9) + bytes.fromhex("0000012345") + bytes(5) + bytes(5) + bytes(11))
+    money.yanit_bakiye_sorgulama(SASFrame(balance))
+    assert money.yanit_bakiye_tutar == Decimal("123.45")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+from sas_frame_parser import SASFrameParser, frame_length, split_frames
+from utils import add_crc
+
+
+def frame(hex_body):
+    return add_crc(bytes.fromhex(hex_body))
+
+
+def test_split_back_to_back_responses():
+    meters = frame("012F0E0000A00089475290B80090352290")
+    balance = frame("017402" + "0000")
+    aft_done = frame("01FF69")
+    data = meters + aft_done + balance + b"\x00"
+    frames, rest = split_frames(data)
+    assert frames == [meters, aft_done, balance, b"\x00"]
+    assert rest == b""
+
+
+def test_split_keeps_incomplete_tail():
+    meters = frame("012F0E0000A00089475290B80090352290")
+    frames, rest = split_frames(meters + meters[:5])
+    assert frames == [meters]
+    assert rest == meters[:5]
+
+
+def test_fixed_length_and_ack_frames():
+    game_meters = frame("0152" + "0001" + "00" * 16)
+    assert frame_length(game_meters) == 22
+    frames, rest = split_frames(b"\x01" + game_meters)
+    assert frames == [b"\x01", game_meters]
+
+
+def test_exception_with_and_without_real_time_payload():
+    bare = frame("01FF7E")
+    assert frame_length(bare) == 5
+    with_payload = frame("01FF7E" + "0001" + "00012345" + "00" + "00")
+    assert frame_length(with_payload) == 13
+    frames, rest = split_frames(bare + with_payload + bare)
+    assert frames == [bare, with_payload, bare]
+
+
+def test_streaming_parser_emits_on_last_byte():
+    frames = []
+    parser = SASFrameParser(frames.append)
+    game_end = frame("01FF7F" + "00000500")
+    balance = frame("017402" + "0000")
+    parser.feed(b"\x00" + game_end[:4])
+    assert frames == [b"\x00"]
+    parser.feed(game_end[4:] + balance[:3])
+    assert frames == [b"\x00", game_end]
+    assert parser.bytes_needed() == len(balance) - 3
+    parser.feed(balance[3:])
+    assert frames[-1] == balance and not parser.buffer
+
+
+def test_unknown_command_waits_for_gap():
+    frames = []
+    parser = SASFrameParser(frames.append)
+    parser.feed(bytes.fromhex("01"))
+    assert parser.bytes_needed() == 2
+    parser.feed(bytes.fromhex("E51D00"))
+    assert parser.bytes_needed() is None
+    assert frames == []
+    parser.flush()
+    assert frames == [bytes.fromhex("01E51D00")]
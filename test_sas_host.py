@@ -0,0 +1,50 @@
+import os
+
+import serial
+
+from config_manager import ConfigManager
+from sas_communicator import SASCommunicator
+from sas_host import SASHost, parse_links
+from utils import add_crc
+
+
+def test_parse_links():
+    assert parse_links("/dev/ttyUSB0:01, /dev/ttyUSB1:02:4,") == [
+        ("/dev/ttyUSB0", "01", None), ("/dev/ttyUSB1", "02", 4)]
+
+
+def test_host_polls_every_link_and_routes_responses(tmp_path):
+    config = ConfigManager(str(tmp_path / "settings.ini"))
+    host = SASHost(config)
+    masters = []
+    for address in ("01", "02"):
+        master, slave = os.openpty()
+        comm = SASCommunicator(os.ttyname(slave), config, address=address)
+        comm.serial_port = serial.Serial(os.ttyname(slave), 19200)
+        comm.is_port_open = True
+        host.add_link(comm)
+        masters.append((master, slave))
+    second = host.links[1]
+    asset_read = second.communicator.commands.read_asset_number
+    future = second.communicator.request("ReadAssetNo", asset_read)
+
+    for _ in range(10):
+        host.run_once(0.05)
+    master, _ = masters[1]
+    written = os.read(master, 256)
+    assert asset_read in written
+    # The address 02 link general-polls machine 02, never 80/81
+    polls = written.replace(asset_read, b"")
+    assert polls and set(polls) == {0x82}
+    os.write(master, add_crc(bytes.fromhex("02730B00D2040000000000000000")))
+    for _ in range(5):
+        host.run_once(0.05)
+
+    assert future.result(timeout=0)[4:8] == bytes.fromhex("D2040000")
+    stats = host.stats()
+    assert all(link["scheduler"]["general_polls"] >= 3 for link in stats.values())
+    assert stats[second.name]["frames"] == 1
+    host.close()
+    for master, slave in masters:
+        os.close(master)
+        os.close(slave)
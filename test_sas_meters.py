@@ -0,0 +1,49 @@
+from sas_frame import SASFrame
+from sas_meters import decode_meter_frame, meter_info
+from sas_money_functions import SasMoney
+from utils import add_crc
+
+SAMPLE_2F = SASFrame.from_hex("012F380000A00089475290B80090352290020000000003000000001E00000000001318700001"
+                              "129982000B00276500A20000000000BA0000000000514C")
+
+
+def test_2f_block_is_decoded_in_one_pass():
+    block = decode_meter_frame(SAMPLE_2F)
+    assert block.complete and block.game_number == 0
+    assert list(block.codes) == [0xA0, 0xB8, 0x02, 0x03, 0x1E, 0x00, 0x01, 0x0B, 0xA2, 0xBA]
+    assert block.raw(0x00) == 13187000 and block.raw(0xA0) == 89475290
+    meters = block.scaled()
+    assert meters["total_turnover"] == 1318700.0 and meters["total_win"] == 1299820.0
+
+
+def test_non_bcd_nibbles_decode_through_the_bcd_table():
+    # Coin in 0000001A: the A nibble counts as 10, as bcd.decode does everywhere
+    frame = SASFrame(add_crc(bytes.fromhex("012F07" + "0000" + "00" + "0000001A")))
+    assert decode_meter_frame(frame).raw(0x00) == 20
+    money = SasMoney({}, None)
+    assert money.bcd_to_int("00012345") == 12345
+    # SasMoney.bcd_to_int keeps its own reading of A-F: each nibble written out as 10-15
+    assert money.bcd_to_int("1A") == 110 and money.bcd_to_int("0F0") == 15
+
+
+def test_af_block_has_no_meter_count_limit():
+    body = b"".join(bytes((code, 0x00, 4)) + bytes.fromhex("00000123") for code in range(20))
+    frame = SASFrame(add_crc(bytes((0x01, 0xAF, 2 + len(body))) + b"\x00\x01" + body))
+    block = decode_meter_frame(frame)
+    assert len(block) == 20 and block.game_number == 1 and set(block.values) == {123}
+    # Counters are not scaled, credit meters are
+    assert block.scaled()["games_played"] == 123 and block.scaled()["total_turnover"] == 12.3
+
+
+def test_truncated_and_foreign_frames():
+    block = decode_meter_frame(SAMPLE_2F[:20])
+    assert not block.complete and list(block.codes) == [0xA0, 0xB8]
+    assert decode_meter_frame(SASFrame.from_hex("01740000")) is None
+    assert meter_info(0x05) == ("games_played", 4, 1) and meter_info(0x0D)[1] == 5
+
+
+def test_sas_money_returns_scaled_meters():
+    money = SasMoney({}, None)
+    assert money.handle_single_meter_response(str(SAMPLE_2F))["total_coin_out"] == 9035229.0
+    assert money.last_meter_block.raw(0xB8) == 90352290
+    assert money.handle_single_meter_response(SAMPLE_2F[:20]) is None
@@ -0,0 +1,61 @@
+from config_manager import ConfigManager
+from sas_communicator import SASCommunicator
+from sas_multidrop import SASMachine, WeightedAddressRotation, parse_addresses
+
+
+class FakePort:
+    port = "fake"
+    is_open = True
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(bytes(data))
+
+
+def make_communicator(tmp_path, addresses):
+    settings = tmp_path / "settings.ini"
+    settings.write_text(f"[sas]\naddresses = {addresses}\n")
+    comm = SASCommunicator("fake", ConfigManager(str(settings)), device_type_id=1)
+    comm.serial_port = FakePort()
+    comm.is_port_open = True
+    return comm
+
+
+def test_parse_addresses():
+    assert parse_addresses("01, 02:3 ,0A") == [(0x01, 1), (0x02, 3), (0x0A, 1)]
+    assert parse_addresses(None) == []
+
+
+def test_weighted_rotation():
+    rotation = WeightedAddressRotation([SASMachine(1, 2), SASMachine(2, 1)])
+    assert [rotation.next().address for _ in range(6)] == [1, 2, 1, 1, 2, 1]
+
+
+def test_general_polls_rotate_over_addresses(tmp_path):
+    comm = make_communicator(tmp_path, "01, 02")
+    for _ in range(4):
+        comm.send_general_poll()
+    assert comm.serial_port.writes == [b"\x81", b"\x82", b"\x81", b"\x82"]
+    assert comm.machine_stats()["02"]["general_polls"] == 2
+
+
+def test_responses_are_routed_by_address(tmp_path):
+    comm = make_communicator(tmp_path, "01, 02")
+    comm.send_general_poll()
+    comm.send_general_poll()  # Address 02 polled last
+    comm.handle_received_sas_command(b"\x51")  # Single byte reply: handpay pending on 02
+    comm.send_general_poll()  # Address 01 answers with an exception message
+    comm.handle_received_sas_command(comm.machines[0x01].commands.frame(b"\xFF\x7F"))
+    stats = comm.machine_stats()
+    assert stats["02"]["last_exception"] == "51" and stats["02"]["frames"] == 1
+    assert stats["01"]["last_exception"] == "7F"
+
+
+def test_single_address_keeps_80_81_alternation(tmp_path):
+    comm = make_communicator(tmp_path, "")
+    comm.send_general_poll()
+    comm.send_general_poll()
+    assert comm.serial_port.writes == [b"\x80", b"\x81"]
+    assert list(comm.machines) == [0x01]
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+from sas_reader import SASReaderThread, read_until_gap
+from utils import add_crc
+
+
+class FakeSerial:
+    """
+    Serial stand-in that returns queued chunks, honouring the requested size. A None chunk is
+    a quiet line: the read waiting on it times out empty.
+    """
+
+    def __init__(self, chunks):
+        self.port = "fake"
+        self.data = bytearray()
+        self.chunks = list(chunks)
+        self.timeout = None
+        self.timeouts = []
+
+    @property
+    def in_waiting(self):
+        return len(self.data)
+
+    def read(self, size):
+        self.timeouts.append(self.timeout)
+        while len(self.data) < size and self.chunks:
+            chunk = self.chunks.pop(0)
+            if chunk is None:
+                break
+            self.data += chunk
+        out = bytes(self.data[:size])
+        del self.data[:size]
+        return out
+
+
+def test_reader_emits_frame_split_across_reads():
+    frames = []
+    meter = add_crc(bytes.fromhex("012F04" + "00" * 4))
+    port = FakeSerial([meter[:2], meter[2:5], meter[5:]])
+    reader = SASReaderThread(port, frames.append)
+    while port.chunks or port.data:
+        reader.read_once()
+    assert frames == [meter]
+
+
+def test_reader_flushes_short_read_at_gap():
+    frames = []
+    port = FakeSerial([bytes.fromhex("01731D00")])
+    reader = SASReaderThread(port, frames.append)
+    while port.chunks or port.data:
+        reader.read_once()
+    reader.read_once()
+    assert frames == [bytes.fromhex("01731D00")]
+
+
+def test_back_to_back_frames_split_at_the_software_gap():
+    frames = []
+    # Two frames of unknown length, 10+ ms apart: well inside the 100 ms read timeout
+    port = FakeSerial([bytes.fromhex("01220102"), None, bytes.fromhex("01230304"), None])
+    reader = SASReaderThread(port, frames.append, inter_byte_timeout=0.01)
+    while port.chunks or port.data:
+        reader.read_once()
+    assert frames == [bytes.fromhex("01220102"), bytes.fromhex("01230304")]
+    # Waits for a first byte use the read timeout, waits inside a frame the gap
+    assert set(port.timeouts) == {0.1, 0.01} and port.timeouts[0] == 0.1
+
+
+def test_read_until_gap_stops_at_size_or_gap():
+    port = FakeSerial([bytes.fromhex("0154"), bytes.fromhex("AABB"), None, b"\x99"])
+    assert read_until_gap(port, 3, 0.15) == bytes.fromhex("0154AA")
+    assert read_until_gap(port, 256, 0.15) == bytes.fromhex("BB")
+    assert read_until_gap(port, 256, 0.15) == b"\x99"
+    assert read_until_gap(port, 256, 0.15) == b""
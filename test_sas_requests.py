@@ -0,0 +1,93 @@
+import time
+import pytest
+from concurrent.futures import TimeoutError
+from sas_frame import SASFrame
+from sas_commands import command_library
+from sas_meters import decode_meter_frame
+from sas_requests import PendingRequests, RetryPolicy
+from test_support import respond
+from utils import add_crc
+
+ASSET_RESPONSE = SASFrame(add_crc(bytes.fromhex("01730B00D2040000000000000000")))
+
+
+def make_pending():
+    sent = []
+    def send(name, command, on_sent):
+        sent.append(command)
+        on_sent()
+    pending = PendingRequests(send)
+    return pending, sent
+
+
+def test_response_resolves_future_with_parsed_result():
+    pending, sent = make_pending()
+    future = pending.submit("ReadAssetNo", bytes.fromhex("017301FF"), parse=lambda f: f[4:8])
+    assert sent == [bytes.fromhex("017301FF")]
+    assert not future.done()
+    assert pending.resolve(ASSET_RESPONSE)
+    assert future.result(timeout=0) == bytes.fromhex("D2040000")
+    assert pending.completed == 1 and not pending.pending
+
+
+def test_unrequested_frames_are_not_consumed():
+    pending, _ = make_pending()
+    future = pending.submit("GetSASVersion", bytes.fromhex("0154"))
+    assert not pending.resolve(ASSET_RESPONSE)
+    assert not pending.resolve(SASFrame(b"\x80"))
+    assert not future.done()
+
+
+def test_meter_responses_resolve_the_request_of_their_game():
+    pending, _ = make_pending()
+    commands = command_library(0x01)
+    game_5 = pending.submit("game 5", commands.meters([0x06, 0x07], 5), parse=decode_meter_frame)
+    totals = pending.submit("totals", commands.meters([0x06, 0x07], 0), parse=decode_meter_frame)
+    assert pending.resolve(respond(commands.meters([0x06, 0x07], 0)))
+    assert totals.result(timeout=0).game_number == 0 and not game_5.done()
+    assert pending.resolve(respond(commands.meters([0x06, 0x07], 5)))
+    assert game_5.result(timeout=0).game_number == 5
+    assert not pending.resolve(respond(commands.meters([0x06, 0x07], 9)))
+
+
+def test_same_command_resolves_in_send_order():
+    pending, _ = make_pending()
+    first = pending.submit("a", bytes.fromhex("017301FF"))
+    second = pending.submit("b", bytes.fromhex("017301FF"))
+    pending.resolve(ASSET_RESPONSE)
+    assert first.done() and not second.done()
+
+
+def test_overdue_request_is_resent_then_fails():
+    pending, sent = make_pending()
+    future = pending.submit("meters", bytes.fromhex("012F"), policy=RetryPolicy(timeout=0.5, retries=1))
+    start = pending.pending[(0x01, 0x2F)][0].sent_at
+    pending.expire(start + 0.1)
+    assert len(sent) == 1
+    pending.expire(start + 0.6)
+    assert len(sent) == 2 and pending.resends == 1
+    pending.expire(start + 5)
+    with pytest.raises(TimeoutError):
+        future.result(timeout=0)
+    assert pending.timeouts == 1 and not pending.pending
+
+
+def test_wait_gives_up_and_forgets_request():
+    pending, _ = make_pending()
+    future = pending.submit("meters", bytes.fromhex("012F"), policy=RetryPolicy(timeout=0.01, retries=0))
+    with pytest.raises(TimeoutError):
+        pending.wait(future, slack=0.01)
+    assert not pending.pending
+
+
+def test_requeues_after_real_time_events_are_bounded():
+    pending, sent = make_pending()
+    policy = RetryPolicy(timeout=0.1, retries=0, requeues=2)
+    future = pending.submit("ReadAssetNo", bytes.fromhex("017301FF"), policy=policy)
+    key = (0x01, 0x73)
+    assert pending.requeue(key) and pending.requeue(key)
+    assert not pending.requeue(key)  # A machine that keeps reporting events gets no more resends
+    assert len(sent) == 3 and pending.requeues == 2
+    pending.expire(time.monotonic() + 1)
+    with pytest.raises(TimeoutError):
+        future.result(timeout=0)
@@ -0,0 +1,73 @@
+import time
+
+from sas_commands import command_library
+from sas_scheduler import (PRIORITY_AFT, PRIORITY_BALANCE, PRIORITY_INFO, SASScheduler,
+                           command_priority)
+
+COMMANDS = command_library(0x01)
+
+
+def make_scheduler():
+    line = []
+    scheduler = SASScheduler(line.append, lambda: line.append(b"\x80"))
+    return scheduler, line
+
+
+def run_slot_answered(scheduler):
+    """One slot, with the machine's reply to a long poll coming in right away."""
+    item = scheduler.run_slot()
+    if item is not None:
+        scheduler.response_received()
+    return item
+
+
+def test_command_priority_classes():
+    assert command_priority(COMMANDS.cancel_aft) == PRIORITY_AFT
+    assert command_priority(COMMANDS.balance_query) == PRIORITY_BALANCE
+    assert command_priority(COMMANDS.frame(b"\x74\x00\x00\x90\x00")) == PRIORITY_AFT  # Lock request
+    assert command_priority(COMMANDS.meters_af_basic) == PRIORITY_INFO
+
+
+def test_long_polls_go_out_by_priority_between_general_polls():
+    scheduler, line = make_scheduler()
+    scheduler.submit("meters", COMMANDS.meters_2f_basic)
+    scheduler.submit("balance", COMMANDS.balance_query)
+    scheduler.submit("aft", COMMANDS.cancel_aft)
+    for _ in range(6):
+        run_slot_answered(scheduler)
+    assert line == [COMMANDS.cancel_aft, b"\x80", COMMANDS.balance_query, b"\x80",
+                    COMMANDS.meters_2f_basic, b"\x80"]
+
+
+def test_on_sent_and_stats():
+    scheduler, line = make_scheduler()
+    sent = []
+    scheduler.submit("meters", COMMANDS.meters_2f_basic, on_sent=lambda: sent.append(True))
+    scheduler.submit("more meters", COMMANDS.meters_2f_all)
+    assert scheduler.stats()["classes"]["info"]["depth"] == 2
+    run_slot_answered(scheduler)
+    run_slot_answered(scheduler)
+    assert sent == [True]
+    stats = scheduler.stats()
+    assert stats["queue_depth"] == 1
+    assert stats["long_polls"] == 1 and stats["general_polls"] == 1 and stats["busy_slots"] == 1
+    assert stats["classes"]["info"]["sent"] == 1
+
+
+def test_line_is_held_until_the_long_poll_reply_is_in():
+    line = []
+    scheduler = SASScheduler(line.append, lambda: line.append(b"\x80"), response_timeout=0.05)
+    scheduler.submit("meters", COMMANDS.meters_2f_all)
+    scheduler.run_slot()
+    scheduler.submit("balance", COMMANDS.balance_query)
+    scheduler.run_slot()
+    assert line == [COMMANDS.meters_2f_all] and scheduler.stats()["held_slots"] == 1
+    scheduler.response_received()
+    scheduler.run_slot()
+    scheduler.run_slot()
+    assert line == [COMMANDS.meters_2f_all, b"\x80", COMMANDS.balance_query]
+    # No reply: the line is free again once the response timeout has passed
+    assert scheduler.run_slot() is None and len(line) == 3
+    time.sleep(0.06)
+    scheduler.run_slot()
+    assert line[-1] == b"\x80" and scheduler.stats()["response_timeouts"] == 1
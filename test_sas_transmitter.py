@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import os
+
+import serial
+
+from sas_transmitter import (MODE_EVEN, MODE_MARK, MODE_ODD, MODE_SPACE,
+                             WakeupBitTransmitter, single_write_modes)
+
+
+class FakePort:
+    """Records writes together with the parity in effect."""
+
+    def __init__(self):
+        self.parity = serial.PARITY_NONE
+        self.writes = []
+        self.parity_changes = 0
+
+    def flush(self):
+        pass
+
+    def write(self, data):
+        self.writes.append((self.parity, bytes(data)))
+
+    def __setattr__(self, name, value):
+        if name == "parity" and "parity" in self.__dict__:
+            self.__dict__["parity_changes"] += 1
+        self.__dict__[name] = value
+
+
+def wakeup_bits(parity, data):
+    """9th bit of every byte as the UART would send it."""
+    bits = []
+    for b in data:
+        odd = bin(b).count("1") & 1
+        bits.append({serial.PARITY_MARK: 1, serial.PARITY_SPACE: 0,
+                     serial.PARITY_EVEN: odd, serial.PARITY_ODD: 1 - odd}[parity])
+    return bits
+
+
+def sent_bits(port):
+    bits = []
+    for parity, data in port.writes:
+        bits += wakeup_bits(parity, data)
+    return bits
+
+
+def test_single_write_modes():
+    assert single_write_modes(b"\x80") == (MODE_MARK, MODE_EVEN)
+    assert single_write_modes(b"\x81") == (MODE_MARK, MODE_ODD)
+    assert single_write_modes(b"\x01\x03\x05") == (MODE_EVEN,)
+    assert single_write_modes(b"\x01\x54") == ()
+
+
+def test_wakeup_bit_only_on_address_byte():
+    port = FakePort()
+    tx = WakeupBitTransmitter(port, use_termios=False)
+    commands = [b"\x80", b"\x81", b"\x01\x54\x12\x34", b"\x01\x03\x05", b"\x80", b"\x81"]
+    for command in commands:
+        port.writes.clear()
+        tx.send(command)
+        assert sent_bits(port) == [1] + [0] * (len(command) - 1)
+
+
+def test_general_polls_do_not_switch_parity():
+    port = FakePort()
+    tx = WakeupBitTransmitter(port, use_termios=False)
+    for _ in range(10):
+        tx.send(b"\x80")
+        tx.send(b"\x81")
+    assert tx.mode_switches == 1
+    assert len(port.writes) == 20
+
+
+def test_termios_modes_on_pty():
+    master, slave = os.openpty()
+    try:
+        port = serial.Serial(os.ttyname(slave), 19200)
+        tx = WakeupBitTransmitter(port)
+        assert set(tx.attributes) == {MODE_MARK, MODE_SPACE, MODE_EVEN, MODE_ODD}
+        tx.send(b"\x01\x54\x12\x34")
+        assert tx.mode == MODE_SPACE
+        assert os.read(master, 16) == b"\x01\x54\x12\x34"
+        port.close()
+    finally:
+        os.close(master)
+        os.close(slave)
@@ -0,0 +1,63 @@
+import threading
+import time
+from sas_dispatch import SASDispatcher
+from sas_frame import SASFrame
+from sas_scheduler import SASScheduler
+from sas_workers import HandlerPool
+from utils import add_crc
+
+ASSET_RESPONSE = SASFrame(add_crc(bytes.fromhex("01730B00D2040000000000000000")))
+
+
+def test_slow_handler_does_not_stall_poll_cadence():
+    pool = HandlerPool(workers=2)
+    pool.start()
+    dispatcher = SASDispatcher(executor=pool)
+    finished = threading.Event()
+
+    def slow_asset_handler(frame):
+        time.sleep(0.25)  # Like get_meter waiting for the meter response
+        finished.set()
+    dispatcher.register(0x73, slow_asset_handler)
+
+    polls = []
+
+    def general_poll():
+        polls.append(time.monotonic())
+        if len(polls) == 1:
+            dispatcher.dispatch(ASSET_RESPONSE)  # The machine answers while we poll
+
+    scheduler = SASScheduler(lambda command: None, general_poll, poll_interval=0.02)
+    scheduler.start()
+    time.sleep(0.3)
+    scheduler.stop()
+    pool.stop()
+
+    assert finished.is_set()
+    gaps = [b - a for a, b in zip(polls, polls[1:])]
+    assert len(polls) >= 10
+    assert max(gaps) < 0.1
+    assert pool.stats()["handlers"]["test_slow_handler_does_not_stall_poll_cadence.<locals>.slow_asset_handler"]["calls"] == 1
+
+
+def test_handler_order_and_timing_inline_when_not_started():
+    pool = HandlerPool(workers=2)
+    seen = []
+    pool.submit(seen.append, b"\x01")
+    pool.submit(seen.append, b"\x02")
+    assert seen == [b"\x01", b"\x02"]
+    assert pool.stats()["handlers"]["list.append"]["calls"] == 2
+
+
+def test_handler_errors_are_counted():
+    pool = HandlerPool()
+    pool.start()
+    done = threading.Event()
+
+    def broken(frame):
+        done.set()
+        raise ValueError("bad frame")
+    pool.submit(broken, ASSET_RESPONSE)
+    assert done.wait(1)
+    pool.stop()
+    assert pool.stats()["handlers"]["test_handler_errors_are_counted.<locals>.broken"]["errors"] == 1
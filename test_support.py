@@ -0,0 +1,142 @@
+# Simulated Gaming Machine Responses
+# Meter and game answers built the way a machine builds them, and fake communicators that
+# answer SasMoney / MeterSweep requests with them. Test helpers only: shared by the meter tests
+# and kept out of the application modules.
+
+from concurrent.futures import Future
+
+import bcd
+from sas_frame import SASFrame
+from sas_meters import GAME_METER_CODES, METER_SIZES, SINGLE_METER_POLLS, request_codes
+from sas_requests import PendingRequests
+from sas_scheduler import SASScheduler
+from utils import add_crc
+
+
+def respond(command, value=lambda code: code % 100):
+    """Machine answer to a 2F, AF or single meter poll."""
+    address, kind = command[0], command[1]
+    if kind in SINGLE_METER_POLLS:
+        return SASFrame(add_crc(bytes((address, kind)) + bcd.encode(value(SINGLE_METER_POLLS[kind]), 4)))
+    body = bytearray(command[3:5])
+    for code in request_codes(command):
+        size = METER_SIZES[code] if code < 256 else 4
+        if kind == 0xAF:
+            body += code.to_bytes(2, "little") + bytes((size,))
+        else:
+            body.append(code)
+        body += bcd.encode(value(code), size)
+    return SASFrame(add_crc(bytes((address, kind, len(body))) + bytes(body)))
+
+
+def games_response(games, address=0x01):
+    """Machine answer to a 56: the enabled game numbers."""
+    body = bytes((len(games),)) + b"".join(bcd.encode(g, 2) for g in games)
+    return SASFrame(add_crc(bytes((address, 0x56, len(body))) + body))
+
+
+def game_meters_response(command, value):
+    """Machine answer to a 52; value(game, code) gives each meter."""
+    game = bcd.decode(command[2:4])
+    body = bytes(command[2:4]) + b"".join(bcd.encode(value(game, code), 4) for code in GAME_METER_CODES)
+    return SASFrame(add_crc(bytes((command[0], 0x52)) + body))
+
+
+class PlannedMachine:
+    """Answers every meter request at once with value = code % 100."""
+
+    address = 0x01
+
+    def __init__(self):
+        self.sent = []
+        self.requests = self
+
+    def can_wait_for_response(self):
+        return True
+
+    def request(self, name, command, policy=None, parse=None, expect=None, priority=None):
+        self.sent.append(command)
+        future = Future()
+        future.set_result(parse(respond(command)))
+        return future
+
+    def wait(self, future):
+        return future.result()
+
+
+class SweptMachine:
+    """Answers requests when answer() is called, like responses arriving on the reader thread."""
+
+    address = 0x01
+
+    def __init__(self, games, fail=()):
+        self.games = games
+        self.fail = fail  # Game numbers whose 52 never comes back
+        self.waiting = []
+        self.sent = []
+        self.priorities = set()
+        self.most_outstanding = 0
+        self.scheduler = self
+
+    def is_alive(self):
+        return True
+
+    def request(self, name, command, policy=None, parse=None, expect=None, priority=None):
+        future = Future()
+        self.sent.append(command)
+        self.priorities.add(priority)
+        self.waiting.append((command, parse, future))
+        self.most_outstanding = max(self.most_outstanding, len(self.waiting))
+        return future
+
+    def value(self, game, code):
+        return game * 1000 + code
+
+    def response_to(self, command):
+        """Answer to a 56, 52 or meter poll, an empty reply to anything else; None if the machine stays silent."""
+        if command[1] not in (0x56, 0x52, 0x2F, 0xAF):
+            return SASFrame(add_crc(bytes(command[:2])))
+        if command[1] == 0x56:
+            return games_response(self.games, command[0])
+        if command[1] == 0x52:
+            if bcd.decode(command[2:4]) in self.fail:
+                return None
+            return game_meters_response(command, self.value)
+        game = bcd.decode(command[3:5])
+        return respond(command, lambda code: self.value(game, code))
+
+    def answer(self):
+        while self.waiting:
+            command, parse, future = self.waiting.pop(0)
+            frame = self.response_to(command)
+            if frame is None:
+                future.set_exception(TimeoutError("no response"))
+            else:
+                future.set_result(parse(frame))
+
+
+class ScheduledMachine(SweptMachine):
+    """
+    SweptMachine behind a real PendingRequests and SASScheduler. The test drives the slots with
+    run_slot(); a long poll is answered as soon as it is on the line.
+    """
+
+    def __init__(self, games, fail=()):
+        super().__init__(games, fail)
+        self.line = []
+        self.scheduler = SASScheduler(self.line.append, lambda: self.line.append(b"\x80"))
+        self.requests = PendingRequests(self.scheduler.submit)
+
+    def request(self, name, command, policy=None, parse=None, expect=None, priority=None):
+        self.sent.append(command)
+        self.priorities.add(priority)
+        return self.requests.submit(name, command, expect, policy, parse, priority)
+
+    def run_slot(self):
+        item = self.scheduler.run_slot()
+        if item is not None:
+            frame = self.response_to(item.command)
+            if frame is not None:
+                self.scheduler.response_received()
+                self.requests.resolve(frame)
+        return item
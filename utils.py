@@ -1,7 +1,8 @@
 import uuid
 import socket
 import netifaces
-from crccheck.crc import CrcKermit
+
+import bcd
 
 
 def get_mac_address(interface='eth0'):
@@ -37,14 +38,46 @@ def decode_to_hex(input_str):
     return bytearray.fromhex(input_str)
 
 
+def _make_crc_kermit_table():
+    table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x8408 if crc & 1 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+
+CRC_KERMIT_TABLE = _make_crc_kermit_table()
+
+
+def crc_kermit(data, crc=0):
+    """CRC-16/Kermit of data, table driven. Pass a previous result as crc to continue incrementally."""
+    table = CRC_KERMIT_TABLE
+    for b in data:
+        crc = (crc >> 8) ^ table[(crc ^ b) & 0xFF]
+    return crc
+
+
+def add_crc(command):
+    """Returns command bytes followed by their CRC Kermit, low byte first."""
+    crc = crc_kermit(command)
+    return bytes(command) + bytes((crc & 0xFF, crc >> 8))
+
+
 def get_crc(command_hex):
-    """Calculates CRC Kermit for a SAS command - EXACTLY like working code."""
-    data = decode_to_hex(command_hex)
-    crc_instance = CrcKermit()
-    crc_instance.process(data)
-    crc_hex = crc_instance.finalbytes().hex().upper()
-    crc_hex = crc_hex.zfill(4)
-    return f"{command_hex}{crc_hex[2:4]}{crc_hex[0:2]}"
+    """Calculates CRC Kermit for a hex SAS command and returns the hex command with CRC appended."""
+    return add_crc(decode_to_hex(command_hex)).hex().upper()
+
+
+def int_to_bcd(value, length_bytes):
+    """Encodes a non-negative integer as packed BCD bytes of the given length (see bcd.encode)."""
+    return bcd.encode(value, length_bytes)
+
+
+def bcd_to_int(data):
+    """Decodes packed BCD bytes to an integer (see bcd.decode)."""
+    return bcd.decode(data)
 
 
 def read_asset_to_int(d):
@@ -62,9 +95,5 @@ def read_asset_to_int(d):
 
 def add_left_bcd(number_str, length_bytes):
     """Pads a BCD number string with leading '00' to reach target byte length."""
-    number_str = str(int(number_str))
-    if len(number_str) % 2 != 0:
-        number_str = "0" + number_str
-    current_len_bytes = len(number_str) // 2
-    padding_needed_bytes = length_bytes - current_len_bytes
-    return "00" * int(padding_needed_bytes) + number_str 
\ No newline at end of file
+    digits = str(int(number_str))
+    return bcd.encode(int(digits), max(length_bytes, (len(digits) + 1) // 2)).hex()